@@ -0,0 +1,149 @@
+import threading
+from typing import NamedTuple
+
+from backend.csdb_index import abs_path, get_index
+from backend.eval_applic_expr import CompiledExpr, compile_expr
+from backend.s1000d_code import build_dmcode_from_attrs
+from backend.xml_cache import get_root
+
+
+def local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    if tag.startswith("{"):
+        return tag.split("}", 1)[1]
+    return tag
+
+
+def text_of(el) -> str:
+    return " ".join("".join(el.itertext()).split())
+
+
+def extract_referenced_applic_groups_from_act(act_root) -> dict[str, str]:
+    """
+    Return { group_id: group_expression_text }
+    Uses <referencedApplicGroup> blocks inside the ACT DM.
+    """
+    groups = {}
+    for el in act_root.iter():
+        if local_name(el.tag) == "referencedApplicGroup":
+            gid = None
+            # id attribute is common; sometimes it's 'id' / 'applicGroupId'
+            for k in ("id", "applicGroupId", "ident"):
+                if el.get(k):
+                    gid = el.get(k)
+                    break
+            expr = text_of(el)
+            if gid and expr:
+                groups[gid] = expr
+    return groups
+
+
+def extract_linked_table_dmcode(act_root, ref_name: str) -> str | None:
+    # <condCrossRefTableRef> / <productCrossRefTableRef> -> dmRef -> dmCode
+    for el in act_root.iter():
+        if local_name(el.tag) != ref_name:
+            continue
+        for child in el.iter():
+            if local_name(child.tag) == "dmCode":
+                dmcode = build_dmcode_from_attrs(child.attrib)
+                if dmcode:
+                    return dmcode
+    return None
+
+
+class XrefTable(NamedTuple):
+    dm_code: str
+    path: str
+    groups: dict        # group_id -> CompiledExpr, in document order
+
+
+class ActEntry(NamedTuple):
+    act: XrefTable
+    cct: XrefTable | None   # conditions cross-reference table linked from the ACT
+    pct: XrefTable | None   # products cross-reference table linked from the ACT
+    stamps: tuple           # ((path, mtime_ns, size), ...) of every file above
+
+    def find_group(self, gid: str) -> tuple[XrefTable, CompiledExpr] | None:
+        # ACT first, then the tables it links to
+        for table in (self.act, self.cct, self.pct):
+            if table is not None and gid in table.groups:
+                return table, table.groups[gid]
+        return None
+
+
+def _stamp(path: str) -> tuple[str, int, int]:
+    st = abs_path(path).stat()
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _load_table(dm_code: str, path: str) -> tuple[XrefTable, object]:
+    root = get_root(abs_path(path))
+    groups = {
+        gid: compile_expr(expr)
+        for gid, expr in extract_referenced_applic_groups_from_act(root).items()
+    }
+    return XrefTable(dm_code, path, groups), root
+
+
+def _build(act_dmcode: str, act_path: str) -> ActEntry:
+    index = get_index()
+    act, act_root = _load_table(act_dmcode, act_path)
+
+    linked = []
+    for ref_name in ("condCrossRefTableRef", "productCrossRefTableRef"):
+        code = extract_linked_table_dmcode(act_root, ref_name)
+        path = index.path_for_dmcode(code) if code else None
+        linked.append(_load_table(code, path)[0] if path else None)
+    cct, pct = linked
+
+    stamps = tuple(_stamp(t.path) for t in (act, cct, pct) if t is not None)
+    return ActEntry(act, cct, pct, stamps)
+
+
+_lock = threading.Lock()
+_entries: dict[str, ActEntry] = {}
+_stats = {"hits": 0, "misses": 0}
+
+
+def _is_current(entry: ActEntry, act_path: str) -> bool:
+    if entry.act.path != act_path:
+        return False
+    try:
+        return all(_stamp(path) == (path, m, s) for path, m, s in entry.stamps)
+    except OSError:
+        return False
+
+
+def get_act(act_dmcode: str) -> ActEntry | None:
+    """
+    Parsed ACT (+ linked CCT/PCT) with pre-compiled group predicates, keyed by
+    ACT dmCode. Rebuilt when any of those files change or the index maps the
+    dmCode to a different file. None if the ACT is not in the index.
+    """
+    act_path = get_index().path_for_dmcode(act_dmcode)
+    if not act_path:
+        return None
+
+    with _lock:
+        entry = _entries.get(act_dmcode)
+    if entry is not None and _is_current(entry, act_path):
+        with _lock:
+            _stats["hits"] += 1
+        return entry
+
+    entry = _build(act_dmcode, act_path)
+    with _lock:
+        _stats["misses"] += 1
+        _entries[act_dmcode] = entry
+    return entry
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "entries": len(_entries)}
@@ -0,0 +1,158 @@
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from lxml import etree
+
+from backend.csdb_index import abs_path, get_index
+from backend.s1000d_code import build_dmcode_from_attrs
+from backend.xml_cache import get_root
+
+GROUP_REF_ELEMENTS = ("referencedApplicGroupRef", "referencedApplicGroupRefId", "applicRef", "applicRefId")
+MAX_CACHED = 4096
+
+
+def local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    if tag.startswith("{"):
+        return tag.split("}", 1)[1]
+    return tag
+
+
+def text_of(el) -> str:
+    return " ".join("".join(el.itertext()).split())
+
+
+class ApplicFacts(NamedTuple):
+    """
+    Everything the evaluator / resolver need to know about a DM's applicability.
+    Same fields as the index's applic_facts (tools/index_bike_samples.py).
+    """
+    applic_text: str | None          # first <applic>, whitespace-normalized
+    act_dmCode: str | None           # dmCode inside <applicCrossRefTableRef>
+    group_ids: frozenset             # ids from referencedApplicGroupRef / applicRef elements
+    has_applic_structures: bool      # any element whose name contains 'applic'
+
+    @classmethod
+    def from_index(cls, facts: dict) -> "ApplicFacts":
+        return cls(
+            applic_text=facts.get("applic_text"),
+            act_dmCode=facts.get("act_dmCode"),
+            group_ids=frozenset(facts.get("group_ids") or ()),
+            has_applic_structures=bool(facts.get("has_applic_structures")),
+        )
+
+
+def _inside_act_ref(el) -> bool:
+    for anc in el.iterancestors():
+        if local_name(anc.tag) == "applicCrossRefTableRef":
+            return True
+    return False
+
+
+def collect_applic_facts(root) -> ApplicFacts:
+    """
+    One traversal of the tree. The DM's own dmIdent/dmCode is ignored; only a
+    dmCode under <applicCrossRefTableRef> names the ACT.
+    """
+    applic_text = None
+    applic_seen = False
+    act_dmcode = None
+    group_ids = set()
+    has_struct = False
+
+    for el in root.iter():
+        n = local_name(el.tag)
+        if not n:
+            continue
+
+        if not has_struct and "applic" in n.lower():
+            has_struct = True
+
+        if n == "applic":
+            if not applic_seen:
+                applic_seen = True
+                applic_text = text_of(el) or None
+        elif n == "dmCode":
+            if act_dmcode is None and _inside_act_ref(el):
+                act_dmcode = build_dmcode_from_attrs(el.attrib)
+        elif n in GROUP_REF_ELEMENTS:
+            # common patterns: refId/refid/idRef/idref/ids
+            for k, v in el.attrib.items():
+                lk = k.lower()
+                if ("ref" in lk or "id" in lk) and v:
+                    group_ids.add(v)
+
+    return ApplicFacts(applic_text, act_dmcode, frozenset(group_ids), has_struct)
+
+
+_lock = threading.Lock()
+_facts: "OrderedDict[tuple[str, int, int], ApplicFacts]" = OrderedDict()
+
+
+def facts_for_file(p: Path) -> ApplicFacts:
+    """
+    Facts for an XML file, memoized by (path, mtime, size).
+    """
+    st = p.stat()
+    key = (str(p), st.st_mtime_ns, st.st_size)
+    with _lock:
+        hit = _facts.get(key)
+        if hit is not None:
+            _facts.move_to_end(key)
+            return hit
+
+    facts = collect_applic_facts(get_root(p))
+
+    with _lock:
+        _facts[key] = facts
+        while len(_facts) > MAX_CACHED:
+            _facts.popitem(last=False)
+    return facts
+
+
+def clear() -> None:
+    with _lock:
+        _facts.clear()
+
+
+def facts_for_dm(path: str) -> ApplicFacts:
+    """
+    Facts for a DM path: taken from the index when it is current for that
+    file, otherwise collected from the (cached) parsed XML.
+    """
+    indexed = get_index().fresh_applic_facts(path)
+    if indexed is not None:
+        return ApplicFacts.from_index(indexed)
+    return facts_for_file(abs_path(path))
+
+
+def stream_applic_text(p: Path) -> str | None:
+    """
+    The first <applic>'s text, read with iterparse: stops at the end of that
+    element and clears everything before it, so neither a full tree nor an
+    xml_cache entry is built.
+    """
+    depth = 0
+    for event, el in etree.iterparse(str(p), events=("start", "end"), remove_comments=True):
+        if local_name(el.tag) == "applic":
+            if event == "start":
+                depth += 1
+                continue
+            return text_of(el) or None
+        if event == "end" and not depth:
+            el.clear()
+    return None
+
+
+def applic_text_for_dm(path: str) -> str | None:
+    """
+    Lightweight applic text for a DM path: the index's facts when they are
+    current for that file, otherwise a streaming read up to the first <applic>.
+    """
+    indexed = get_index().fresh_applic_facts(path)
+    if indexed is not None:
+        return indexed.get("applic_text")
+    return stream_applic_text(abs_path(path))
@@ -1,153 +1,314 @@
+import base64
 import json
+import os
+import threading
+import time
 from pathlib import Path
-from lxml import etree
 
-from backend.eval_applic_expr import evaluate
+from fastapi import HTTPException
+
+from backend import resolve_cache
+from backend.applic_facts import facts_for_dm
+from backend.csdb_index import BASE_DIR, CsdbIndex, get_index
+from backend.eval_applic_expr import CompiledExpr, compile_expr
 
-BASE_DIR = Path(__file__).resolve().parent.parent
 
 DATASET_DIR = BASE_DIR / "data" / "S1000D_4-1_Bike_Samples"
-INDEX_PATH = BASE_DIR / "data" / "bike_index.json"
 GROUPS_PATH = BASE_DIR / "data" / "applic_groups.json"
 
+# How often the background sweep re-stats the DM files for edits made without a reindex
+FRESHNESS_SECONDS = float(os.environ.get("RESOLVE_FRESHNESS_SECONDS", 5))
 
-def local_name(tag) -> str:
-    if not isinstance(tag, str):
-        return ""
-    if tag.startswith("{"):
-        return tag.split("}", 1)[1]
-    return tag
 
+def load_group_texts() -> list[str]:
+    groups = json.loads(GROUPS_PATH.read_text(encoding="utf-8"))
+    return [g["raw_text"] for g in groups if g.get("raw_text")]
 
-def text_of(el) -> str:
-    return " ".join("".join(el.itertext()).split())
 
+def load_group_exprs() -> list[CompiledExpr]:
+    return [compile_expr(t) for t in load_group_texts()]
 
-def load_index() -> dict:
-    return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
 
+def dm_files_signature(index: CsdbIndex) -> tuple[int, int, int]:
+    """
+    (sum of mtimes, sum of sizes, missing files) over the resolver's DMs.
+    Any edit, replacement or removal of a DM file changes it.
+    """
+    mtimes = sizes = missing = 0
+    for p in resolver_paths(index):
+        try:
+            st = os.stat(os.path.join(BASE_DIR, p))
+        except OSError:
+            missing += 1
+            continue
+        mtimes += st.st_mtime_ns
+        sizes += st.st_size
+    return mtimes, sizes, missing
 
-def load_dm_meta(index: dict) -> dict:
-    meta = {}
-    for dm in index["data_modules"]:
-        p = dm.get("path")
-        if p and not dm.get("parse_error"):
-            meta[p] = {
-                "dmCode": dm.get("dmCode"),
-                "dmTitle": dm.get("dmTitle"),
-            }
-    return meta
 
+_fresh_lock = threading.Lock()
+_fresh: tuple | None = None     # (index generation, dm_files_signature, edits seen so far)
+_sweeper: threading.Thread | None = None
 
-def extract_applic_text(xml_path: Path) -> str | None:
+
+def sweep_dm_files() -> None:
     """
-    Extract the first <applic>...</applic> text found in a DM.
+    Stat the DM files once and count an edit if the signature moved since the
+    last sweep of the same index generation.
     """
-    root = etree.fromstring(xml_path.read_bytes())
-    for el in root.iter():
-        if local_name(el.tag) == "applic":
-            t = text_of(el)
-            return t or None
-    return None
+    global _fresh
+    index = get_index()
+    signature = dm_files_signature(index)
+    with _fresh_lock:
+        generation, last, edits = _fresh or (None, None, 0)
+        if generation == index.generation and last != signature:
+            edits += 1
+        _fresh = (index.generation, signature, edits)
+
+
+def _run_sweeper() -> None:
+    while True:
+        try:
+            sweep_dm_files()
+        except OSError:
+            pass    # index briefly missing mid-delivery; try again next round
+        time.sleep(FRESHNESS_SECONDS)
 
 
-def load_group_texts() -> list[str]:
-    groups = json.loads(GROUPS_PATH.read_text(encoding="utf-8"))
-    return [g["raw_text"] for g in groups if g.get("raw_text")]
+def start_freshness_sweep() -> None:
+    """Start the background stat sweep (idempotent)."""
+    global _sweeper
+    with _fresh_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=_run_sweeper, name="dm-freshness", daemon=True)
+            _sweeper.start()
 
 
-def summarize(dm_meta: dict, paths: list[str], limit: int = 50) -> list[dict]:
-    items = []
-    for p in paths[:limit]:
-        m = dm_meta.get(p, {})
-        items.append(
-            {
-                "path": p,
-                "dmCode": m.get("dmCode"),
-                "dmTitle": m.get("dmTitle"),
-            }
-        )
-    return items
+def dm_file_edits() -> int:
+    # Lookups only read the sweeper's counter; they never stat DM files themselves
+    start_freshness_sweep()
+    cur = _fresh
+    return cur[2] if cur is not None else 0
 
 
-def resolve_applicability(selected: list[str]) -> dict:
+def dataset_generation(index: CsdbIndex) -> tuple:
     """
-    MVP (DM-level):
-    - If <applic> == "All" => applicable
-    - Else evaluate applicability expression text against `selected`
-    - If no <applic>, include by default (and note it)
+    Resolve cache key part for everything a verdict depends on: the index,
+    the known applicability groups and the DM files themselves, since
+    facts_for_dm re-reads DMs edited after indexing. DM edits are picked up
+    by the background sweep within about FRESHNESS_SECONDS, without a reindex
+    or /cache-clear.
     """
-    index = load_index()
-    dm_meta = load_dm_meta(index)
+    try:
+        groups_mtime = GROUPS_PATH.stat().st_mtime_ns
+    except OSError:
+        groups_mtime = None
+    return (index.generation, groups_mtime, dm_file_edits())
 
-    xml_paths = [
-        dm["path"]
-        for dm in index["data_modules"]
-        if dm.get("path")
-        and not dm.get("parse_error")
-        and Path(dm["path"]).name.upper().startswith("DMC-")
-    ]
+
+def dm_item(index: CsdbIndex, path: str) -> dict:
+    m = index.by_path.get(path, {})
+    return {
+        "path": path,
+        "dmCode": m.get("dmCode"),
+        "dmTitle": m.get("dmTitle"),
+    }
+
+
+def encode_cursor(generation: int, offset: int) -> str:
+    raw = json.dumps({"g": generation, "o": offset}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
 
 
-    group_exprs = load_group_texts()
+def decode_cursor(cursor: str, generation: int) -> int:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        offset = int(data["o"])
+        cursor_gen = int(data["g"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_gen != generation or offset < 0:
+        raise HTTPException(status_code=409, detail="Index changed since this cursor was issued; restart from the first page")
+    return offset
 
-    applicable: list[str] = []
-    excluded: list[str] = []
-    reasons: dict[str, str] = {}
 
-    for p_str in xml_paths:
-        p = Path(p_str)
-        if not p.is_absolute():
-            p = (BASE_DIR / p).resolve()
-        
-        # print("DEBUG PATH:", p)
+def resolver_paths(index: CsdbIndex) -> list[str]:
+    return [
+        dm["path"]
+        for dm in index.entries
+        if Path(dm["path"]).name.upper().startswith("DMC-")
+    ]
 
+
+def iter_applic_texts(index: CsdbIndex):
+    """
+    Yield (path, applic_text, read_error) for every DM the resolver considers.
+    Uses the facts recorded by tools/index_bike_samples.py when they are still
+    current, and only parses the XML for DMs that are missing or stale.
+    """
+    for p_str in resolver_paths(index):
         try:
-            applic_text = extract_applic_text(p)
+            yield p_str, facts_for_dm(p_str).applic_text, None
         except Exception as e:
-            excluded.append(p_str)
-            reasons[p_str] = f"XML read error: {e}"
+            yield p_str, None, str(e)
+
+
+def collect_applic_texts(index: CsdbIndex) -> list[tuple[str, str | None, str | None]]:
+    return list(iter_applic_texts(index))
+
+
+def iter_verdicts(index: CsdbIndex, selected: list[str]):
+    """
+    Yield (path, applies, reason) per DM, in index order, as soon as each is
+    decided. `reason` is None for applicable DMs.
+    - If <applic> == "All" => applicable
+    - Else evaluate applicability expression text against `selected`
+    - If no <applic>, exclude unless a known applicability group matches (strict mode)
+    """
+    selected_set = frozenset(selected)
+    matched_any_group = None
+
+    for p_str, applic_text, read_error in iter_applic_texts(index):
+        if read_error:
+            yield p_str, False, f"XML read error: {read_error}"
             continue
 
         if applic_text:
             if applic_text.strip().lower() == "all":
-                applicable.append(p_str)
+                yield p_str, True, None
                 continue
 
             try:
-                ok = evaluate(applic_text, selected)
+                ok = compile_expr(applic_text)(selected_set)
             except Exception as e:
-                excluded.append(p_str)
-                reasons[p_str] = f"Applic parse error: {e}"
+                yield p_str, False, f"Applic parse error: {e}"
                 continue
 
             if ok:
-                applicable.append(p_str)
+                yield p_str, True, None
             else:
-                excluded.append(p_str)
-                reasons[p_str] = f"Applic false for: {applic_text[:120]}"
+                yield p_str, False, f"Applic false for: {applic_text[:120]}"
             continue
 
         # No <applic> found:
         # For learning/accuracy, treat as NOT applicable unless we can match a known applicability group.
-        matched_any_group = any(evaluate(g, selected) for g in group_exprs)
+        # The answer only depends on `selected`, so work it out once.
+        if matched_any_group is None:
+            matched_any_group = any(g(selected_set) for g in load_group_exprs())
 
         if matched_any_group:
-            applicable.append(p_str)
+            yield p_str, True, None
         else:
-            excluded.append(p_str)
-            reasons[p_str] = "No <applic> found and no known group matched (strict mode)"
+            yield p_str, False, "No <applic> found and no known group matched (strict mode)"
+
+
+def resolve_result(index: CsdbIndex, selected: list[str]) -> resolve_cache.ResolveResult:
+    return resolve_cache.get_or_compute(
+        resolve_cache.canonical_selection(selected),
+        dataset_generation(index),
+        lambda: iter_verdicts(index, selected),
+    )
+
+
+def applicable_paths(selected: list[str]) -> frozenset[str]:
+    """
+    Paths of every DM applicable to `selected`, from the resolve cache.
+    """
+    return resolve_result(get_index(), selected).applicable_set
+
+
+RESOLVER_NOTES = {
+    "resolver_mode": "STRICT_MODE_TEST_v1",
+    "default_behavior": "Strict mode: If <applic> missing, exclude unless a known applicability group matches",
+}
 
 
+def resolve_applicability(
+    selected: list[str],
+    cursor: str | None = None,
+    limit: int | None = None,
+    paths_only: bool = False,
+) -> dict:
+    """
+    Resolve every DM against `selected`.
+    Counts always cover the whole CSDB. `applicable` / `excluded` list every DM
+    unless `limit` is given, in which case they hold one page of DMs (in index
+    order) and `next_cursor` fetches the next one. `paths_only` returns plain
+    path strings instead of {path, dmCode, dmTitle} items.
+    Results are cached per distinct label set (see backend/resolve_cache.py).
+    """
+    index = get_index()
+
+    start = decode_cursor(cursor, index.generation) if cursor else 0
+    end = start + limit if limit is not None else None
+
+    result = resolve_result(index, selected)
+
+    if end is None and start == 0:
+        applicable = result.applicable
+        excluded = result.excluded
+    else:
+        page = result.verdicts[start:end]
+        applicable = [p for p, ok, _ in page if ok]
+        excluded = [p for p, ok, _ in page if not ok]
+
+    if not paths_only:
+        applicable = [dm_item(index, p) for p in applicable]
+        excluded = [dm_item(index, p) for p in excluded]
+
+    total = len(result.verdicts)
+    next_cursor = encode_cursor(index.generation, end) if end is not None and end < total else None
+
     return {
         "selected": selected,
-        "applicable_count": len(applicable),
-        "applicable": summarize(dm_meta, applicable, limit=50),
-        "excluded_count": len(excluded),
-        "excluded": summarize(dm_meta, excluded, limit=50),
+        "applicable_count": len(result.applicable),
+        "applicable": applicable,
+        "excluded_count": len(result.excluded),
+        "excluded": excluded,
+        "next_cursor": next_cursor,
         "notes": {
-            "resolver_mode": "STRICT_MODE_TEST_v1",
-            "default_behavior": "Strict mode: If <applic> missing, exclude unless a known applicability group matches",
-            "reasons_sample": dict(list(reasons.items())[:20]),
+            **RESOLVER_NOTES,
+            "reasons_sample": result.reasons_sample,
         },
     }
+
+
+def stream_resolve_ndjson(selected: list[str], paths_only: bool = False):
+    """
+    NDJSON lines: one verdict per DM as soon as it is decided, then a summary line.
+    A cached result is replayed; otherwise the completed run is cached.
+    """
+    index = get_index()
+    selection = resolve_cache.canonical_selection(selected)
+    generation = dataset_generation(index)
+    cached = resolve_cache.lookup(selection, generation)
+
+    applicable_count = 0
+    excluded_count = 0
+    collected = []
+    t0 = time.perf_counter()
+
+    for p_str, applies, reason in (cached.verdicts if cached else iter_verdicts(index, selected)):
+        if not cached:
+            collected.append((p_str, applies, reason))
+        if applies:
+            applicable_count += 1
+        else:
+            excluded_count += 1
+        if paths_only:
+            row = {"path": p_str, "applies": applies}
+        else:
+            row = {**dm_item(index, p_str), "applies": applies, "reason": reason}
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+    if not cached:
+        resolve_cache.store(selection, generation, resolve_cache.ResolveResult(collected, time.perf_counter() - t0))
+
+    yield json.dumps({
+        "summary": {
+            "selected": selected,
+            "applicable_count": applicable_count,
+            "excluded_count": excluded_count,
+            **RESOLVER_NOTES,
+        }
+    }, ensure_ascii=False) + "\n"
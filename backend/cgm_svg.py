@@ -0,0 +1,880 @@
+"""
+Binary-encoded CGM (ISO/IEC 8632-3) to SVG.
+
+Covers what S1000D illustrations (WebCGM / IsoDraw output) actually use:
+lines, polygons, rectangles, circles, ellipses and their arcs, polybeziers,
+text, closed figures, the line / edge / fill / text attributes, indexed and
+direct colour, and application structures (layers, grobjects) as <g>.
+Hatch and pattern interiors are approximated with a translucent solid fill.
+Unknown elements are skipped.
+"""
+import math
+import struct
+from xml.sax.saxutils import escape, quoteattr
+
+# Bump when the output changes so cached renditions are regenerated
+CONVERTER_VERSION = 1
+
+FIXED_16_16 = (1, 16, 16)
+
+
+class CgmError(ValueError):
+    pass
+
+
+def iter_elements(data: bytes):
+    """
+    Yield (class, id, params) for each command. Long-form parameter lists may
+    be split into partitions; they are joined here. Commands start on even
+    offsets, so odd-length parameter lists are followed by a pad byte.
+    """
+    i = 0
+    n = len(data)
+    while i + 2 <= n:
+        head = int.from_bytes(data[i:i + 2], "big")
+        i += 2
+        cls, eid, length = head >> 12, (head >> 5) & 0x7F, head & 0x1F
+        if length < 31:
+            params = data[i:i + length]
+            i += length + (length & 1)
+        else:
+            parts = []
+            while True:
+                if i + 2 > n:
+                    raise CgmError("truncated long-form command")
+                word = int.from_bytes(data[i:i + 2], "big")
+                i += 2
+                length = word & 0x7FFF
+                parts.append(data[i:i + length])
+                i += length + (length & 1)
+                if not word & 0x8000:
+                    break
+            params = b"".join(parts)
+        if i > n + 1:
+            raise CgmError("truncated command parameters")
+        yield cls, eid, params
+
+
+class _State:
+    """
+    Metafile / picture descriptor values that decide how parameters are
+    encoded, plus the current drawing attributes.
+    """
+
+    def __init__(self):
+        # encoding
+        self.int_prec = 16
+        self.real_prec = FIXED_16_16
+        self.index_prec = 16
+        self.colour_prec = 8
+        self.ci_prec = 8
+        self.colour_ext = ((0, 0, 0), (255, 255, 255))
+        self.vdc_type = 0
+        self.vdc_int_prec = 16
+        self.vdc_real_prec = FIXED_16_16
+        self.colour_mode = 0            # 0 indexed, 1 direct
+        self.line_width_mode = 1        # 0 absolute, 1 scaled, 2 fractional, 3 mm
+        self.edge_width_mode = 1
+        self.vdc_extent = None
+        self.metric_scale = None        # mm per VDC unit if scaling mode is metric
+        self.transparency = True
+        self.background = (255, 255, 255)
+        self.colour_table = {0: (255, 255, 255), 1: (0, 0, 0)}
+        self.fonts: list[str] = []
+
+        # attributes; colours stay raw (index or rgb) until drawn
+        self.line_type = 1
+        self.line_width = 1.0
+        self.line_colour = 1
+        self.line_cap = None
+        self.line_join = None
+        self.edge_type = 1
+        self.edge_width = 1.0
+        self.edge_colour = 1
+        self.edge_visible = False
+        self.edge_cap = None
+        self.edge_join = None
+        self.interior_style = 0         # 0 hollow, 1 solid, 2 pattern, 3 hatch, 4 empty, 5 geometric, 6 interpolated
+        self.fill_colour = 1
+        self.text_colour = 1
+        self.char_height = None
+        self.char_up = (0.0, 1.0)
+        self.char_base = (1.0, 0.0)
+        self.text_align = (0, 0)
+        self.font_index = 1
+
+
+class _Params:
+    """
+    Reader over one command's parameter bytes, using the current precisions.
+    """
+
+    def __init__(self, data: bytes, st: _State):
+        self.b = data
+        self.pos = 0
+        self.st = st
+
+    def remaining(self) -> int:
+        return len(self.b) - self.pos
+
+    def _take(self, n: int) -> bytes:
+        if self.pos + n > len(self.b):
+            raise CgmError("parameter list shorter than expected")
+        out = self.b[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+    def sint(self, bits: int) -> int:
+        return int.from_bytes(self._take(bits // 8), "big", signed=True)
+
+    def uint(self, bits: int) -> int:
+        return int.from_bytes(self._take(bits // 8), "big")
+
+    def integer(self) -> int:
+        return self.sint(self.st.int_prec)
+
+    def index(self) -> int:
+        return self.sint(self.st.index_prec)
+
+    def enum(self) -> int:
+        return self.sint(16)
+
+    def real(self, prec=None) -> float:
+        form, whole, frac = prec or self.st.real_prec
+        if form == 0:
+            # floating point: 9/23 is IEEE single, 12/52 IEEE double
+            if frac <= 23:
+                return struct.unpack(">f", self._take(4))[0]
+            return struct.unpack(">d", self._take(8))[0]
+        return self.sint(whole) + self.uint(frac) / (1 << frac)
+
+    def float32(self) -> float:
+        # SCALING MODE's factor is always single-precision floating point
+        return struct.unpack(">f", self._take(4))[0]
+
+    def vdc(self) -> float:
+        if self.st.vdc_type == 0:
+            return float(self.sint(self.st.vdc_int_prec))
+        return self.real(self.st.vdc_real_prec)
+
+    def point(self) -> tuple[float, float]:
+        return (self.vdc(), self.vdc())
+
+    def points(self) -> list[tuple[float, float]]:
+        out = []
+        while self.remaining() > 0:
+            out.append(self.point())
+        return out
+
+    def colour_index(self) -> int:
+        return self.uint(self.st.ci_prec)
+
+    def direct_colour(self) -> tuple[int, int, int]:
+        raw = [self.uint(self.st.colour_prec) for _ in range(3)]
+        lo, hi = self.st.colour_ext
+        return tuple(
+            max(0, min(255, round((v - a) * 255 / (b - a)))) if b != a else 0
+            for v, a, b in zip(raw, lo, hi)
+        )
+
+    def colour(self):
+        if self.st.colour_mode == 0:
+            return self.colour_index()
+        return self.direct_colour()
+
+    def string(self) -> str:
+        n = self.uint(8)
+        if n < 255:
+            raw = self._take(n)
+        else:
+            parts = []
+            while True:
+                word = self.uint(16)
+                parts.append(self._take(word & 0x7FFF))
+                if not word & 0x8000:
+                    break
+            raw = b"".join(parts)
+        return raw.decode("latin-1")
+
+
+def _hex(rgb) -> str:
+    return "#%02x%02x%02x" % tuple(rgb)
+
+
+DASHES = {
+    2: (6, 3),              # dash
+    3: (1, 2),              # dot
+    4: (6, 2, 1, 2),        # dash-dot
+    5: (6, 2, 1, 2, 1, 2),  # dash-dot-dot
+}
+CAPS = {2: "butt", 3: "round", 4: "square"}
+JOINS = {2: "miter", 3: "round", 4: "bevel"}
+H_ALIGN = {1: "start", 2: "middle", 3: "end"}
+V_ALIGN = {1: "hanging", 2: "hanging", 3: "middle", 5: "text-after-edge"}
+
+
+class _Converter:
+    def __init__(self):
+        self.st = _State()
+        self.out: list[str] = []
+        self.open_groups = 0
+        self.in_body = False
+        self.done = False
+        self.decimals = 3
+        self.flip_x = False
+        self.flip_y = False
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+        self.figure: list[str] | None = None
+        self.text_parts: list[str] = []
+        self.text_at = None
+        # consecutive unfilled strokes with the same style share one <path>
+        self.stroke_style = None
+        self.stroke_parts: list[str] = []
+
+    # ---- coordinates ----
+
+    def setup_extent(self):
+        st = self.st
+        if st.vdc_extent is None:
+            st.vdc_extent = ((0.0, 0.0), (32767.0, 32767.0)) if st.vdc_type == 0 else ((0.0, 0.0), (1.0, 1.0))
+        (x1, y1), (x2, y2) = st.vdc_extent
+        # CGM y grows upward when the first corner is the lower one
+        self.flip_y = y2 > y1
+        self.flip_x = x2 < x1
+        self.sum_x, self.sum_y = x1 + x2, y1 + y2
+        size = max(abs(x2 - x1), abs(y2 - y1)) or 1.0
+        self.size = size
+        self.decimals = max(0, 6 - math.ceil(math.log10(size)))
+        if st.char_height is None:
+            st.char_height = size / 100
+
+    def num(self, v: float) -> str:
+        s = f"{v:.{self.decimals}f}"
+        if "." in s:
+            s = s.rstrip("0").rstrip(".")
+        return "0" if s in ("-0", "") else s
+
+    def xy(self, p) -> tuple[float, float]:
+        x, y = p
+        return (self.sum_x - x if self.flip_x else x, self.sum_y - y if self.flip_y else y)
+
+    def pt(self, p) -> str:
+        x, y = self.xy(p)
+        return f"{self.num(x)} {self.num(y)}"
+
+    def mirrored(self) -> bool:
+        return self.flip_x != self.flip_y
+
+    # ---- styles ----
+
+    def rgb(self, c):
+        if isinstance(c, tuple):
+            return c
+        return self.st.colour_table.get(c, (0, 0, 0))
+
+    def width(self, w: float, mode: int) -> float:
+        nominal = self.size / 1000
+        if mode == 0:
+            return abs(w)
+        if mode == 2:
+            return abs(w) * self.size
+        if mode == 3 and self.st.metric_scale:
+            return abs(w) / self.st.metric_scale
+        return abs(w) * nominal
+
+    def stroke_attrs(self, colour, width, ltype, cap, join) -> str:
+        w = max(width, self.size / 5000)
+        attrs = f' stroke="{_hex(self.rgb(colour))}" stroke-width="{self.num(w)}"'
+        dash = DASHES.get(ltype)
+        if dash:
+            unit = max(w, self.size / 1000)
+            attrs += ' stroke-dasharray="' + " ".join(self.num(d * unit) for d in dash) + '"'
+        if cap in CAPS:
+            attrs += f' stroke-linecap="{CAPS[cap]}"'
+        if join in JOINS:
+            attrs += f' stroke-linejoin="{JOINS[join]}"'
+        return attrs
+
+    def line_style(self) -> str:
+        st = self.st
+        return self.stroke_attrs(st.line_colour, self.width(st.line_width, st.line_width_mode),
+                                 st.line_type, st.line_cap, st.line_join)
+
+    def area_style(self, with_edges: bool = True) -> str:
+        st = self.st
+        style = st.interior_style
+        fill = _hex(self.rgb(st.fill_colour))
+        if style == 4:
+            attrs = ' fill="none"'
+        elif style == 0:
+            # hollow: boundary drawn in the fill colour
+            attrs = ' fill="none"' + self.stroke_attrs(st.fill_colour, self.size / 1000, 1, None, None)
+            with_edges = False
+        elif style in (2, 3, 5):
+            attrs = f' fill="{fill}" fill-opacity="0.25"'
+        else:
+            attrs = f' fill="{fill}"'
+        if with_edges and st.edge_visible:
+            attrs += self.stroke_attrs(st.edge_colour, self.width(st.edge_width, st.edge_width_mode),
+                                       st.edge_type, st.edge_cap, st.edge_join)
+        return attrs
+
+    # ---- output ----
+
+    def emit(self, s: str):
+        self.flush_strokes()
+        self.out.append(s)
+
+    def flush_strokes(self):
+        if self.stroke_parts:
+            self.out.append(f'<path fill="none"{self.stroke_style} d="{"".join(self.stroke_parts)}"/>')
+            self.stroke_parts = []
+        self.stroke_style = None
+
+    def stroke(self, start, body: str):
+        """
+        An open line segment: `start` point plus path commands after it.
+        Inside a figure it extends the figure boundary instead.
+        """
+        if self.figure is not None:
+            self.figure.append(("M" if not self.figure else "L") + self.pt(start) + body)
+            return
+        style = self.line_style()
+        if style != self.stroke_style:
+            self.flush_strokes()
+            self.stroke_style = style
+        self.stroke_parts.append("M" + self.pt(start) + body)
+
+    def area(self, d: str, fill_rule: str = ""):
+        if self.figure is not None:
+            self.figure.append(d)
+            return
+        rule = f' fill-rule="{fill_rule}"' if fill_rule else ""
+        self.emit(f'<path{self.area_style()}{rule} d="{d}"/>')
+
+    def polyline_body(self, pts) -> str:
+        return "".join("L" + self.pt(p) for p in pts)
+
+    # ---- arcs ----
+
+    def arc_body(self, c, u, v, t0: float, span: float) -> tuple[tuple, str, tuple]:
+        """
+        Arc of the ellipse c + u*cos(t) + v*sin(t) from t0 over `span`
+        radians (positive: from u towards v). Returns (start, path, end).
+        """
+        def at(t):
+            return (c[0] + u[0] * math.cos(t) + v[0] * math.sin(t),
+                    c[1] + u[1] * math.cos(t) + v[1] * math.sin(t))
+
+        start = at(t0)
+        # principal radii and rotation of the image of the unit circle under [u v], in SVG space
+        fx = -1 if self.flip_x else 1
+        fy = -1 if self.flip_y else 1
+        m00, m01, m10, m11 = u[0] * fx, v[0] * fx, u[1] * fy, v[1] * fy
+        e, f = (m00 + m11) / 2, (m00 - m11) / 2
+        g, h = (m10 + m01) / 2, (m10 - m01) / 2
+        q, r = math.hypot(e, h), math.hypot(f, g)
+        rx, ry = q + r, abs(q - r)
+        if rx < 1e-12 or ry < 1e-12:
+            return start, "L" + self.pt(at(t0 + span)), at(t0 + span)
+        rot = math.degrees((math.atan2(h, e) + math.atan2(g, f)) / 2)
+        sweep = 1 if m00 * m11 - m01 * m10 > 0 else 0
+
+        # full turns are drawn as two halves; SVG can't arc to the start point
+        pieces = [span] if span < 2 * math.pi - 1e-9 else [span / 2, span / 2]
+        body = []
+        t = t0
+        for s in pieces:
+            t += s
+            large = 1 if s > math.pi else 0
+            body.append(f"A{self.num(rx)} {self.num(ry)} {self.num(rot)} {large} {sweep} {self.pt(at(t))}")
+        return start, "".join(body), at(t)
+
+    @staticmethod
+    def param_angle(u, v, d) -> float:
+        # t where the ray along d from the centre meets the ellipse: solve d = a*u + b*v
+        det = u[0] * v[1] - u[1] * v[0]
+        if abs(det) < 1e-12:
+            return math.atan2(d[1], d[0])
+        a = (d[0] * v[1] - d[1] * v[0]) / det
+        b = (u[0] * d[1] - u[1] * d[0]) / det
+        return math.atan2(b, a)
+
+    def arc_span(self, u, v, d0, d1) -> tuple[float, float]:
+        t0 = self.param_angle(u, v, d0)
+        span = (self.param_angle(u, v, d1) - t0) % (2 * math.pi)
+        return t0, span or 2 * math.pi
+
+    def close_arc(self, c, start, body, end, close_type: int) -> str:
+        # 0 pie (through the centre), 1 chord
+        d = "M" + self.pt(start) + body
+        if close_type == 0:
+            d += "L" + self.pt(c)
+        return d + "Z"
+
+    # ---- text ----
+
+    def flush_text(self):
+        if self.text_at is None:
+            return
+        st = self.st
+        text = "".join(self.text_parts)
+        self.text_parts = []
+        at, self.text_at = self.text_at, None
+        if not text.strip():
+            return
+        x, y = self.xy(at)
+        attrs = f' x="{self.num(x)}" y="{self.num(y)}" font-size="{self.num(abs(st.char_height))}"'
+        if 0 < st.font_index <= len(st.fonts):
+            family = st.fonts[st.font_index - 1].split(":")[-1]
+            attrs += f" font-family={quoteattr(family)}"
+        attrs += f' fill="{_hex(self.rgb(st.text_colour))}"'
+        h, v = st.text_align
+        if h in H_ALIGN:
+            attrs += f' text-anchor="{H_ALIGN[h]}"'
+        if v in V_ALIGN:
+            attrs += f' dominant-baseline="{V_ALIGN[v]}"'
+        bx, by = st.char_base
+        angle = math.degrees(math.atan2(by, bx))
+        if self.mirrored():
+            angle = -angle
+        if abs(angle) > 0.01:
+            attrs += f' transform="rotate({self.num(angle)} {self.num(x)} {self.num(y)})"'
+        self.emit(f"<text{attrs} xml:space=\"preserve\">{escape(text)}</text>")
+
+    def add_text(self, at, final: int, text: str):
+        if at is not None:
+            self.flush_text()
+            self.text_at = at
+        self.text_parts.append(text)
+        if final == 1:
+            self.flush_text()
+
+    # ---- dispatch ----
+
+    def run(self, data: bytes):
+        for cls, eid, params in iter_elements(data):
+            handler = HANDLERS.get((cls, eid))
+            if handler is not None:
+                handler(self, _Params(params, self.st))
+            if self.done:
+                break
+        return self.finish()
+
+    def finish(self) -> str:
+        if self.st.vdc_extent is None or not self.in_body:
+            raise CgmError("no picture found")
+        self.flush_text()
+        self.flush_strokes()
+        self.out.extend("</g>" for _ in range(self.open_groups))
+        self.open_groups = 0
+
+        (x1, y1), (x2, y2) = self.st.vdc_extent
+        minx, miny = min(x1, x2), min(y1, y2)
+        w, h = abs(x2 - x1), abs(y2 - y1)
+        size = ""
+        if self.st.metric_scale:
+            size = f' width="{self.num(w * self.st.metric_scale)}mm" height="{self.num(h * self.st.metric_scale)}mm"'
+        head = (
+            '<svg xmlns="http://www.w3.org/2000/svg"'
+            f' viewBox="{self.num(minx)} {self.num(miny)} {self.num(w)} {self.num(h)}"{size}'
+            ' stroke-linecap="round" stroke-linejoin="round">'
+        )
+        bg = ""
+        if not self.st.transparency:
+            bg = (f'<rect x="{self.num(minx)}" y="{self.num(miny)}" width="{self.num(w)}"'
+                  f' height="{self.num(h)}" fill="{_hex(self.st.background)}"/>')
+        return head + bg + "".join(self.out) + "</svg>\n"
+
+    # delimiters
+
+    def begin_picture_body(self, p):
+        if self.in_body:
+            return
+        self.in_body = True
+        self.setup_extent()
+
+    def end_picture(self, p):
+        # one picture per ICN; later pictures are ignored
+        if self.in_body:
+            self.done = True
+
+    def begin_figure(self, p):
+        self.flush_text()
+        self.flush_strokes()
+        self.figure = []
+
+    def end_figure(self, p):
+        parts, self.figure = self.figure, None
+        if parts:
+            d = "".join(parts)
+            self.area(d if d.endswith("Z") else d + "Z", "evenodd")
+
+    def begin_aps(self, p):
+        aps_id = p.string()
+        aps_type = p.string()
+        self.emit(f"<g data-aps-id={quoteattr(aps_id)} data-aps-type={quoteattr(aps_type)}>")
+        self.open_groups += 1
+
+    def end_aps(self, p):
+        if self.open_groups:
+            self.emit("</g>")
+            self.open_groups -= 1
+
+    # metafile / picture descriptor and control
+
+    def vdc_type(self, p):
+        self.st.vdc_type = p.enum()
+
+    def integer_precision(self, p):
+        self.st.int_prec = p.integer()
+
+    def real_precision(self, p):
+        self.st.real_prec = (p.enum(), p.integer(), p.integer())
+
+    def index_precision(self, p):
+        self.st.index_prec = p.integer()
+
+    def colour_precision(self, p):
+        self.st.colour_prec = p.integer()
+
+    def colour_index_precision(self, p):
+        self.st.ci_prec = p.integer()
+
+    def colour_value_extent(self, p):
+        if p.remaining() >= 6 * self.st.colour_prec // 8:
+            lo = tuple(p.uint(self.st.colour_prec) for _ in range(3))
+            hi = tuple(p.uint(self.st.colour_prec) for _ in range(3))
+            self.st.colour_ext = (lo, hi)
+
+    def defaults_replacement(self, p):
+        # embedded descriptor / attribute elements, same encoding
+        for cls, eid, params in iter_elements(p.b):
+            handler = HANDLERS.get((cls, eid))
+            if handler is not None:
+                handler(self, _Params(params, self.st))
+
+    def font_list(self, p):
+        while p.remaining() > 0:
+            self.st.fonts.append(p.string())
+
+    def scaling_mode(self, p):
+        mode = p.enum()
+        factor = p.float32() if p.remaining() >= 4 else 1.0
+        self.st.metric_scale = factor if mode == 1 and factor > 0 else None
+
+    def colour_selection_mode(self, p):
+        self.st.colour_mode = p.enum()
+
+    def line_width_mode(self, p):
+        self.st.line_width_mode = p.enum()
+
+    def edge_width_mode(self, p):
+        self.st.edge_width_mode = p.enum()
+
+    def vdc_extent(self, p):
+        self.st.vdc_extent = (p.point(), p.point())
+
+    def background_colour(self, p):
+        self.st.background = p.direct_colour()
+
+    def vdc_integer_precision(self, p):
+        self.st.vdc_int_prec = p.integer()
+
+    def vdc_real_precision(self, p):
+        self.st.vdc_real_prec = (p.enum(), p.integer(), p.integer())
+
+    def transparency(self, p):
+        self.st.transparency = p.enum() == 1
+
+    # graphical primitives
+
+    def polyline(self, p):
+        pts = p.points()
+        if len(pts) >= 2:
+            self.stroke(pts[0], self.polyline_body(pts[1:]))
+
+    def disjoint_polyline(self, p):
+        pts = p.points()
+        for a, b in zip(pts[0::2], pts[1::2]):
+            self.stroke(a, self.polyline_body([b]))
+
+    def text(self, p):
+        at = p.point()
+        final = p.enum()
+        self.add_text(at, final, p.string())
+
+    def restricted_text(self, p):
+        p.vdc()
+        p.vdc()
+        self.text(p)
+
+    def append_text(self, p):
+        final = p.enum()
+        self.add_text(None, final, p.string())
+
+    def polygon(self, p):
+        pts = p.points()
+        if len(pts) >= 2:
+            self.area("M" + self.pt(pts[0]) + self.polyline_body(pts[1:]) + "Z", "evenodd")
+
+    def polygon_set(self, p):
+        # (point, edge flag): 0 invisible, 1 visible, 2 close invisible, 3 close visible
+        items = []
+        while p.remaining() > 0:
+            items.append((p.point(), p.enum()))
+        if not items:
+            return
+        fill, edges = [], []
+        first = prev = None
+        for pt, flag in items:
+            if first is None:
+                first = pt
+                fill.append("M" + self.pt(pt))
+            else:
+                fill.append("L" + self.pt(pt))
+            if prev is not None and prev[1] in (1, 3):
+                edges.append("M" + self.pt(prev[0]) + "L" + self.pt(pt))
+            prev = (pt, flag)
+            if flag >= 2:
+                fill.append("Z")
+                if flag == 3:
+                    edges.append("M" + self.pt(pt) + "L" + self.pt(first))
+                first = prev = None
+        if self.figure is not None:
+            self.figure.append("".join(fill))
+            return
+        self.emit(f'<path{self.area_style(with_edges=False)} fill-rule="evenodd" d="{"".join(fill)}"/>')
+        st = self.st
+        if st.edge_visible and edges and st.interior_style != 0:
+            style = self.stroke_attrs(st.edge_colour, self.width(st.edge_width, st.edge_width_mode),
+                                      st.edge_type, st.edge_cap, st.edge_join)
+            self.emit(f'<path fill="none"{style} d="{"".join(edges)}"/>')
+
+    def rectangle(self, p):
+        (x1, y1), (x2, y2) = p.point(), p.point()
+        corners = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+        self.area("M" + self.pt(corners[0]) + self.polyline_body(corners[1:]) + "Z")
+
+    def circle(self, p):
+        c = p.point()
+        r = abs(p.vdc())
+        start, body, _ = self.arc_body(c, (r, 0.0), (0.0, r), 0.0, 2 * math.pi)
+        self.area("M" + self.pt(start) + body + "Z")
+
+    def arc_3_point(self, a, b, e, close_type=None):
+        ax, ay = a
+        bx, by = b
+        ex, ey = e
+        det = 2 * (ax * (by - ey) + bx * (ey - ay) + ex * (ay - by))
+        if abs(det) < 1e-12:
+            self.stroke(a, self.polyline_body([e]))
+            return
+        sa, sb, se = ax * ax + ay * ay, bx * bx + by * by, ex * ex + ey * ey
+        c = ((sa * (by - ey) + sb * (ey - ay) + se * (ay - by)) / det,
+             (sa * (ex - bx) + sb * (ax - ex) + se * (bx - ax)) / det)
+        r = math.hypot(ax - c[0], ay - c[1])
+        ta = math.atan2(ay - c[1], ax - c[0])
+        tb = (math.atan2(by - c[1], bx - c[0]) - ta) % (2 * math.pi)
+        te = (math.atan2(ey - c[1], ex - c[0]) - ta) % (2 * math.pi)
+        if tb <= te:
+            # counter-clockwise reaches the intermediate point first
+            start, body, end = self.arc_body(c, (r, 0.0), (0.0, r), ta, te)
+        else:
+            start, body, end = self.arc_body(c, (r, 0.0), (0.0, -r), -ta, 2 * math.pi - te)
+        if close_type is None:
+            self.stroke(start, body)
+        else:
+            self.area(self.close_arc(c, start, body, end, close_type))
+
+    def circular_arc_3_point(self, p):
+        self.arc_3_point(p.point(), p.point(), p.point())
+
+    def circular_arc_3_point_close(self, p):
+        a, b, e = p.point(), p.point(), p.point()
+        self.arc_3_point(a, b, e, p.enum())
+
+    def circular_arc_centre(self, p, close=False):
+        c = p.point()
+        d0 = (p.vdc(), p.vdc())
+        d1 = (p.vdc(), p.vdc())
+        r = abs(p.vdc())
+        u, v = (r, 0.0), (0.0, r)
+        t0, span = self.arc_span(u, v, d0, d1)
+        start, body, end = self.arc_body(c, u, v, t0, span)
+        if close:
+            self.area(self.close_arc(c, start, body, end, p.enum()))
+        else:
+            self.stroke(start, body)
+
+    def circular_arc_centre_close(self, p):
+        self.circular_arc_centre(p, close=True)
+
+    def ellipse(self, p):
+        c, a, b = p.point(), p.point(), p.point()
+        u = (a[0] - c[0], a[1] - c[1])
+        v = (b[0] - c[0], b[1] - c[1])
+        start, body, _ = self.arc_body(c, u, v, 0.0, 2 * math.pi)
+        self.area("M" + self.pt(start) + body + "Z")
+
+    def elliptical_arc(self, p, close=False):
+        c, a, b = p.point(), p.point(), p.point()
+        d0 = (p.vdc(), p.vdc())
+        d1 = (p.vdc(), p.vdc())
+        u = (a[0] - c[0], a[1] - c[1])
+        v = (b[0] - c[0], b[1] - c[1])
+        t0, span = self.arc_span(u, v, d0, d1)
+        start, body, end = self.arc_body(c, u, v, t0, span)
+        if close:
+            self.area(self.close_arc(c, start, body, end, p.enum()))
+        else:
+            self.stroke(start, body)
+
+    def elliptical_arc_close(self, p):
+        self.elliptical_arc(p, close=True)
+
+    def polybezier(self, p):
+        # 1: independent 4-point curves, 2: continuous (4 points, then 3 per curve)
+        continuity = p.index()
+        pts = p.points()
+        if len(pts) < 4:
+            return
+        if continuity == 1:
+            for i in range(0, len(pts) - 3, 4):
+                a, b, c, d = pts[i:i + 4]
+                self.stroke(a, f"C{self.pt(b)} {self.pt(c)} {self.pt(d)}")
+            return
+        body = []
+        for i in range(1, len(pts) - 2, 3):
+            b, c, d = pts[i:i + 3]
+            body.append(f"C{self.pt(b)} {self.pt(c)} {self.pt(d)}")
+        self.stroke(pts[0], "".join(body))
+
+    # attributes
+
+    def set_attr(name, read):
+        def handler(self, p):
+            setattr(self.st, name, read(p))
+        return handler
+
+    line_type = set_attr("line_type", _Params.index)
+    line_colour = set_attr("line_colour", _Params.colour)
+    text_font_index = set_attr("font_index", _Params.index)
+    text_colour = set_attr("text_colour", _Params.colour)
+    char_height = set_attr("char_height", _Params.vdc)
+    interior_style = set_attr("interior_style", _Params.enum)
+    fill_colour = set_attr("fill_colour", _Params.colour)
+    edge_type = set_attr("edge_type", _Params.index)
+    edge_colour = set_attr("edge_colour", _Params.colour)
+    line_join = set_attr("line_join", _Params.index)
+    edge_join = set_attr("edge_join", _Params.index)
+    del set_attr
+
+    def line_width(self, p):
+        self.st.line_width = p.vdc() if self.st.line_width_mode == 0 else p.real()
+
+    def edge_width(self, p):
+        self.st.edge_width = p.vdc() if self.st.edge_width_mode == 0 else p.real()
+
+    def edge_visibility(self, p):
+        self.st.edge_visible = p.enum() == 1
+
+    def char_orientation(self, p):
+        self.st.char_up = (p.vdc(), p.vdc())
+        self.st.char_base = (p.vdc(), p.vdc())
+
+    def text_alignment(self, p):
+        self.st.text_align = (p.enum(), p.enum())
+
+    def line_cap(self, p):
+        self.st.line_cap = p.index()
+
+    def edge_cap(self, p):
+        self.st.edge_cap = p.index()
+
+    def colour_table(self, p):
+        i = p.colour_index()
+        while p.remaining() >= 3 * self.st.colour_prec // 8:
+            self.st.colour_table[i] = p.direct_colour()
+            i += 1
+
+
+HANDLERS = {
+    (0, 4): _Converter.begin_picture_body,
+    (0, 5): _Converter.end_picture,
+    (0, 8): _Converter.begin_figure,
+    (0, 9): _Converter.end_figure,
+    (0, 21): _Converter.begin_aps,
+    (0, 23): _Converter.end_aps,
+    (1, 3): _Converter.vdc_type,
+    (1, 4): _Converter.integer_precision,
+    (1, 5): _Converter.real_precision,
+    (1, 6): _Converter.index_precision,
+    (1, 7): _Converter.colour_precision,
+    (1, 8): _Converter.colour_index_precision,
+    (1, 10): _Converter.colour_value_extent,
+    (1, 12): _Converter.defaults_replacement,
+    (1, 13): _Converter.font_list,
+    (2, 1): _Converter.scaling_mode,
+    (2, 2): _Converter.colour_selection_mode,
+    (2, 3): _Converter.line_width_mode,
+    (2, 5): _Converter.edge_width_mode,
+    (2, 6): _Converter.vdc_extent,
+    (2, 7): _Converter.background_colour,
+    (3, 1): _Converter.vdc_integer_precision,
+    (3, 2): _Converter.vdc_real_precision,
+    (3, 4): _Converter.transparency,
+    (4, 1): _Converter.polyline,
+    (4, 2): _Converter.disjoint_polyline,
+    (4, 4): _Converter.text,
+    (4, 5): _Converter.restricted_text,
+    (4, 6): _Converter.append_text,
+    (4, 7): _Converter.polygon,
+    (4, 8): _Converter.polygon_set,
+    (4, 11): _Converter.rectangle,
+    (4, 12): _Converter.circle,
+    (4, 13): _Converter.circular_arc_3_point,
+    (4, 14): _Converter.circular_arc_3_point_close,
+    (4, 15): _Converter.circular_arc_centre,
+    (4, 16): _Converter.circular_arc_centre_close,
+    (4, 17): _Converter.ellipse,
+    (4, 18): _Converter.elliptical_arc,
+    (4, 19): _Converter.elliptical_arc_close,
+    (4, 26): _Converter.polybezier,
+    (5, 2): _Converter.line_type,
+    (5, 3): _Converter.line_width,
+    (5, 4): _Converter.line_colour,
+    (5, 10): _Converter.text_font_index,
+    (5, 14): _Converter.text_colour,
+    (5, 15): _Converter.char_height,
+    (5, 16): _Converter.char_orientation,
+    (5, 18): _Converter.text_alignment,
+    (5, 22): _Converter.interior_style,
+    (5, 23): _Converter.fill_colour,
+    (5, 27): _Converter.edge_type,
+    (5, 28): _Converter.edge_width,
+    (5, 29): _Converter.edge_colour,
+    (5, 30): _Converter.edge_visibility,
+    (5, 34): _Converter.colour_table,
+    (5, 37): _Converter.line_cap,
+    (5, 38): _Converter.line_join,
+    (5, 44): _Converter.edge_cap,
+    (5, 45): _Converter.edge_join,
+}
+
+
+def cgm_to_svg(data: bytes) -> str:
+    """
+    Convert the first picture of a binary CGM to an SVG document.
+    Raises CgmError for input that isn't a usable binary CGM, including
+    truncated or out-of-order element streams the converter trips over.
+    """
+    if len(data) < 4 or (int.from_bytes(data[:2], "big") >> 5) != 1:
+        raise CgmError("not a binary-encoded CGM (no BEGIN METAFILE)")
+    try:
+        return _Converter().run(data)
+    except CgmError:
+        raise
+    except Exception as e:
+        raise CgmError(f"malformed CGM: {type(e).__name__}: {e}") from e
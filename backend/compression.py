@@ -0,0 +1,148 @@
+"""
+Negotiated response compression for bodies of at least COMPRESS_MIN_BYTES:
+brotli when the client accepts it and the optional `brotli` package is
+installed, otherwise gzip. Responses that are already encoded (prebuilt .gz
+artifacts, .svg.gz), 206 ranges and binary media types pass through
+untouched. COMPRESSION=0 turns it off.
+
+A plain ASGI middleware rather than a GZipMiddleware subclass: Starlette's
+responder internals change between releases, and this only relies on the
+ASGI message format.
+"""
+import os
+import zlib
+
+import anyio.to_thread
+from starlette.datastructures import Headers, MutableHeaders
+
+from backend.http_cache import preferred_encoding
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+ENABLED = os.environ.get("COMPRESSION", "1") != "0"
+MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", 1024))
+# Level 9 costs several times level 6 on JSON for a few % smaller output
+GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", 5))
+# Compress bodies at least this big off the event loop
+THREAD_MIN_BYTES = 128 * 1024
+
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+# Already-compressed media; "type/*" entries match a whole top-level type
+EXCLUDED_CONTENT_TYPES = frozenset({
+    "application/gzip", "application/x-gzip", "application/zip",
+    "image/avif", "image/gif", "image/jpeg", "image/png", "image/webp",
+    "font/woff", "font/woff2", "text/event-stream", "audio/*", "video/*",
+})
+
+
+class GzipCodec:
+    def __init__(self, level: int):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        return self._z.compress(body) + self._z.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+class BrotliCodec:
+    def __init__(self, quality: int):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        out = self._c.process(body)
+        return out + (self._c.flush() if more_body else self._c.finish())
+
+
+def _excluded(headers: Headers) -> bool:
+    media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+    return media_type in EXCLUDED_CONTENT_TYPES or media_type.partition("/")[0] + "/*" in EXCLUDED_CONTENT_TYPES
+
+
+class _Responder:
+    """
+    Wraps `send` for one request. The start message is held back until the
+    first body chunk shows whether the response is worth compressing.
+    """
+
+    def __init__(self, send, encoding: str | None, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.passthrough = False
+        self.codec = None
+
+    async def _compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= THREAD_MIN_BYTES:
+            return await anyio.to_thread.run_sync(self.codec.compress, body, more_body)
+        return self.codec.compress(body, more_body)
+
+    async def __call__(self, message) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            self.passthrough = "content-encoding" in headers or message["status"] == 206 or _excluded(headers)
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+
+        if self.passthrough or kind != "http.response.body":
+            if self.start is not None:
+                # e.g. http.response.pathsend: the file goes out as is
+                await self.send(self.start)
+                self.start = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start is None:
+            # a later chunk of a streamed response
+            if self.codec is not None:
+                message["body"] = await self._compress(body, more_body)
+            await self.send(message)
+            return
+
+        start, self.start = self.start, None
+        if len(body) < self.minimum_size and not more_body:
+            await self.send(start)
+            await self.send(message)
+            return
+
+        headers = MutableHeaders(raw=start["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        if self.encoding is not None:
+            self.codec = BrotliCodec(BROTLI_QUALITY) if self.encoding == "br" else GzipCodec(GZIP_LEVEL)
+            message["body"] = await self._compress(body, more_body)
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                del headers["Content-Length"]
+            else:
+                headers["Content-Length"] = str(len(message["body"]))
+            # An encoded body is a different representation: keep the validator
+            # (If-None-Match compares weakly) but stop claiming byte equality
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+        await self.send(start)
+        await self.send(message)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = preferred_encoding(Headers(scope=scope), ENCODINGS)
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size))
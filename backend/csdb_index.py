@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+
+# CSDB_ROOT points the API at another tree holding data/ (e.g. a synthetic CSDB)
+BASE_DIR = Path(os.environ.get("CSDB_ROOT") or Path(__file__).resolve().parent.parent)
+INDEX_PATH = BASE_DIR / "data" / "bike_index.json"
+
+
+def norm_path(p: str) -> str:
+    # Index files written on Windows store backslash paths
+    return p.replace("\\", "/") if isinstance(p, str) else p
+
+
+def abs_path(p: str) -> Path:
+    path = Path(norm_path(p))
+    if not path.is_absolute():
+        path = (BASE_DIR / path).resolve()
+    return path
+
+
+class CsdbIndex:
+    """
+    Immutable in-memory view of bike_index.json.
+    Paths are normalized once at load time; lookups are plain dict gets.
+    """
+
+    def __init__(self, data: dict, mtime_ns: int, generation: int):
+        self.data = data
+        self.mtime_ns = mtime_ns
+        self.generation = generation
+
+        self.data_modules: list[dict] = data.get("data_modules", [])
+        self.entries: list[dict] = []           # parsed DMs with a path
+        self.by_path: dict[str, dict] = {}      # normalized path -> entry (incl. parse errors)
+        self.by_dmcode: dict[str, dict] = {}    # dmCode -> entry
+        self._verified: dict[str, tuple[int, int]] = {}  # path -> (mtime_ns, size) known to match the index
+        self._mismatched: dict[str, tuple[int, int]] = {}  # path -> (mtime_ns, size) known not to
+        self._queued: set[str] = set()                   # paths waiting for the verifier thread
+
+        for dm in self.data_modules:
+            p = dm.get("path")
+            if not p:
+                continue
+            dm["path"] = norm_path(p)
+            self.by_path[dm["path"]] = dm
+            if dm.get("parse_error"):
+                continue
+            self.entries.append(dm)
+            if dm.get("dmCode"):
+                self.by_dmcode[dm["dmCode"]] = dm
+
+    def meta(self, path: str) -> dict:
+        dm = self.by_path.get(norm_path(path)) or {}
+        return {"dmCode": dm.get("dmCode"), "dmTitle": dm.get("dmTitle")}
+
+    def path_for_dmcode(self, dm_code: str) -> str | None:
+        dm = self.by_dmcode.get(dm_code)
+        return dm["path"] if dm else None
+
+    def verified_sha256(self, path: str, *, block: bool = False) -> str | None:
+        """
+        Return the index-time content hash of a DM if the file on disk still
+        matches it, else None.
+        Size + mtime is the fast check. If only the mtime differs (fresh
+        checkout, copied dataset) the content hash decides, once per mtime:
+        with block=True it is computed here; otherwise the file is trusted on
+        its size until the verifier thread has hashed it, so request handlers
+        never read whole DMs just to compare hashes.
+        """
+        dm = self.by_path.get(norm_path(path))
+        info = dm.get("file") if dm else None
+        if not info:
+            return None
+
+        try:
+            p = abs_path(dm["path"])
+            st = p.stat()
+        except OSError:
+            return None
+
+        key = (st.st_mtime_ns, st.st_size)
+        if self._verified.get(dm["path"]) == key:
+            return info.get("sha256")
+        if self._mismatched.get(dm["path"]) == key or st.st_size != info.get("size"):
+            return None
+        if st.st_mtime_ns != info.get("mtime_ns"):
+            if not block:
+                self._schedule_verify(dm["path"])
+                return info.get("sha256")
+            return info.get("sha256") if self._verify(dm["path"]) else None
+
+        self._verified[dm["path"]] = key
+        return info.get("sha256")
+
+    def _verify(self, path: str) -> bool:
+        """Hash one DM and record whether it still matches the index."""
+        dm = self.by_path[path]
+        info = dm["file"]
+        try:
+            p = abs_path(path)
+            st = p.stat()
+            same = st.st_size == info.get("size") and (
+                st.st_mtime_ns == info.get("mtime_ns")
+                or hashlib.sha256(p.read_bytes()).hexdigest() == info.get("sha256")
+            )
+        except OSError:
+            return False
+        key = (st.st_mtime_ns, st.st_size)
+        if same:
+            self._verified[path] = key
+            self._mismatched.pop(path, None)
+        else:
+            self._mismatched[path] = key
+        return same
+
+    def _schedule_verify(self, path: str) -> None:
+        with _verify_lock:
+            if path in self._queued:
+                return
+            self._queued.add(path)
+            _ensure_verifier_locked()
+        _verify_queue.put((self, path))
+
+    def verify_in_background(self) -> None:
+        """
+        Queue every indexed DM for the verifier thread (startup warm-up), so
+        files whose mtime changed since indexing are hashed before requests
+        need them.
+        """
+        for dm in self.entries:
+            if dm.get("file"):
+                self._schedule_verify(dm["path"])
+
+    def fresh_applic_facts(self, path: str) -> dict | None:
+        """
+        Return the index-time applic facts for a DM, or None if the index has
+        none or the file changed since it was indexed.
+        """
+        dm = self.by_path.get(norm_path(path))
+        if not dm or dm.get("applic_facts") is None:
+            return None
+        if self.verified_sha256(path) is None:
+            return None
+        return dm["applic_facts"]
+
+
+_verify_lock = threading.Lock()
+_verify_queue: "queue.SimpleQueue[tuple[CsdbIndex, str]]" = queue.SimpleQueue()
+_verifier: threading.Thread | None = None
+
+
+def _run_verifier() -> None:
+    while True:
+        index, path = _verify_queue.get()
+        try:
+            index._verify(path)
+        finally:
+            with _verify_lock:
+                index._queued.discard(path)
+
+
+def _ensure_verifier_locked() -> None:
+    global _verifier
+    if _verifier is None or not _verifier.is_alive():
+        _verifier = threading.Thread(target=_run_verifier, name="csdb-verify", daemon=True)
+        _verifier.start()
+
+
+_lock = threading.Lock()
+_current: CsdbIndex | None = None
+
+
+def get_index() -> CsdbIndex:
+    """
+    Return the current index snapshot, reloading it if bike_index.json changed
+    on disk. A reload builds a complete new snapshot before swapping it in, so
+    callers holding the old one keep a consistent view.
+    """
+    global _current
+    mtime_ns = INDEX_PATH.stat().st_mtime_ns
+    cur = _current
+    if cur is not None and cur.mtime_ns == mtime_ns:
+        return cur
+
+    with _lock:
+        cur = _current
+        if cur is not None and cur.mtime_ns == mtime_ns:
+            return cur
+        data = json.loads(INDEX_PATH.read_text(encoding="utf-8"))
+        generation = cur.generation + 1 if cur is not None else 1
+        _current = CsdbIndex(data, mtime_ns, generation)
+        return _current
+
+
+def stats() -> dict:
+    cur = _current
+    if cur is None:
+        return {"loaded": False}
+    return {
+        "loaded": True,
+        "generation": cur.generation,
+        "data_modules": len(cur.data_modules),
+        "entries": len(cur.entries),
+        "dm_codes": len(cur.by_dmcode),
+    }
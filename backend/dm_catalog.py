@@ -1,34 +1,218 @@
-import json
+import os
+import sqlite3
+import threading
 from pathlib import Path
+from typing import NamedTuple
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-INDEX_PATH = BASE_DIR / "data" / "bike_index.json"
+from backend.applic_resolver import applicable_paths, decode_cursor, encode_cursor
+from backend.csdb_index import BASE_DIR, INDEX_PATH, get_index
+
+# Written by tools/index_bike_samples.py. Optional: without a catalog that
+# matches the current bike_index.json, queries run over the JSON index.
+CATALOG_PATH = Path(os.environ.get("CSDB_CATALOG_PATH", BASE_DIR / "data" / "csdb_catalog.sqlite"))
+USE_CATALOG = os.environ.get("CSDB_CATALOG", "1") != "0"
+CATALOG_VERSION = 3
+
+# dmCode attributes that can be filtered on (exact match)
+DMCODE_FIELDS = (
+    "modelIdentCode", "systemDiffCode", "systemCode",
+    "subSystemCode", "subSubSystemCode", "assyCode",
+    "disassyCode", "disassyCodeVariant",
+    "infoCode", "infoCodeVariant", "itemLocationCode",
+)
+
+_local = threading.local()      # per-thread read-only connection
+_lock = threading.Lock()
+_stats = {"sqlite_queries": 0, "json_queries": 0, "catalog_errors": 0}
 
-def load_index() -> dict:
-    return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
 
 def filename_from_any_path(p: str) -> str:
     # Normalize Windows and Linux paths
     return p.replace("\\", "/").split("/")[-1]
 
-def list_dms(only_dmc: bool = True) -> list[dict]:
-    idx = load_index()
-    out = []
-    for dm in idx["data_modules"]:
-        p = dm.get("path")
-        if not p or dm.get("parse_error"):
+
+def _catalog() -> sqlite3.Connection | None:
+    """
+    This thread's catalog connection, or None when there is no catalog or it
+    was built from a different bike_index.json than the one on disk.
+    The indexer rewrites the catalog in place, and a WAL reader sees each
+    committed rewrite, so one connection per thread lasts for the process.
+    """
+    if not USE_CATALOG:
+        return None
+    try:
+        index_mtime_ns = INDEX_PATH.stat().st_mtime_ns
+        conn = getattr(_local, "conn", None)
+        if conn is None:
+            if not CATALOG_PATH.exists():
+                return None
+            conn = sqlite3.connect(f"{CATALOG_PATH.resolve().as_uri()}?mode=ro", uri=True)
+            _local.conn, _local.verified = conn, None
+        if _local.verified != index_mtime_ns:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            row = conn.execute("SELECT value FROM meta WHERE key = 'index_mtime_ns'").fetchone()
+            if version != CATALOG_VERSION or row is None or int(row[0]) != index_mtime_ns:
+                return None
+            _local.verified = index_mtime_ns
+        return conn
+    except (OSError, sqlite3.Error):
+        _local.conn = None
+        with _lock:
+            _stats["catalog_errors"] += 1
+        return None
+
+
+class DmQuery(NamedTuple):
+    """
+    /dms filters. `q` is a substring of dmCode, dmTitle or path, compared
+    casefolded (full Unicode case-insensitivity, the same on both sources);
+    `selected` keeps only DMs the resolver finds applicable to those labels.
+    """
+    only_dmc: bool = True
+    fields: dict = {}
+    q: str | None = None
+    has_applicability: bool | None = None
+    selected: list[str] | None = None
+
+
+def search_text(dm_code: str | None, dm_title: str | None, path: str) -> str:
+    # Must match tools/index_bike_samples.py (catalog searchText): one field per line
+    return "\n".join((dm_code or "", dm_title or "", path)).casefold()
+
+
+def _iter_sqlite(conn: sqlite3.Connection, query: DmQuery, applicable: frozenset | None, start: int):
+    """
+    Yield (listing position, item) for matching DMs from `start` on, in
+    listing order. Every filter column has a (column, listOrd) index.
+    """
+    where = ["listOrd >= ?"]
+    args: list = [start]
+    if query.only_dmc:
+        where.append("isDmc = 1")
+    for field, value in query.fields.items():
+        where.append(f"{field} = ?")
+        args.append(value)
+    if query.has_applicability is not None:
+        where.append("hasApplicability = ?")
+        args.append(int(query.has_applicability))
+    if query.q:
+        where.append("instr(searchText, ?) > 0")
+        args.append(query.q.casefold())
+    sql = (
+        "SELECT listOrd, path, dmCode, dmTitle, hasApplicability FROM dms WHERE "
+        + " AND ".join(where) + " ORDER BY listOrd"
+    )
+    for pos, p, code, title, has_applic in conn.execute(sql, args):
+        if applicable is not None and p not in applicable:
             continue
+        yield pos, {"path": p, "dmCode": code, "dmTitle": title, "has_applicability": bool(has_applic)}
+
+
+_sorted_lock = threading.Lock()
+_sorted: tuple[int, list[tuple[dict, dict, str]]] | None = None    # (index generation, listing)
+
 
-        fname = filename_from_any_path(p)
-        if only_dmc and (not fname.upper().startswith("DMC-")):
+def _listing(idx) -> list[tuple[dict, dict, str]]:
+    """
+    Every parsed DM as (index entry, /dms item, search text) in listing order,
+    sorted once per index generation. Positions match the catalog's listOrd.
+    """
+    global _sorted
+    cur = _sorted
+    if cur is not None and cur[0] == idx.generation:
+        return cur[1]
+    with _sorted_lock:
+        if _sorted is None or _sorted[0] != idx.generation:
+            listing = [
+                (dm, {
+                    "path": dm["path"],
+                    "dmCode": dm.get("dmCode"),
+                    "dmTitle": dm.get("dmTitle"),
+                    "has_applicability": dm.get("has_applicability", False),
+                }, search_text(dm.get("dmCode"), dm.get("dmTitle"), dm["path"]))
+                for dm in idx.entries
+            ]
+            listing.sort(key=lambda x: ((x[1]["dmCode"] or ""), (x[1]["dmTitle"] or "")))
+            _sorted = (idx.generation, listing)
+        return _sorted[1]
+
+
+def _iter_json(idx, query: DmQuery, applicable: frozenset | None, start: int):
+    needle = query.q.casefold() if query.q else None
+    listing = _listing(idx)
+    for pos in range(start, len(listing)):
+        dm, item, haystack = listing[pos]
+        if query.only_dmc and not filename_from_any_path(item["path"]).upper().startswith("DMC-"):
+            continue
+        if query.fields:
+            parts = dm.get("dmCodeParts") or {}
+            if any(parts.get(k) != v for k, v in query.fields.items()):
+                continue
+        if query.has_applicability is not None and bool(item["has_applicability"]) != query.has_applicability:
+            continue
+        if needle and needle not in haystack:
             continue
+        if applicable is not None and item["path"] not in applicable:
+            continue
+        yield pos, item
+
+
+def _page(rows, generation: int, limit: int | None) -> dict:
+    items = []
+    next_cursor = None
+    for pos, item in rows:
+        if limit is not None and len(items) == limit:
+            next_cursor = encode_cursor(generation, pos)
+            break
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def query_dms(query: DmQuery, limit: int | None = None, cursor: str | None = None) -> dict:
+    """
+    One page of DMs in (dmCode, dmTitle) order, plus `next_cursor` when more
+    match. Without `limit` every match is returned. Work is proportional to
+    the DMs scanned up to the end of the page, never a sort of the CSDB.
+    Served from the SQLite catalog when it is current, otherwise from the
+    JSON index. Cursors are listing positions tied to the bike_index.json
+    they were issued for, so both sources accept each other's cursors.
+    """
+    unknown = set(query.fields) - set(DMCODE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown dmCode fields: {sorted(unknown)}")
+    applicable = applicable_paths(query.selected) if query.selected is not None else None
+
+    conn = _catalog()
+    if conn is not None:
+        generation = _local.verified
+        start = decode_cursor(cursor, generation) if cursor else 0
+        try:
+            page = _page(_iter_sqlite(conn, query, applicable, start), generation, limit)
+            with _lock:
+                _stats["sqlite_queries"] += 1
+            return page
+        except sqlite3.Error:
+            _local.conn = None
+            with _lock:
+                _stats["catalog_errors"] += 1
+
+    idx = get_index()
+    start = decode_cursor(cursor, idx.mtime_ns) if cursor else 0
+    page = _page(_iter_json(idx, query, applicable, start), idx.mtime_ns, limit)
+    with _lock:
+        _stats["json_queries"] += 1
+    return page
+
+
+def list_dms(only_dmc: bool = True, filters: dict | None = None) -> list[dict]:
+    """
+    Every DM ordered by (dmCode, dmTitle); `filters` maps DMCODE_FIELDS to
+    the exact value required.
+    """
+    fields = {k: v for k, v in (filters or {}).items() if v is not None}
+    return query_dms(DmQuery(only_dmc=only_dmc, fields=fields))["items"]
 
-        out.append({
-            "path": p.replace("\\", "/"),
-            "dmCode": dm.get("dmCode"),
-            "dmTitle": dm.get("dmTitle"),
-            "has_applicability": dm.get("has_applicability", False),
-        })
 
-    out.sort(key=lambda x: ((x["dmCode"] or ""), (x["dmTitle"] or "")))
-    return out
\ No newline at end of file
+def stats() -> dict:
+    with _lock:
+        return {**_stats, "enabled": USE_CATALOG, "path": str(CATALOG_PATH)}
@@ -1,38 +1,31 @@
 from pathlib import Path
-from lxml import etree
 
-BASE_DIR = Path(__file__).resolve().parent.parent
+from backend.applic_facts import applic_text_for_dm
+from backend.csdb_index import BASE_DIR
 
-def local_name(tag) -> str:
-    if not isinstance(tag, str):
-        return ""
-    if tag.startswith("{"):
-        return tag.split("}", 1)[1]
-    return tag
 
-def extract_applic_text_from_xml_bytes(xml_bytes: bytes) -> str | None:
-    try:
-        root = etree.fromstring(xml_bytes)
-        for el in root.iter():
-            if local_name(el.tag) == "applic":
-                txt = " ".join("".join(el.itertext()).split())
-                return txt or None
-    except Exception:
-        return None
-    return None
-
-def load_dm_details(path: str) -> dict:
+def load_dm_details(path: str, include_xml: bool = True) -> dict:
+    """
+    `applic_text` comes from the index when it is current for the file, else
+    from a streaming read that stops at the first <applic>; the DM is never
+    parsed into a tree here. `include_xml=False` also skips reading the whole
+    document; the raw XML is better fetched in windows from /dm-xml.
+    """
     path = path.replace("\\", "/")
     p = Path(path)
     if not p.is_absolute():
         p = (BASE_DIR / p).resolve()
 
-    xml_bytes = p.read_bytes()
-    xml = xml_bytes.decode("utf-8", errors="ignore")
-    applic_text = extract_applic_text_from_xml_bytes(xml_bytes)
+    try:
+        applic_text = applic_text_for_dm(path)
+    except Exception:
+        applic_text = None
 
-    return {
+    out = {
         "path": path,
-        "xml": xml,
-        "applic_text": applic_text
+        "applic_text": applic_text,
+        "size": p.stat().st_size,
     }
+    if include_xml:
+        out["xml"] = p.read_bytes().decode("utf-8", errors="ignore")
+    return out
@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 SPLIT_RE = re.compile(r"(\(|\)|\band\b|\bor\b)", re.IGNORECASE)
 
@@ -61,17 +62,130 @@ def eval_rpn(rpn, selected_set):
                 stack.append(tok in selected_set)
     return bool(stack[-1]) if stack else False
 
-def evaluate(expr: str, selected: list[str]) -> bool:
-    expr_norm = " ".join(expr.split()).strip()
-    low = expr_norm.lower()
+class ApplicExprError(ValueError):
+    pass
 
-    if low == "all":
-        return True
 
-    if low.startswith("all "):
-        if (" and " not in low) and (" or " not in low) and ("(" not in low) and (")" not in low):
-            return True
+def _build_node(rpn):
+    """
+    Turn RPN into a small expression tree:
+    ("true",) | ("false",) | ("label", name) | ("and", [operands]) | ("or", [operands])
+    Mirrors eval_rpn: the result is whatever ends up on top of the stack.
+    Chains of one operator are flattened into a single n-ary node, so a long
+    flat "a or b or c ..." is one level deep, not one level per term.
+    """
+    stack = []
+    for tok in rpn:
+        if tok in ("and", "or"):
+            if len(stack) < 2:
+                raise ApplicExprError(f"operator '{tok}' is missing an operand")
+            b = stack.pop()
+            a = stack.pop()
+            # nodes built here are referenced once, so extending a's list is safe
+            operands = a[1] if a[0] == tok else [a]
+            operands.extend(b[1] if b[0] == tok else (b,))
+            stack.append((tok, operands))
+        elif tok == "ALL_TRUE":
+            stack.append(("true",))
+        else:
+            stack.append(("label", tok))
+    return stack[-1] if stack else ("false",)
+
+
+def _build_fn(node):
+    kind = node[0]
+    if kind == "true":
+        return lambda s: True
+    if kind == "false":
+        return lambda s: False
+    if kind == "label":
+        label = node[1]
+        return lambda s: label in s
+    operands = node[1]
+    if all(op[0] == "label" for op in operands):
+        labels = frozenset(op[1] for op in operands)
+        if kind == "and":
+            return lambda s: labels <= s
+        return lambda s: not labels.isdisjoint(s)
+    fns = tuple(_build_fn(op) for op in operands)
+    if kind == "and":
+        return lambda s: all(f(s) for f in fns)
+    return lambda s: any(f(s) for f in fns)
+
+
+def _collect_labels(node, out: set):
+    stack = [node]
+    while stack:
+        n = stack.pop()
+        if n[0] == "label":
+            out.add(n[1])
+        elif n[0] in ("and", "or"):
+            stack.extend(n[1])
+    return out
+
+
+class CompiledExpr:
+    """
+    Reusable predicate for one applicability expression.
+    A malformed expression compiles fine but raises ApplicExprError when called.
+    """
+
+    __slots__ = ("text", "node", "labels", "error", "_fn")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.node = None
+        self.labels = frozenset()
+        self.error = None
+        self._fn = None
+
+        low = text.lower()
+        if low == "all" or (
+            low.startswith("all ")
+            and (" and " not in low) and (" or " not in low) and ("(" not in low) and (")" not in low)
+        ):
+            self.node = ("true",)
+        else:
+            try:
+                self.node = _build_node(to_rpn(tokenize(text)))
+            except ApplicExprError as e:
+                self.error = str(e)
+                return
+
+        self.labels = frozenset(_collect_labels(self.node, set()))
+        try:
+            self._fn = _build_fn(self.node)
+        except RecursionError:
+            # only deeply alternating and/or nesting gets here; flat chains are one level
+            self.error = "expression is nested too deeply"
+
+    def __call__(self, selected) -> bool:
+        if self.error is not None:
+            raise ApplicExprError(self.error)
+        if not isinstance(selected, (set, frozenset)):
+            selected = set(selected)
+        try:
+            return bool(self._fn(selected))
+        except RecursionError:
+            raise ApplicExprError("expression is nested too deeply") from None
+
+    def __repr__(self) -> str:
+        return f"CompiledExpr({self.text!r})"
+
+
+@lru_cache(maxsize=4096)
+def _compile_normalized(expr_norm: str) -> CompiledExpr:
+    return CompiledExpr(expr_norm)
+
+
+def compile_expr(expr: str) -> CompiledExpr:
+    return _compile_normalized(" ".join(expr.split()).strip())
+
+
+def cache_stats() -> dict:
+    info = _compile_normalized.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
+
 
-    tokens = tokenize(expr_norm)
-    rpn = to_rpn(tokens)
-    return eval_rpn(rpn, set(selected))
+def evaluate(expr: str, selected) -> bool:
+    return compile_expr(expr)(selected)
@@ -0,0 +1,37 @@
+"""
+Opt-in fast JSON responses (FAST_JSON=1).
+
+Endpoints with large payloads pass their result through respond(). With
+FAST_JSON on, it becomes a response rendered by orjson straight from the
+dicts, skipping FastAPI's jsonable_encoder walk and the stdlib encoder.
+Otherwise the value is returned as-is and FastAPI encodes it as before.
+"""
+import os
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+ENABLED = os.environ.get("FAST_JSON", "0") == "1" and orjson is not None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson when available; same compact UTF-8 output.
+    """
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
+
+def json_response_class() -> type[JSONResponse]:
+    return FastJSONResponse if ENABLED else JSONResponse
+
+
+def respond(content):
+    return FastJSONResponse(content) if ENABLED else content
@@ -0,0 +1,153 @@
+import base64
+
+import numpy as np
+
+from backend.applic_resolver import collect_applic_texts, load_group_exprs
+from backend.csdb_index import get_index
+from backend.eval_applic_expr import ApplicExprError, CompiledExpr, compile_expr
+
+FORMATS = ("bitset", "indices")
+
+
+class LabelTable:
+    """
+    Interns labels to column ids and holds the N x L selection matrix.
+    """
+
+    def __init__(self, selections: list[list[str]]):
+        self.ids: dict[str, int] = {}
+        for sel in selections:
+            for label in sel:
+                self.ids.setdefault(label, len(self.ids))
+
+        self.n = len(selections)
+        self.matrix = np.zeros((self.n, max(len(self.ids), 1)), dtype=bool)
+        for row, sel in enumerate(selections):
+            for label in sel:
+                self.matrix[row, self.ids[label]] = True
+
+    def column(self, label: str) -> np.ndarray:
+        i = self.ids.get(label)
+        if i is None:
+            # nobody selected this label
+            return np.zeros(self.n, dtype=bool)
+        return self.matrix[:, i]
+
+
+def eval_node(node, table: LabelTable) -> np.ndarray:
+    kind = node[0]
+    if kind == "true":
+        return np.ones(table.n, dtype=bool)
+    if kind == "false":
+        return np.zeros(table.n, dtype=bool)
+    if kind == "label":
+        return table.column(node[1])
+    cols = [eval_node(op, table) for op in node[1]]
+    return np.logical_and.reduce(cols) if kind == "and" else np.logical_or.reduce(cols)
+
+
+def eval_compiled(expr: CompiledExpr, table: LabelTable) -> np.ndarray:
+    """
+    Evaluate one compiled expression for every selection at once.
+    Raises ApplicExprError for malformed expressions, like calling it does.
+    """
+    if expr.error is not None:
+        raise ApplicExprError(expr.error)
+    try:
+        return eval_node(expr.node, table)
+    except RecursionError:
+        raise ApplicExprError("expression is nested too deeply") from None
+
+
+def applicability_matrix(selections: list[list[str]]) -> tuple[list[str], np.ndarray, list[dict]]:
+    """
+    Return (paths, matrix, errors) where matrix[i, j] is True if DM j applies
+    to selection i. Same rules as resolve_applicability (strict mode):
+    - <applic> "All" => applicable
+    - otherwise evaluate the <applic> expression; read or parse errors exclude
+    - no <applic> => applicable only if a known applicability group matches
+    `errors` lists every DM excluded by a read or parse error ({path, error})
+    and every malformed group expression ({group, error}); such groups match
+    nobody, so the DMs without <applic> are decided by the remaining groups.
+    """
+    index = get_index()
+    rows = collect_applic_texts(index)
+    table = LabelTable(selections)
+
+    n = len(selections)
+    matrix = np.zeros((n, len(rows)), dtype=bool)
+    errors: list[dict] = []
+
+    group_any = None
+    by_text: dict[str, np.ndarray | str] = {}     # applic text -> column, or its parse error
+
+    for j, (path, applic_text, read_error) in enumerate(rows):
+        if read_error:
+            errors.append({"path": path, "error": f"XML read error: {read_error}"})
+            continue
+
+        if applic_text:
+            if applic_text.strip().lower() == "all":
+                matrix[:, j] = True
+                continue
+            if applic_text not in by_text:
+                try:
+                    by_text[applic_text] = eval_compiled(compile_expr(applic_text), table)
+                except ApplicExprError as e:
+                    by_text[applic_text] = f"Applic parse error: {e}"
+            col = by_text[applic_text]
+            if isinstance(col, str):
+                errors.append({"path": path, "error": col})
+            else:
+                matrix[:, j] = col
+            continue
+
+        if group_any is None:
+            group_any = np.zeros(n, dtype=bool)
+            for g in load_group_exprs():
+                try:
+                    group_any |= eval_compiled(g, table)
+                except ApplicExprError as e:
+                    errors.append({"group": g.text, "error": f"Applic parse error: {e}"})
+        matrix[:, j] = group_any
+
+    return [r[0] for r in rows], matrix, errors
+
+
+def encode_row(row: np.ndarray, fmt: str) -> dict:
+    if fmt == "indices":
+        return {"applicable": np.flatnonzero(row).tolist()}
+    # bit j (MSB first) of the packed bytes is DM column j
+    return {"bits": base64.b64encode(np.packbits(row).tobytes()).decode("ascii")}
+
+
+def resolve_fleet(selections: list[list[str]], fmt: str = "bitset") -> dict:
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    paths, matrix, errors = applicability_matrix(selections)
+    index = get_index()
+
+    columns = []
+    for p in paths:
+        m = index.meta(p)
+        columns.append({"path": p, "dmCode": m["dmCode"], "dmTitle": m["dmTitle"]})
+
+    counts = matrix.sum(axis=1).tolist()
+    rows = []
+    for i, sel in enumerate(selections):
+        rows.append({
+            "selected": sel,
+            "applicable_count": counts[i],
+            "excluded_count": len(paths) - counts[i],
+            **encode_row(matrix[i], fmt),
+        })
+
+    return {
+        "format": fmt,
+        "dm_count": len(paths),
+        "selection_count": len(selections),
+        "columns": columns,
+        "rows": rows,
+        "errors": errors,
+    }
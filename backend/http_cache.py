@@ -0,0 +1,101 @@
+"""
+Conditional-request helpers shared by the file and JSON endpoints.
+"""
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+
+from fastapi.responses import FileResponse, Response
+
+
+def make_etag(st: os.stat_result, variant: str = "") -> str:
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}{variant}"'
+
+
+def etag_matches(inm: str, etag: str) -> bool:
+    tags = [t.strip() for t in inm.split(",")]
+    # weak comparison is fine for GET
+    return "*" in tags or any(t.removeprefix("W/") == etag for t in tags)
+
+
+def not_modified(headers, etag: str, st: os.stat_result) -> bool:
+    """
+    If-None-Match wins over If-Modified-Since (RFC 9110 13.2.2).
+    """
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        return etag_matches(inm, etag)
+
+    ims = headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def preferred_encoding(headers, supported: tuple[str, ...]) -> str | None:
+    """
+    The client's most preferred coding among `supported` (listed in server
+    preference order for ties) per Accept-Encoding q-values, or None.
+    Explicitly listed codings override "*".
+    """
+    qs: dict[str, float] = {}
+    for part in (headers.get("accept-encoding") or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qs[coding.strip().lower()] = q
+    star = qs.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in supported:
+        q = qs.get(coding, star)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def accepts_gzip(headers) -> bool:
+    for part in (headers.get("accept-encoding") or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if coding.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") != "q=0"
+    return False
+
+
+def cached_file_response(p: Path, media_type: str, headers=None, cache_control: str = "no-cache"):
+    """
+    FileResponse with a strong ETag (mtime + size), Last-Modified, a cache
+    policy and 304 handling. Byte ranges (Range / If-Range) are handled by
+    FileResponse itself. An SVG with a precompressed sibling (.svg.gz) is
+    served gzip-encoded to clients that accept it.
+    """
+    headers = headers or {}
+    out_headers = {"cache-control": cache_control}
+    variant = ""
+
+    if p.suffix.lower() == ".svg":
+        out_headers["vary"] = "Accept-Encoding"
+        gz = p.with_name(p.name + ".gz")
+        if accepts_gzip(headers) and gz.is_file():
+            p = gz
+            variant = "-gz"
+            out_headers["content-encoding"] = "gzip"
+
+    st = p.stat()
+    etag = make_etag(st, variant)
+    out_headers["etag"] = etag
+    out_headers["last-modified"] = formatdate(st.st_mtime, usegmt=True)
+
+    if not_modified(headers, etag, st):
+        out_headers.pop("content-encoding", None)
+        return Response(status_code=304, headers=out_headers)
+
+    return FileResponse(str(p), media_type=media_type, headers=out_headers, stat_result=st)
@@ -1,12 +1,20 @@
+import bisect
+import os
+import threading
+import time
 from pathlib import Path
 from fastapi import HTTPException
-from fastapi.responses import FileResponse
+from PIL import Image
+
+from backend import icn_derivatives, icn_renditions
+from backend.csdb_index import BASE_DIR
+from backend.http_cache import cached_file_response
 
-BASE_DIR = Path(__file__).resolve().parent.parent
 DATASET_DIR = BASE_DIR / "data" / "S1000D_4-1_Bike_Samples"
 
-# Allowed web-viewable formats
-WEB_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp"}
+# Allowed web-viewable formats, most preferred first
+WEB_EXT_PREFERENCE = (".svg", ".png", ".webp", ".jpg", ".jpeg", ".gif")
+WEB_EXTS = set(WEB_EXT_PREFERENCE)
 
 MIME_MAP = {
     ".png": "image/png",
@@ -17,6 +25,12 @@ MIME_MAP = {
     ".webp": "image/webp",
 }
 
+# ICN file names carry issue + inwork numbers, so a given file never changes meaning
+ICN_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# How often lookups may re-check the dataset folders for added/removed files
+REFRESH_SECONDS = float(os.environ.get("ICN_REFRESH_SECONDS", 5))
+
 def urn_to_candidate_prefix(urn: str) -> str:
     # URN:S1000D:ICN-... -> ICN-...
     u = (urn or "").strip()
@@ -24,38 +38,149 @@ def urn_to_candidate_prefix(urn: str) -> str:
         u = u.split(":", 2)[-1]  # keep ICN-...
     return u
 
+def rendition_rank(p: Path) -> int:
+    ext = p.suffix.lower()
+    if ext in WEB_EXTS:
+        return WEB_EXT_PREFERENCE.index(ext)
+    return len(WEB_EXT_PREFERENCE)
+
+def dir_signature(root: Path) -> tuple:
+    # Directory mtimes change when entries are added, removed or renamed
+    sig = []
+    for dirpath, _, _ in os.walk(root):
+        sig.append((dirpath, os.stat(dirpath).st_mtime_ns))
+    return tuple(sig)
+
+
+class IcnRegistry:
+    """
+    Sorted upper-cased file names with each name's renditions ranked by
+    WEB_EXT_PREFERENCE. Prefix lookups are a bisect plus a short scan.
+    """
+
+    def __init__(self, root: Path):
+        self.signature = dir_signature(root) if root.exists() else ()
+        by_stem: dict[str, list[Path]] = {}
+        for p in (root.rglob("*") if root.exists() else ()):
+            if p.is_file():
+                by_stem.setdefault(p.stem.upper(), []).append(p)
+
+        self.stems = sorted(by_stem)
+        # stem -> [(rank, NAME, path)] best first
+        self.renditions = {
+            stem: sorted((rendition_rank(p), p.name.upper(), p) for p in paths)
+            for stem, paths in by_stem.items()
+        }
+
+    def find(self, prefix: str) -> Path | None:
+        """
+        Best rendition among files whose name starts with `prefix`
+        (case-insensitive): web formats first, in preference order.
+        """
+        prefix = prefix.upper()
+        best = None
+
+        # A name starting with the prefix has a stem that starts with it, or a
+        # stem that is a leading part of the prefix (prefix runs into the extension)
+        i = bisect.bisect_left(self.stems, prefix)
+        candidates = []
+        while i < len(self.stems) and self.stems[i].startswith(prefix):
+            candidates.append(self.stems[i])
+            i += 1
+        dot = prefix.rfind(".")
+        if dot > 0 and prefix[:dot] in self.renditions:
+            candidates.append(prefix[:dot])
+
+        for stem in candidates:
+            for rank, name, p in self.renditions[stem]:
+                if not name.startswith(prefix):
+                    continue
+                if best is None or (rank, name) < best[:2]:
+                    best = (rank, name, p)
+                break
+        return best[2] if best else None
+
+    def files(self, ext: str) -> list[Path]:
+        ext = ext.lower()
+        return [p for entries in self.renditions.values() for _, _, p in entries if p.suffix.lower() == ext]
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.renditions.values())
+
+
+_lock = threading.Lock()
+_registry: IcnRegistry | None = None
+_checked_at = 0.0
+
+
+def get_registry() -> IcnRegistry:
+    global _registry, _checked_at
+    now = time.monotonic()
+    reg = _registry
+    if reg is not None and now - _checked_at < REFRESH_SECONDS:
+        return reg
+
+    with _lock:
+        if _registry is not None and now - _checked_at < REFRESH_SECONDS:
+            return _registry
+        current = dir_signature(DATASET_DIR) if DATASET_DIR.exists() else ()
+        if _registry is None or _registry.signature != current:
+            _registry = IcnRegistry(DATASET_DIR)
+        _checked_at = now
+        return _registry
+
+
 def find_icn_file(urn: str) -> Path:
     prefix = urn_to_candidate_prefix(urn)
 
     # Some DMs use ICN-... exactly; files may be upper/lower case differences
-    # We'll search for any file whose stem starts with that prefix.
-    matches = []
-    for p in DATASET_DIR.rglob("*"):
-        if not p.is_file():
-            continue
-        if p.name.upper().startswith(prefix.upper()):
-            matches.append(p)
-
-    if not matches:
+    p = get_registry().find(prefix)
+    if p is None:
         raise HTTPException(status_code=404, detail=f"ICN not found for URN: {urn}")
+    return p
 
-    # Prefer web formats first; else return first match
-    web = [m for m in matches if m.suffix.lower() in WEB_EXTS]
-    if web:
-        return web[0]
-    return matches[0]
+def serve_icn_by_urn(urn: str, headers=None, width: int | None = None, fmt: str | None = None):
+    """
+    Serve an ICN, optionally as a resized (`width`) or re-encoded (`fmt`)
+    derivative. Vector graphics (SVG, CGM renditions) scale on the client,
+    so `width` doesn't apply to them. Widths above
+    icn_derivatives.MAX_WIDTH are rejected with 400.
+    """
+    if width is not None and width > icn_derivatives.MAX_WIDTH:
+        raise HTTPException(status_code=400, detail=f"width must be at most {icn_derivatives.MAX_WIDTH}")
 
-def serve_icn_by_urn(urn: str):
     p = find_icn_file(urn)
     ext = p.suffix.lower()
 
+    if ext in (".cgm", ".svg") and fmt not in (None, "svg"):
+        raise HTTPException(status_code=415, detail=f"Vector ICN can only be served as SVG, not {fmt}")
+
     if ext == ".cgm":
-        raise HTTPException(
-            status_code=415,
-            detail="CGM graphic found but not web-renderable. Convert CGM to PNG/SVG to display."
-        )
+        # Served from the pre-rendered SVG; conversion never runs on the request path
+        try:
+            svg = icn_renditions.rendition_for(p)
+        except icn_renditions.RenditionPending:
+            raise HTTPException(
+                status_code=503,
+                detail="CGM graphic is still being converted to SVG. Retry shortly.",
+                headers={"Retry-After": "2"},
+            )
+        except icn_renditions.RenditionFailed as e:
+            raise HTTPException(status_code=415, detail=f"CGM graphic could not be converted to SVG: {e}")
+        return cached_file_response(svg, MIME_MAP[".svg"], headers, ICN_CACHE_CONTROL)
 
     if ext not in WEB_EXTS:
         raise HTTPException(status_code=415, detail=f"Unsupported image type: {ext}")
 
-    return FileResponse(str(p), media_type=MIME_MAP.get(ext, "application/octet-stream"))
+    if ext != ".svg" and (width is not None or fmt is not None):
+        if fmt == "svg":
+            raise HTTPException(status_code=415, detail="Raster ICN can't be served as SVG")
+        try:
+            derivative = icn_derivatives.get_derivative(p, width, fmt)
+        except (OSError, Image.DecompressionBombError, ValueError) as e:
+            # unreadable, truncated or oversized (decompression bomb) images
+            raise HTTPException(status_code=415, detail=f"Could not resize {p.name}: {e}")
+        if derivative is not None:
+            return cached_file_response(derivative[0], derivative[1], headers, ICN_CACHE_CONTROL)
+
+    return cached_file_response(p, MIME_MAP.get(ext, "application/octet-stream"), headers, ICN_CACHE_CONTROL)
@@ -0,0 +1,191 @@
+"""
+Resized / re-encoded ICN derivatives (thumbnails, WebP copies of scans).
+
+Each derivative is generated once and kept in a size-bounded LRU directory.
+Its file name is derived from the source file's path, mtime and size plus the
+requested width and format, so a changed source never hits a stale derivative.
+File access times double as LRU recency, so the order survives restarts
+(mtimes are left alone: they feed the ETag).
+"""
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from backend.csdb_index import BASE_DIR
+
+DERIVATIVE_DIR = Path(os.environ.get("ICN_DERIVATIVE_DIR", BASE_DIR / "data" / ".derivatives"))
+MAX_CACHE_BYTES = int(os.environ.get("ICN_DERIVATIVE_MAX_BYTES", 256 * 1024 * 1024))
+
+# Bump when encoding settings change so old derivatives are not reused
+DERIVATIVE_VERSION = 1
+
+# Requested widths are rounded up to one of these, which bounds the number of
+# variants per image (and the cache) no matter what clients ask for. Widths
+# above MAX_WIDTH are not served (/icn answers 400).
+WIDTH_STEPS = (64, 128, 200, 256, 320, 480, 640, 800, 1024, 1280, 1600, 2048)
+MAX_WIDTH = WIDTH_STEPS[-1]
+
+FORMATS = {
+    # format -> (Pillow format, extension, media type)
+    "png": ("PNG", ".png", "image/png"),
+    "jpeg": ("JPEG", ".jpg", "image/jpeg"),
+    "webp": ("WEBP", ".webp", "image/webp"),
+}
+# Default output format per source; GIFs only become PNGs when they must be resized
+SOURCE_FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp", ".gif": "png"}
+
+
+def snap_width(width: int) -> int:
+    for step in WIDTH_STEPS:
+        if width <= step:
+            return step
+    raise ValueError(f"width {width} is above the maximum of {MAX_WIDTH}")
+
+
+def derivative_name(src: Path, st: os.stat_result, width: int | None, fmt: str) -> str:
+    key = f"{src}|{st.st_mtime_ns}|{st.st_size}|{width}|{fmt}|{DERIVATIVE_VERSION}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32] + FORMATS[fmt][1]
+
+
+def _encode(src: Path, dst: Path, width: int | None, fmt: str) -> bool:
+    """
+    Write the derivative to `dst`. Returns False (and writes nothing) when it
+    would just be the original: same format and no smaller than the request.
+    """
+    pil_format = FORMATS[fmt][0]
+    with Image.open(src) as img:
+        same_format = img.format == pil_format
+        target = None
+        if width is not None and width < img.width:
+            target = (width, max(1, round(img.height * width / img.width)))
+            # JPEG can decode straight at 1/2, 1/4, 1/8 scale
+            img.draft("RGB", target)
+        if target is None and same_format:
+            return False
+
+        out = ImageOps.exif_transpose(img)
+        if target is not None:
+            out = out.resize(target, Image.LANCZOS, reducing_gap=3.0)
+
+        if pil_format == "JPEG":
+            out = out.convert("RGB")
+            opts = {"quality": 85, "optimize": True, "progressive": True}
+        elif pil_format == "WEBP":
+            out = out.convert("RGBA" if "A" in out.getbands() or "transparency" in out.info else "RGB")
+            opts = {"quality": 80, "method": 4}
+        else:
+            if out.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+                out = out.convert("RGBA")
+            opts = {"optimize": True}
+
+        tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        out.save(tmp, pil_format, **opts)
+        os.replace(tmp, dst)
+    return True
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, int] | None" = None     # file name -> bytes, least recently used first
+_passthrough: set[str] = set()                       # names whose answer is the original file
+_building: dict[str, threading.Lock] = {}
+_stats = {"hits": 0, "misses": 0, "generated": 0, "passthrough": 0, "evictions": 0, "bytes": 0}
+
+
+def _load_locked() -> "OrderedDict[str, int]":
+    global _entries
+    if _entries is None:
+        found = []
+        if DERIVATIVE_DIR.exists():
+            for p in DERIVATIVE_DIR.iterdir():
+                if p.suffix == ".tmp" or not p.is_file():
+                    continue
+                st = p.stat()
+                found.append((st.st_atime_ns, p.name, st.st_size))
+        found.sort()
+        _entries = OrderedDict((name, size) for _, name, size in found)
+        _stats["bytes"] = sum(_entries.values())
+    return _entries
+
+
+def _evict_locked(entries: "OrderedDict[str, int]") -> None:
+    while _stats["bytes"] > MAX_CACHE_BYTES and len(entries) > 1:
+        name, size = entries.popitem(last=False)
+        _stats["bytes"] -= size
+        _stats["evictions"] += 1
+        try:
+            (DERIVATIVE_DIR / name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def get_derivative(src: Path, width: int | None, fmt: str | None) -> tuple[Path, str] | None:
+    """
+    (path, media type) of the derivative of a raster ICN, or None when the
+    original already satisfies the request. `width` is rounded up to a
+    WIDTH_STEPS value (ValueError above MAX_WIDTH); images are never upscaled.
+    """
+    if width is not None:
+        width = snap_width(width)
+    if fmt is None and src.suffix.lower() == ".gif":
+        # no format asked for: a GIF that needs no shrinking is served as is
+        with Image.open(src) as img:
+            if width is None or width >= img.width:
+                return None
+    fmt = fmt or SOURCE_FORMATS.get(src.suffix.lower(), "png")
+    st = src.stat()
+    name = derivative_name(src, st, width, fmt)
+    dst = DERIVATIVE_DIR / name
+    media_type = FORMATS[fmt][2]
+
+    with _lock:
+        entries = _load_locked()
+        if name in _passthrough:
+            return None
+        if name in entries and dst.is_file():
+            entries.move_to_end(name)
+            _stats["hits"] += 1
+            os.utime(dst, ns=(time.time_ns(), dst.stat().st_mtime_ns))
+            return dst, media_type
+        _stats["misses"] += 1
+        building = _building.setdefault(name, threading.Lock())
+
+    # one request encodes; concurrent ones for the same variant wait for it
+    with building:
+        with _lock:
+            if name in _passthrough:
+                return None
+            if name in entries and dst.is_file():
+                return dst, media_type
+        DERIVATIVE_DIR.mkdir(parents=True, exist_ok=True)
+        try:
+            made = _encode(src, dst, width, fmt)
+        except Exception:
+            with _lock:
+                _building.pop(name, None)
+            raise
+
+        with _lock:
+            _building.pop(name, None)
+            if not made:
+                _passthrough.add(name)
+                _stats["passthrough"] += 1
+                return None
+            size = dst.stat().st_size
+            if name in entries:
+                _stats["bytes"] -= entries[name]
+            entries[name] = size
+            _stats["bytes"] += size
+            _stats["generated"] += 1
+            _evict_locked(entries)
+    return dst, media_type
+
+
+def stats() -> dict:
+    with _lock:
+        entries = _load_locked()
+        return {**_stats, "entries": len(entries), "max_bytes": MAX_CACHE_BYTES}
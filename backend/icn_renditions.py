@@ -0,0 +1,268 @@
+"""
+SVG renditions of CGM illustrations.
+
+Renditions are stored by content: data/.renditions/<sha256 of the CGM>-v<converter version>.svg
+(plus a .svg.gz sibling), so identical files share one rendition, a changed
+file gets a new one, and a converter upgrade re-renders everything.
+
+Rendering only happens on the background job (started with the API, or ahead of
+time with `python -m backend.icn_renditions`); the request path only looks up
+finished files.
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from backend.cgm_svg import CONVERTER_VERSION, CgmError, cgm_to_svg
+from backend.csdb_index import BASE_DIR
+
+DATASET_DIR = BASE_DIR / "data" / "S1000D_4-1_Bike_Samples"
+RENDITION_DIR = Path(os.environ.get("ICN_RENDITION_DIR", BASE_DIR / "data" / ".renditions"))
+
+# Set ICN_PRERENDER=0 on replicas that only serve renditions built ahead of time
+PRERENDER = os.environ.get("ICN_PRERENDER", "1") != "0"
+
+
+class RenditionPending(Exception):
+    pass
+
+
+class RenditionFailed(Exception):
+    pass
+
+
+def rendition_path(digest: str) -> Path:
+    return RENDITION_DIR / f"{digest}-v{CONVERTER_VERSION}.svg"
+
+
+def _write_atomic(p: Path, data: bytes) -> None:
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def render_file(src: Path) -> tuple[Path, bool]:
+    """
+    Make sure the rendition for `src` exists. Returns (path, rendered_now).
+    A file that can't be converted leaves a .err marker with the reason, so it
+    isn't retried until its content or the converter changes.
+    """
+    data = src.read_bytes()
+    out = rendition_path(hashlib.sha256(data).hexdigest())
+    err = out.with_suffix(".err")
+    if out.is_file():
+        return out, False
+    if err.is_file():
+        raise RenditionFailed(err.read_text(encoding="utf-8"))
+
+    RENDITION_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        svg = cgm_to_svg(data).encode("utf-8")
+    except CgmError as e:
+        _write_atomic(err, str(e).encode("utf-8"))
+        raise RenditionFailed(str(e)) from None
+
+    # .gz first: once the .svg exists, its compressed sibling does too
+    _write_atomic(out.with_name(out.name + ".gz"), gzip.compress(svg, compresslevel=9, mtime=0))
+    _write_atomic(out, svg)
+    return out, True
+
+
+_cond = threading.Condition()
+_queue: deque[Path] = deque()
+_queued: set[str] = set()
+_ready: dict[str, tuple[int, int, Path]] = {}     # source path -> (mtime_ns, size, rendition)
+_failed: dict[str, tuple[int, int, str]] = {}     # source path -> (mtime_ns, size, reason)
+_digests: dict[str, tuple[int, int, str]] = {}    # source path -> (mtime_ns, size, sha256)
+_worker: threading.Thread | None = None
+_stats = {"rendered": 0, "reused": 0, "failed": 0, "render_seconds": 0.0}
+
+
+def _stamp(src: Path) -> tuple[int, int]:
+    st = src.stat()
+    return st.st_mtime_ns, st.st_size
+
+
+def _digest(src: Path, stamp: tuple[int, int]) -> str:
+    """sha256 of a CGM, hashed once per (mtime, size)."""
+    key = str(src)
+    with _cond:
+        known = _digests.get(key)
+    if known is not None and known[:2] == stamp:
+        return known[2]
+    digest = hashlib.sha256(src.read_bytes()).hexdigest()
+    with _cond:
+        _digests[key] = (*stamp, digest)
+    return digest
+
+
+def _enqueue_locked(src: Path, urgent: bool) -> None:
+    key = str(src)
+    if key in _queued:
+        # already waiting (or being rendered right now)
+        if urgent and src in _queue:
+            _queue.remove(src)
+            _queue.appendleft(src)
+        return
+    _queued.add(key)
+    if urgent:
+        _queue.appendleft(src)
+    else:
+        _queue.append(src)
+    _cond.notify()
+
+
+def _mark_failed(src: Path, reason: str) -> None:
+    """Leave a .err marker for `src` so an unexpected failure isn't retried on every request."""
+    try:
+        out = rendition_path(hashlib.sha256(src.read_bytes()).hexdigest())
+        RENDITION_DIR.mkdir(parents=True, exist_ok=True)
+        _write_atomic(out.with_suffix(".err"), reason.encode("utf-8"))
+    except OSError:
+        pass
+
+
+def _run() -> None:
+    while True:
+        with _cond:
+            while not _queue:
+                _cond.wait()
+            src = _queue.popleft()
+
+        key = str(src)
+        stamp = None
+        try:
+            stamp = _stamp(src)
+            t0 = time.perf_counter()
+            out, rendered = render_file(src)
+            with _cond:
+                _ready[key] = (*stamp, out)
+                _failed.pop(key, None)
+                if rendered:
+                    _stats["rendered"] += 1
+                    _stats["render_seconds"] += time.perf_counter() - t0
+                else:
+                    _stats["reused"] += 1
+        except Exception as e:
+            reason = str(e)
+            if not isinstance(e, (OSError, RenditionFailed)):
+                # a converter bug must not take the worker (and the rest of the queue) down
+                reason = f"{type(e).__name__}: {e}"
+                _mark_failed(src, reason)
+            with _cond:
+                if stamp is not None and not isinstance(e, OSError):
+                    _failed[key] = (*stamp, reason)
+                _stats["failed"] += 1
+        finally:
+            with _cond:
+                _queued.discard(key)
+
+
+def _ensure_worker_locked() -> None:
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        _worker = threading.Thread(target=_run, name="icn-prerender", daemon=True)
+        _worker.start()
+
+
+def start_prerender(sources) -> None:
+    """
+    Queue every CGM for rendering on the background worker. Files that
+    already have a rendition on disk only cost a hash.
+    """
+    with _cond:
+        for src in sources:
+            _enqueue_locked(Path(src), urgent=False)
+        _ensure_worker_locked()
+
+
+def rendition_for(src: Path) -> Path:
+    """
+    The finished SVG rendition of a CGM file. Never renders: a file that isn't
+    known to the worker is hashed and looked up on disk (renditions built ahead
+    of time, or by another process); if there is none either, it is moved to the
+    front of the background queue and RenditionPending raised. The hash is
+    memoized, so polling a pending file doesn't re-read it.
+    """
+    key = str(src)
+    stamp = _stamp(src)
+    with _cond:
+        ready = _ready.get(key)
+        if ready is not None and ready[:2] == stamp and ready[2].is_file():
+            return ready[2]
+        failed = _failed.get(key)
+        if failed is not None and failed[:2] == stamp:
+            raise RenditionFailed(failed[2])
+
+    out = rendition_path(_digest(src, stamp))
+    err = out.with_suffix(".err")
+    if out.is_file():
+        with _cond:
+            _ready[key] = (*stamp, out)
+        return out
+    if err.is_file():
+        reason = err.read_text(encoding="utf-8")
+        with _cond:
+            _failed[key] = (*stamp, reason)
+        raise RenditionFailed(reason)
+
+    with _cond:
+        if not PRERENDER:
+            raise RenditionPending(key)
+        _enqueue_locked(src, urgent=True)
+        _ensure_worker_locked()
+    raise RenditionPending(key)
+
+
+def stats() -> dict:
+    with _cond:
+        return {
+            **_stats,
+            "ready": len(_ready),
+            "failed_files": len(_failed),
+            "queued": len(_queued),
+            "converter_version": CONVERTER_VERSION,
+        }
+
+
+def discover_cgm_files(root: Path) -> list[Path]:
+    return sorted(p for p in root.rglob("*") if p.is_file() and p.suffix.lower() == ".cgm")
+
+
+def _render_one(path_str: str) -> tuple[str, str | None, bool]:
+    try:
+        out, rendered = render_file(Path(path_str))
+        return path_str, None, rendered
+    except (OSError, RenditionFailed) as e:
+        return path_str, str(e), False
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-render CGM illustrations to SVG renditions.")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    args = ap.parse_args()
+
+    files = [str(p) for p in discover_cgm_files(DATASET_DIR)]
+    if args.jobs > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_render_one, files))
+    else:
+        results = [_render_one(p) for p in files]
+
+    rendered = sum(1 for _, err, r in results if r)
+    failed = [(p, err) for p, err, _ in results if err]
+    print(f"CGM files: {len(files)}")
+    print(f"Rendered: {rendered}  Already cached: {len(files) - rendered - len(failed)}  Failed: {len(failed)}")
+    for p, err in failed:
+        print(f"  {p}: {err}")
+    print(f"Renditions: {RENDITION_DIR}")
+
+
+if __name__ == "__main__":
+    main()
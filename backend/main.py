@@ -1,17 +1,45 @@
-from fastapi import FastAPI
-from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from typing import Literal
+
+from fastapi import FastAPI, Request
+from pydantic import BaseModel, Field
 from fastapi import Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
-from backend.applic_resolver import resolve_applicability
+from backend.applic_resolver import resolve_applicability, start_freshness_sweep, stream_resolve_ndjson
+from backend.fleet_resolve import resolve_fleet
 from backend.notes_mapper import map_engineer_notes, to_procedural_dm_xml
-from backend.dm_catalog import list_dms
+from backend.dm_catalog import DmQuery, query_dms
 from backend.dm_detail import load_dm_details
-from backend.dm_eval import eval_dm
+from backend.dm_eval import eval_dm, eval_dms
+from backend.raw_xml import serve_dm_xml
+from backend.search_index import search
 from fastapi.middleware.cors import CORSMiddleware
-from backend.proc_preview import extract_dm_preview
-from backend.icn_assets import serve_icn_by_urn
+from backend.proc_preview import artifact_response, get_dm_preview, preview_response
+from backend.icn_assets import get_registry, serve_icn_by_urn
+from backend.fast_json import respond
+from backend import (
+    act_cache, applic_facts, compression, csdb_index, dm_catalog, eval_applic_expr, icn_derivatives,
+    icn_renditions, preview_artifacts, preview_cache, raw_xml, resolve_cache, search_index, work_pool, xml_cache,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the CSDB index and ICN registry up front so the first request doesn't pay for them;
+    # DMs touched since indexing are hashed in the background, not on first use
+    csdb_index.get_index().verify_in_background()
+    registry = get_registry()
+    if icn_renditions.PRERENDER:
+        icn_renditions.start_prerender(registry.files(".cgm"))
+    start_freshness_sweep()
+    work_pool.start()
+    yield
+    work_pool.shutdown()
 
-app = FastAPI(title="S1000D Applicability Resolver")
+
+app = FastAPI(title="S1000D Applicability Resolver", lifespan=lifespan)
 
 
 
@@ -21,24 +49,91 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # raw XML window metadata
+    expose_headers=["X-Total-Lines", "X-Line-Range", "Content-Range"],
 )
 
+if compression.ENABLED:
+    # gzip/brotli above COMPRESS_MIN_BYTES; prebuilt .gz bodies pass through
+    app.add_middleware(compression.CompressionMiddleware)
+
 
 class ResolveRequest(BaseModel):
     selected: list[str]
+    cursor: str | None = None
+    limit: int | None = Field(default=None, ge=1)
+    paths_only: bool = False
+
+class ResolveBatchRequest(BaseModel):
+    selections: list[list[str]]
+    format: Literal["bitset", "indices"] = "bitset"
+
+class DmEvalBatchRequest(BaseModel):
+    selected: list[str] = []
+    paths: list[str] = []
+    dmCodes: list[str] = []
 
 class NotesRequest(BaseModel):
     text: str
 
+# Light endpoints are async and never block the event loop. Heavy XML work
+# (resolve, eval, previews, DM details) is awaited on backend.work_pool so it
+# can't starve them or Starlette's threadpool. Large payloads go out through
+# respond(), which renders them with orjson when FAST_JSON=1.
+
 @app.get("/health")
-def health():
+async def health():
+    return {"status": "ok"}
+
+@app.get("/cache-stats")
+def cache_stats():
+    return {
+        "xml": xml_cache.stats(),
+        "raw_xml": raw_xml.stats(),
+        "index": csdb_index.stats(),
+        "catalog": dm_catalog.stats(),
+        "applic_expr": eval_applic_expr.cache_stats(),
+        "act": act_cache.stats(),
+        "resolve": resolve_cache.stats(),
+        "search": search_index.stats(),
+        "work_pool": work_pool.stats(),
+        "preview": preview_cache.stats(),
+        "preview_artifacts": preview_artifacts.stats(),
+        "icn": {
+            "files": len(get_registry()),
+            "renditions": icn_renditions.stats(),
+            "derivatives": icn_derivatives.stats(),
+        },
+    }
+
+@app.post("/cache-clear")
+async def cache_clear():
+    # Explicit invalidation after a dataset delivery; caches also self-invalidate on mtime changes
+    xml_cache.clear()
+    raw_xml.clear()
+    act_cache.clear()
+    applic_facts.clear()
+    resolve_cache.invalidate()
+    preview_cache.clear()
     return {"status": "ok"}
 
 
 @app.post("/resolve")
-def resolve(req: ResolveRequest):
-    return resolve_applicability(req.selected)
+async def resolve(req: ResolveRequest):
+    return respond(await work_pool.run(
+        resolve_applicability, req.selected, cursor=req.cursor, limit=req.limit, paths_only=req.paths_only,
+    ))
 
+@app.post("/resolve/stream")
+async def resolve_stream(req: ResolveRequest):
+    lines = await work_pool.iterate(stream_resolve_ndjson, req.selected, paths_only=req.paths_only)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.post("/resolve-batch")
+async def resolve_batch(req: ResolveBatchRequest):
+    return respond(await work_pool.run(resolve_fleet, req.selections, fmt=req.format))
+
+# Regex and XML building on unbounded bodies: keep them on the threadpool
 @app.post("/map-notes")
 def map_notes(req: NotesRequest):
     return map_engineer_notes(req.text)
@@ -51,23 +146,79 @@ def map_notes_to_xml(req: NotesRequest):
     return {"dm_type_guess": mapped["dm_type_guess"], "xml": xml}
 
 @app.get("/dms")
-def get_dms(only_dmc: bool = True):
-    return {"items": list_dms(only_dmc=only_dmc)}
+async def get_dms(
+    only_dmc: bool = True,
+    system_code: str | None = None,
+    info_code: str | None = None,
+    q: str | None = None,
+    has_applicability: bool | None = None,
+    selected: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    cursor: str | None = None,
+):
+    # `q` matches dmCode or title; `selected` (comma-separated) keeps applicable DMs only
+    fields = {k: v for k, v in (("systemCode", system_code), ("infoCode", info_code)) if v}
+    labels = None if selected is None else [s.strip() for s in selected.split(",") if s.strip()]
+    query = DmQuery(only_dmc, fields, q or None, has_applicability, labels)
+    if labels is None:
+        return respond(await run_in_threadpool(query_dms, query, limit=limit, cursor=cursor))
+    # A selection needs the resolver, which is pool work on a cold cache
+    return respond(await work_pool.run(query_dms, query, limit=limit, cursor=cursor))
+
+@app.get("/search")
+async def search_dms(
+    q: str = Query(..., min_length=1),
+    selected: str | None = None,
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+):
+    # `selected` (comma-separated, as for /dm-eval) restricts hits to applicable DMs
+    labels = None if selected is None else [s.strip() for s in selected.split(",") if s.strip()]
+    return await work_pool.run(search, q, selected=labels, limit=limit, offset=offset)
 
 @app.get("/dm")
-def get_dm(path: str):
-    return load_dm_details(path)
+async def get_dm(path: str, include_xml: bool = True):
+    return respond(await work_pool.run(load_dm_details, path, include_xml=include_xml))
+
+# Windowed file I/O stays on Starlette's threadpool, like /icn
+@app.get("/dm-xml")
+def get_dm_xml(
+    request: Request,
+    path: str = Query(...),
+    start_line: int | None = Query(default=None, ge=1),
+    lines: int | None = Query(default=None, ge=1),
+):
+    return serve_dm_xml(path, request.headers, start_line=start_line, lines=lines)
 
 @app.get("/dm-eval")
-def dm_eval(path: str, selected: str = ""):
+async def dm_eval(path: str, selected: str = ""):
     labels = [s.strip() for s in selected.split(",") if s.strip()]
-    return eval_dm(path, labels)
+    return await work_pool.run(eval_dm, path, labels)
+
+@app.post("/dm-eval-batch")
+async def dm_eval_batch(req: DmEvalBatchRequest):
+    return respond(await work_pool.run(eval_dms, req.selected, paths=req.paths, dm_codes=req.dmCodes))
 
 
 @app.get("/dm-preview")
-def dm_preview(path: str = Query(...)):
-    return extract_dm_preview(path)
+async def dm_preview(request: Request, path: str = Query(...)):
+    # Prebuilt artifacts skip the pool, but checking one still reads files, so it runs on the threadpool
+    response = await run_in_threadpool(artifact_response, path, request.headers)
+    if response is None:
+        etag, preview = await work_pool.run(get_dm_preview, path)
+        response = preview_response(etag, preview, request.headers)
+    return response
 
 @app.get("/icn")
-def get_icn(urn: str):
-    return serve_icn_by_urn(urn)
\ No newline at end of file
+async def get_icn(
+    urn: str,
+    request: Request,
+    # above icn_derivatives.MAX_WIDTH is answered with 400 by serve_icn_by_urn
+    width: int | None = Query(default=None, ge=1),
+    fmt: Literal["png", "jpeg", "webp", "svg"] | None = Query(default=None, alias="format"),
+):
+    if width is not None or fmt is not None:
+        # A derivative miss means a Pillow decode/resize/encode: pool work
+        return await work_pool.run(serve_icn_by_urn, urn, dict(request.headers), width=width, fmt=fmt)
+    # Plain file serving stays on Starlette's threadpool
+    return await run_in_threadpool(serve_icn_by_urn, urn, request.headers)
\ No newline at end of file
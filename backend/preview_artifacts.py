@@ -0,0 +1,94 @@
+"""
+Read side of the static preview store built by tools/build_preview_artifacts.py.
+
+The manifest maps each DM path to a gzip-compressed, content-addressed JSON
+artifact holding the complete /dm-preview response. An artifact is only used
+while the DM's content hash, its index metadata and the extractor version
+all match what it was built from; anything else is a miss and the caller
+falls back to live extraction.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import NamedTuple
+
+from backend.csdb_index import BASE_DIR, get_index, norm_path
+
+ARTIFACT_DIR = Path(os.environ.get("PREVIEW_ARTIFACT_DIR", BASE_DIR / "data" / "preview_artifacts"))
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+class Artifact(NamedTuple):
+    path: Path      # .json.gz file
+    etag: str
+
+
+class _Manifest:
+    def __init__(self, data: dict, mtime_ns: int):
+        self.mtime_ns = mtime_ns
+        self.extractor_version = data.get("extractor_version")
+        self.entries: dict[str, dict] = data.get("entries", {})
+
+
+_lock = threading.Lock()
+_current: _Manifest | None = None
+_stats = {"hits": 0, "misses": 0, "stale": 0}
+
+
+def _manifest() -> _Manifest | None:
+    global _current
+    p = ARTIFACT_DIR / MANIFEST_NAME
+    try:
+        mtime_ns = p.stat().st_mtime_ns
+    except OSError:
+        return None
+    cur = _current
+    if cur is not None and cur.mtime_ns == mtime_ns:
+        return cur
+    with _lock:
+        if _current is None or _current.mtime_ns != mtime_ns:
+            data = json.loads(p.read_text(encoding="utf-8"))
+            if data.get("version") != MANIFEST_VERSION:
+                return None
+            _current = _Manifest(data, mtime_ns)
+        return _current
+
+
+def lookup(path_str: str, extractor_version: int) -> Artifact | None:
+    """
+    The prebuilt artifact for a DM, or None. Freshness is vouched for by the
+    index (see CsdbIndex.verified_sha256), so no XML is read here.
+    """
+    manifest = _manifest()
+    entry = manifest.entries.get(norm_path(path_str)) if manifest else None
+    if entry is None or manifest.extractor_version != extractor_version:
+        with _lock:
+            _stats["misses"] += 1
+        return None
+
+    index = get_index()
+    fresh = (
+        index.verified_sha256(path_str) == entry["sha256"]
+        and index.meta(path_str) == {"dmCode": entry.get("dmCode"), "dmTitle": entry.get("dmTitle")}
+    )
+    artifact = ARTIFACT_DIR / entry["artifact"]
+    if not fresh or not artifact.is_file():
+        with _lock:
+            _stats["stale"] += 1
+        return None
+
+    with _lock:
+        _stats["hits"] += 1
+    return Artifact(artifact, '"%s"' % entry["artifact"].split(".", 1)[0])
+
+
+def stats() -> dict:
+    manifest = _current
+    with _lock:
+        return {
+            **_stats,
+            "loaded": manifest is not None,
+            "entries": len(manifest.entries) if manifest else 0,
+        }
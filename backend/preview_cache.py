@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from backend.csdb_index import BASE_DIR, get_index
+
+CACHE_DIR = Path(os.environ.get("PREVIEW_CACHE_DIR", BASE_DIR / "data" / ".preview_cache"))
+MAX_ENTRIES = int(os.environ.get("PREVIEW_CACHE_MAX_ENTRIES", 512))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, dict]" = OrderedDict()          # "<sha256>-v<version>" -> preview
+_digests: dict[str, tuple[int, int, str]] = {}               # abs path -> (mtime_ns, size, sha256)
+_stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+
+def content_sha256(path_str: str, p: Path) -> str:
+    """
+    Content hash of a DM: the index's hash when the file still matches it,
+    otherwise hashed here, once per (mtime, size).
+    """
+    indexed = get_index().verified_sha256(path_str)
+    if indexed:
+        return indexed
+
+    st = p.stat()
+    key = str(p)
+    with _lock:
+        hit = _digests.get(key)
+    if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size):
+        return hit[2]
+    digest = hashlib.sha256(p.read_bytes()).hexdigest()
+    with _lock:
+        _digests[key] = (st.st_mtime_ns, st.st_size, digest)
+    return digest
+
+
+def _remember_locked(key: str, value: dict) -> None:
+    _entries[key] = value
+    _entries.move_to_end(key)
+    while len(_entries) > MAX_ENTRIES:
+        _entries.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+def _write_atomic(p: Path, data: bytes) -> None:
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def get_or_build(path_str: str, p: Path, version: int, build) -> tuple[str, dict]:
+    """
+    Return (key, value) for a pure function of a file's content. Looked up
+    in memory, then in the on-disk JSON store, and only then `build()` runs
+    (outside the lock). The value is shared: read it, never modify it.
+    """
+    key = f"{content_sha256(path_str, p)}-v{version}"
+    with _lock:
+        hit = _entries.get(key)
+        if hit is not None:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return key, hit
+
+    stored = CACHE_DIR / f"{key}.json"
+    try:
+        value = json.loads(stored.read_text(encoding="utf-8"))
+        with _lock:
+            _stats["disk_hits"] += 1
+            _remember_locked(key, value)
+        return key, value
+    except (OSError, ValueError):
+        pass
+
+    value = build()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    _write_atomic(stored, json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    with _lock:
+        _stats["misses"] += 1
+        _remember_locked(key, value)
+    return key, value
+
+
+def clear() -> None:
+    # Memory only; the disk store is content-addressed and never goes stale
+    with _lock:
+        _entries.clear()
+        _digests.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["disk_hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "max_entries": MAX_ENTRIES,
+            "hit_rate": ((_stats["hits"] + _stats["disk_hits"]) / lookups) if lookups else None,
+        }
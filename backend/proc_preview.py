@@ -1,9 +1,19 @@
-import json
+import gzip
 from pathlib import Path
-from lxml import etree
 
-BASE_DIR = Path(__file__).resolve().parent.parent
-INDEX_PATH = BASE_DIR / "data" / "bike_index.json"
+from fastapi.responses import FileResponse, Response
+
+from backend import fast_json, preview_artifacts, preview_cache
+from backend.http_cache import accepts_gzip, etag_matches
+from backend.csdb_index import BASE_DIR, get_index
+from backend.xml_cache import get_root
+
+
+# Bump whenever the preview output changes; cached previews are keyed on it
+EXTRACTOR_VERSION = 1
+
+# Filled in per request from the path and the index, not cached with the preview
+VOLATILE_KEYS = ("path", "dmCode", "dmTitle")
 
 
 # -------------------------
@@ -26,33 +36,19 @@ def text_of(el) -> str:
     return " ".join("".join(el.itertext()).split())
 
 
-def load_index() -> dict:
-    return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
-
-
 def meta_for_path(request_path: str) -> dict:
-    idx = load_index()
-    target = norm_path(request_path)
+    return get_index().meta(request_path)
 
-    for dm in idx.get("data_modules", []):
-        p = dm.get("path")
-        if not p:
-            continue
-        if norm_path(p) == target:
-            return {
-                "dmCode": dm.get("dmCode"),
-                "dmTitle": dm.get("dmTitle"),
-            }
 
-    return {"dmCode": None, "dmTitle": None}
+def resolve_path(path_str: str) -> Path:
+    p = Path(norm_path(path_str))
+    if not p.is_absolute():
+        p = (BASE_DIR / p).resolve()
+    return p
 
 
 def read_root(path_str: str):
-    path_str = norm_path(path_str)
-    p = Path(path_str)
-    if not p.is_absolute():
-        p = (BASE_DIR / p).resolve()
-    return etree.fromstring(p.read_bytes())
+    return get_root(resolve_path(path_str))
 
 
 def choose_main_content_child(content_el):
@@ -143,10 +139,78 @@ def extract_generic_blocks(main, max_blocks: int = 500):
     return blocks
 
 # -------------------------
-# Main extractor
+# Cached entry points
 # -------------------------
 
+def get_dm_preview(path_str: str) -> tuple[str, dict]:
+    """
+    (etag, preview) for a DM. The preview body is a pure function of the
+    file's content, so it is memoized by content hash + EXTRACTOR_VERSION
+    (see preview_cache); path, dmCode and dmTitle are added per call.
+    """
+    def build():
+        full = build_dm_preview(path_str)
+        return {k: v for k, v in full.items() if k not in VOLATILE_KEYS}
+
+    key, body = preview_cache.get_or_build(path_str, resolve_path(path_str), EXTRACTOR_VERSION, build)
+    meta = meta_for_path(path_str)
+    preview = {"path": norm_path(path_str), "dmCode": meta["dmCode"], "dmTitle": meta["dmTitle"], **body}
+    return f'"{key}-g{get_index().generation}"', preview
+
+
 def extract_dm_preview(path_str: str) -> dict:
+    return get_dm_preview(path_str)[1]
+
+
+def artifact_response(path_str: str, headers=None):
+    """
+    The prebuilt artifact (tools/build_preview_artifacts.py) for a DM, sent
+    as-is with gzip encoding, or None when no artifact matches the file.
+    Cheap: no XML is read.
+    """
+    headers = headers or {}
+    artifact = preview_artifacts.lookup(path_str, EXTRACTOR_VERSION)
+    if artifact is None:
+        return None
+
+    gz = accepts_gzip(headers)
+    etag = artifact.etag[:-1] + ('-gz"' if gz else '"')
+    out_headers = {"etag": etag, "cache-control": "no-cache", "vary": "Accept-Encoding"}
+    inm = headers.get("if-none-match")
+    if inm is not None and etag_matches(inm, etag):
+        return Response(status_code=304, headers=out_headers)
+    if gz:
+        out_headers["content-encoding"] = "gzip"
+        return FileResponse(artifact.path, media_type="application/json", headers=out_headers)
+    return Response(gzip.decompress(artifact.path.read_bytes()), media_type="application/json", headers=out_headers)
+
+
+def preview_response(etag: str, preview: dict, headers=None):
+    headers = headers or {}
+    out_headers = {"etag": etag, "cache-control": "no-cache"}
+    inm = headers.get("if-none-match")
+    if inm is not None and etag_matches(inm, etag):
+        return Response(status_code=304, headers=out_headers)
+    return fast_json.json_response_class()(preview, headers=out_headers)
+
+
+def serve_dm_preview(path_str: str, headers=None):
+    """
+    /dm-preview response: the matching prebuilt artifact if there is one,
+    otherwise the memoized live preview. Both carry an ETag and are
+    revalidated with 304s.
+    """
+    response = artifact_response(path_str, headers)
+    if response is None:
+        response = preview_response(*get_dm_preview(path_str), headers)
+    return response
+
+
+# -------------------------
+# Main extractor
+# -------------------------
+
+def build_dm_preview(path_str: str) -> dict:
     root = read_root(path_str)
     meta = meta_for_path(path_str)
 
@@ -0,0 +1,133 @@
+"""
+Raw DM XML served in windows, so viewing a huge DM costs memory in
+proportion to what is shown rather than to the file.
+
+Line windows slice a memory-mapped file using a line-offset index (the
+start offset of every line), built once per (mtime, size) with a chunked
+scan and kept in a small LRU. Without a line window the whole file goes out
+through FileResponse, which streams it and honours Range for byte windows.
+"""
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from backend.csdb_index import abs_path, get_index, norm_path
+from backend.http_cache import cached_file_response, make_etag, not_modified
+
+MAX_INDEX_ENTRIES = int(os.environ.get("RAW_XML_INDEX_MAX_ENTRIES", 64))
+MAX_WINDOW_LINES = 5000
+SCAN_CHUNK = 8 * 1024 * 1024
+XML_MEDIA_TYPE = "application/xml"
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, tuple[int, int, np.ndarray]]" = OrderedDict()  # abs path -> (mtime_ns, size, line starts)
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "windows": 0, "full": 0}
+
+
+def _scan_line_starts(mm, size: int) -> np.ndarray:
+    """
+    Start offset of every line. A trailing newline does not open another line.
+    """
+    dtype = np.uint32 if size < 2 ** 32 else np.uint64
+    parts = [np.zeros(1, dtype=dtype)]
+    for off in range(0, size, SCAN_CHUNK):
+        chunk = np.frombuffer(mm, dtype=np.uint8, count=min(SCAN_CHUNK, size - off), offset=off)
+        parts.append((np.flatnonzero(chunk == 0x0A) + (off + 1)).astype(dtype))
+    starts = np.concatenate(parts)
+    if len(starts) > 1 and starts[-1] == size:
+        starts = starts[:-1]
+    return starts
+
+
+def line_starts(p: Path, st: os.stat_result, mm) -> np.ndarray:
+    key = str(p)
+    with _lock:
+        hit = _entries.get(key)
+        if hit is not None and hit[:2] == (st.st_mtime_ns, st.st_size):
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return hit[2]
+        _stats["misses"] += 1
+
+    starts = _scan_line_starts(mm, st.st_size)
+
+    with _lock:
+        _entries[key] = (st.st_mtime_ns, st.st_size, starts)
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_INDEX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+    return starts
+
+
+def dm_file(path_str: str) -> Path:
+    # Only DMs known to the index are served raw
+    if norm_path(path_str) not in get_index().by_path:
+        raise HTTPException(status_code=404, detail="Unknown DM path")
+    p = abs_path(path_str)
+    if not p.is_file():
+        raise HTTPException(status_code=404, detail="DM file not found")
+    return p
+
+
+def serve_dm_xml(path_str: str, headers=None, start_line: int | None = None, lines: int | None = None):
+    """
+    The DM's XML as application/xml. With `start_line` (1-based) and/or
+    `lines`, only that window of lines is returned; X-Total-Lines and
+    X-Line-Range describe it. Otherwise the whole file, with Range support.
+    """
+    p = dm_file(path_str)
+    if start_line is None and lines is None:
+        with _lock:
+            _stats["full"] += 1
+        return cached_file_response(p, XML_MEDIA_TYPE, headers)
+
+    start_line = start_line or 1
+    lines = min(lines or MAX_WINDOW_LINES, MAX_WINDOW_LINES)
+
+    with open(p, "rb") as f:
+        st = os.fstat(f.fileno())
+        etag = make_etag(st, f"-L{start_line}+{lines}")
+        out_headers = {"cache-control": "no-cache", "etag": etag}
+        # mmap refuses empty files
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if st.st_size else None
+        try:
+            starts = line_starts(p, st, mm) if mm is not None else np.zeros(0, dtype=np.uint32)
+            total = len(starts)
+            first = min(start_line - 1, total)
+            last = min(first + lines, total)
+            out_headers["x-total-lines"] = str(total)
+            if last > first:
+                out_headers["x-line-range"] = f"{first + 1}-{last}"
+            if not_modified(headers or {}, etag, st):
+                return Response(status_code=304, headers=out_headers)
+            begin = int(starts[first]) if first < total else st.st_size
+            end = int(starts[last]) if last < total else st.st_size
+            body = mm[begin:end] if mm is not None else b""
+        finally:
+            if mm is not None:
+                mm.close()
+
+    with _lock:
+        _stats["windows"] += 1
+    return Response(body, media_type=XML_MEDIA_TYPE, headers=out_headers)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "index_bytes": sum(e[2].nbytes for e in _entries.values()),
+        }
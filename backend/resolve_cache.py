@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("RESOLVE_CACHE_MAX_ENTRIES", 256))
+
+
+def canonical_selection(selected: list[str]) -> tuple[str, ...]:
+    # Resolution only depends on the set of labels
+    return tuple(sorted(set(selected)))
+
+
+class ResolveResult:
+    """
+    Every DM verdict for one selection, in index order.
+    """
+
+    __slots__ = ("verdicts", "applicable", "excluded", "applicable_set", "reasons_sample", "compute_seconds")
+
+    def __init__(self, verdicts: list[tuple[str, bool, str | None]], compute_seconds: float):
+        self.verdicts = verdicts
+        self.applicable = [p for p, ok, _ in verdicts if ok]
+        self.excluded = [p for p, ok, _ in verdicts if not ok]
+        self.applicable_set = frozenset(self.applicable)
+        self.reasons_sample = {}
+        for p, ok, reason in verdicts:
+            if ok:
+                continue
+            if len(self.reasons_sample) >= 20:
+                break
+            self.reasons_sample[p] = reason
+        self.compute_seconds = compute_seconds
+
+
+_lock = threading.Lock()
+_entries: "OrderedDict[tuple, ResolveResult]" = OrderedDict()
+_generation = None
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "saved_seconds": 0.0}
+
+
+def _check_generation_locked(generation) -> None:
+    global _generation
+    if generation != _generation:
+        if _entries:
+            _stats["invalidations"] += 1
+        _entries.clear()
+        _generation = generation
+
+
+def lookup(selection: tuple[str, ...], generation) -> ResolveResult | None:
+    with _lock:
+        _check_generation_locked(generation)
+        hit = _entries.get(selection)
+        if hit is None:
+            _stats["misses"] += 1
+            return None
+        _entries.move_to_end(selection)
+        _stats["hits"] += 1
+        _stats["saved_seconds"] += hit.compute_seconds
+        return hit
+
+
+def store(selection: tuple[str, ...], generation, result: ResolveResult) -> None:
+    with _lock:
+        _check_generation_locked(generation)
+        _entries[selection] = result
+        _entries.move_to_end(selection)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def get_or_compute(selection: tuple[str, ...], generation, compute) -> ResolveResult:
+    """
+    `compute()` returns the verdict list; it runs outside the lock.
+    """
+    hit = lookup(selection, generation)
+    if hit is not None:
+        return hit
+    t0 = time.perf_counter()
+    verdicts = list(compute())
+    result = ResolveResult(verdicts, time.perf_counter() - t0)
+    store(selection, generation, result)
+    return result
+
+
+def invalidate() -> None:
+    with _lock:
+        if _entries:
+            _stats["invalidations"] += 1
+        _entries.clear()
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "max_entries": MAX_ENTRIES,
+            "hit_rate": (_stats["hits"] / lookups) if lookups else None,
+        }
@@ -0,0 +1,188 @@
+"""
+Full-text search over DM titles, paras, steps, warnings and cautions.
+
+tools/index_bike_samples.py writes the index next to bike_index.json:
+lexicon.json (docs, weighted doc lengths, term -> postings location) and a
+postings file that is memory-mapped here, so loading costs one JSON read and
+a query only decodes the postings of its own terms. Ranking is BM25 over the
+field-weighted term frequencies recorded at index time.
+"""
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from pathlib import Path
+
+import numpy as np
+from fastapi import HTTPException
+
+from backend.applic_resolver import applicable_paths
+from backend.csdb_index import BASE_DIR, get_index
+
+SEARCH_DIR = Path(os.environ.get("SEARCH_INDEX_DIR", BASE_DIR / "data" / "search_index"))
+LEXICON_NAME = "lexicon.json"
+SEARCH_VERSION = 1
+
+# Must match tools/index_bike_samples.py
+TOKEN_RE = re.compile(r"[^\W_]+")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_RE.findall(text.casefold())
+
+
+def decode_varints(buf: np.ndarray) -> np.ndarray:
+    """
+    Decode a run of LEB128 varints (uint8 array) into uint64 values, vectorized.
+    """
+    if not len(buf):
+        return np.zeros(0, dtype=np.uint64)
+    ends = np.flatnonzero(buf < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    # position of every byte within its varint -> its shift
+    pos = np.arange(len(buf)) - np.repeat(starts, ends - starts + 1)
+    parts = (buf & 0x7F).astype(np.uint64) << (pos * 7).astype(np.uint64)
+    return np.add.reduceat(parts, starts)
+
+
+class SearchIndex:
+    """
+    Read-only view of one lexicon + postings pair.
+    """
+
+    def __init__(self, data: dict, mtime_ns: int):
+        self.mtime_ns = mtime_ns
+        self.fields: list[str] = data["fields"]
+        self.docs: list[str] = data["docs"]
+        self.doc_len = np.asarray(data["doc_len"], dtype=np.float64)
+        self.avg_len = float(self.doc_len.mean()) if len(self.docs) else 0.0
+        self.terms: dict[str, list[int]] = data["terms"]
+
+        with open(SEARCH_DIR / data["postings"], "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            # mmap refuses empty files
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        """
+        (doc ids, weighted tfs, field masks) for a term, or None if unknown.
+        """
+        loc = self.terms.get(term)
+        if loc is None:
+            return None
+        offset, df, ids_bytes, tfs_bytes = loc
+        block = np.frombuffer(self._mm, dtype=np.uint8, count=ids_bytes + tfs_bytes + df, offset=offset)
+        docs = np.cumsum(decode_varints(block[:ids_bytes])).astype(np.int64)
+        tfs = decode_varints(block[ids_bytes:ids_bytes + tfs_bytes]).astype(np.float64)
+        return docs, tfs, block[ids_bytes + tfs_bytes:]
+
+    def rank(self, terms: list[str]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        BM25 over every doc matching at least one term.
+        Returns (doc ids, scores, field masks), unordered.
+        """
+        n = len(self.docs)
+        scores = np.zeros(n, dtype=np.float64)
+        masks = np.zeros(n, dtype=np.uint8)
+        for term in dict.fromkeys(terms):
+            hit = self.postings(term)
+            if hit is None:
+                continue
+            docs, tfs, fmask = hit
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[docs] / self.avg_len)
+            scores[docs] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+            masks[docs] |= fmask
+        matched = np.flatnonzero(masks)
+        return matched, scores[matched], masks[matched]
+
+    def field_names(self, mask: int) -> list[str]:
+        return [f for bit, f in enumerate(self.fields) if mask & (1 << bit)]
+
+
+_lock = threading.Lock()
+_current: SearchIndex | None = None
+_stats = {"queries": 0, "reloads": 0}
+
+
+def get_search_index() -> SearchIndex:
+    """
+    The current search index, reloaded when lexicon.json changes on disk.
+    """
+    global _current
+    p = SEARCH_DIR / LEXICON_NAME
+    try:
+        mtime_ns = p.stat().st_mtime_ns
+    except OSError:
+        raise HTTPException(status_code=503, detail="Search index not built; run tools/index_bike_samples.py")
+    cur = _current
+    if cur is not None and cur.mtime_ns == mtime_ns:
+        return cur
+
+    with _lock:
+        if _current is None or _current.mtime_ns != mtime_ns:
+            data = json.loads(p.read_text(encoding="utf-8"))
+            if data.get("version") != SEARCH_VERSION:
+                raise HTTPException(status_code=503, detail="Search index is outdated; run tools/index_bike_samples.py")
+            _current = SearchIndex(data, mtime_ns)
+            _stats["reloads"] += 1
+        return _current
+
+
+def search(q: str, selected: list[str] | None = None, limit: int = 20, offset: int = 0) -> dict:
+    """
+    Rank DMs for the query `q`. With `selected`, only DMs the resolver finds
+    applicable to that selection are returned (the resolve cache makes this a
+    set lookup after the first query). `total` counts every match.
+    """
+    sidx = get_search_index()
+    terms = tokenize(q)
+    docs, scores, masks = sidx.rank(terms)
+
+    if selected is not None and len(docs):
+        allowed = applicable_paths(selected)
+        keep = np.fromiter((sidx.docs[d] in allowed for d in docs), dtype=bool, count=len(docs))
+        docs, scores, masks = docs[keep], scores[keep], masks[keep]
+
+    # best first; ties keep index order
+    order = np.lexsort((docs, -scores))[offset:offset + limit]
+
+    index = get_index()
+    items = []
+    for i in order:
+        path = sidx.docs[docs[i]]
+        meta = index.meta(path)
+        items.append({
+            "path": path,
+            "dmCode": meta["dmCode"],
+            "dmTitle": meta["dmTitle"],
+            "score": round(float(scores[i]), 4),
+            "fields": sidx.field_names(int(masks[i])),
+        })
+
+    with _lock:
+        _stats["queries"] += 1
+    return {
+        "query": q,
+        "terms": terms,
+        "selected": selected,
+        "total": len(docs),
+        "offset": offset,
+        "items": items,
+    }
+
+
+def stats() -> dict:
+    cur = _current
+    with _lock:
+        return {
+            **_stats,
+            "loaded": cur is not None,
+            "docs": len(cur.docs) if cur else 0,
+            "terms": len(cur.terms) if cur else 0,
+        }
@@ -0,0 +1,135 @@
+"""
+Bounded pool for the CPU-heavy request work: XML parsing, resolves, DM
+evaluation and live previews.
+
+Heavy calls run here instead of on Starlette's shared threadpool, so a big
+resolve can't starve /health or /icn. At most WORK_POOL_SIZE calls run at
+once; when WORK_POOL_MAX_PENDING more are already waiting, new ones are
+refused with 503 + Retry-After instead of queueing without bound.
+
+WORK_POOL_KIND=thread (default) keeps every in-process cache shared.
+WORK_POOL_KIND=process runs calls in worker processes for real CPU
+parallelism, at the cost of per-process caches. Generators (NDJSON streams)
+always run on the pool's threads.
+"""
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from fastapi import HTTPException
+
+KIND = os.environ.get("WORK_POOL_KIND", "thread")
+SIZE = max(1, int(os.environ.get("WORK_POOL_SIZE", min(4, os.cpu_count() or 1))))
+MAX_PENDING = int(os.environ.get("WORK_POOL_MAX_PENDING", 64))
+
+# NDJSON lines produced per hop to the pool
+STREAM_BATCH = 256
+
+_threads: ThreadPoolExecutor | None = None
+_processes: ProcessPoolExecutor | None = None
+_slots: asyncio.Semaphore | None = None
+# only touched from the event loop thread
+_stats = {"running": 0, "waiting": 0, "completed": 0, "rejected": 0}
+
+
+def _warm_worker() -> None:
+    from backend import csdb_index
+    csdb_index.get_index()
+
+
+def _call_in_worker(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except HTTPException as e:
+        # Raised with keyword arguments it won't unpickle in the parent (and
+        # that breaks the whole pool), so rebuild it positionally
+        raise HTTPException(e.status_code, e.detail, e.headers) from None
+
+
+def start() -> None:
+    global _threads, _processes, _slots
+    if _threads is None:
+        _threads = ThreadPoolExecutor(max_workers=SIZE, thread_name_prefix="work-pool")
+        _slots = asyncio.Semaphore(SIZE)
+    if KIND == "process" and _processes is None:
+        _processes = ProcessPoolExecutor(max_workers=SIZE, initializer=_warm_worker)
+
+
+def shutdown() -> None:
+    global _threads, _processes, _slots
+    for pool in (_threads, _processes):
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+    _threads = _processes = _slots = None
+
+
+async def _acquire() -> None:
+    start()
+    if _slots.locked() and _stats["waiting"] >= MAX_PENDING:
+        _stats["rejected"] += 1
+        raise HTTPException(status_code=503, detail="Server busy, retry shortly.", headers={"Retry-After": "1"})
+    _stats["waiting"] += 1
+    try:
+        await _slots.acquire()
+    finally:
+        _stats["waiting"] -= 1
+    _stats["running"] += 1
+
+
+def _release() -> None:
+    _stats["running"] -= 1
+    _stats["completed"] += 1
+    _slots.release()
+
+
+async def run(fn, *args, **kwargs):
+    """
+    Await fn(*args, **kwargs) on the pool. In process mode fn, its arguments
+    and its result must be picklable.
+    """
+    await _acquire()
+    try:
+        loop = asyncio.get_running_loop()
+        if KIND == "process":
+            return await loop.run_in_executor(_processes, _call_in_worker, fn, args, kwargs)
+        return await loop.run_in_executor(_threads, partial(fn, *args, **kwargs))
+    finally:
+        _release()
+
+
+def _next_batch(it) -> list:
+    batch = []
+    for item in it:
+        batch.append(item)
+        if len(batch) >= STREAM_BATCH:
+            break
+    return batch
+
+
+async def iterate(gen_fn, *args, **kwargs):
+    """
+    Take a pool slot, then return an async iterator over gen_fn(*args, **kwargs)
+    that is advanced in batches on the pool's threads and frees the slot when
+    exhausted or closed. Awaiting this before building the response means a
+    busy pool is reported as a 503, not as a broken 200 stream.
+    """
+    await _acquire()
+    return _drain(iter(gen_fn(*args, **kwargs)))
+
+
+async def _drain(it):
+    try:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await loop.run_in_executor(_threads, _next_batch, it)
+            if not batch:
+                break
+            for item in batch:
+                yield item
+    finally:
+        _release()
+
+
+def stats() -> dict:
+    return {**_stats, "kind": KIND, "size": SIZE, "max_pending": MAX_PENDING}
@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from lxml import etree
+
+# Budget is measured in source XML bytes. A parsed lxml tree is a few times
+# larger than the file on disk, so keep this well below the worker's RAM.
+MAX_CACHE_BYTES = int(os.environ.get("XML_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+_lock = threading.Lock()
+_entries: "OrderedDict[str, tuple[int, int, object]]" = OrderedDict()  # key -> (mtime_ns, size, root)
+_stats = {"hits": 0, "misses": 0, "evictions": 0, "bytes": 0}
+
+
+def _evict_locked() -> None:
+    while _stats["bytes"] > MAX_CACHE_BYTES and len(_entries) > 1:
+        _, (_, size, _) = _entries.popitem(last=False)
+        _stats["bytes"] -= size
+        _stats["evictions"] += 1
+
+
+def get_root(p: Path):
+    """
+    Return the parsed root element for an XML file, parsing it at most once
+    per (mtime, size). The returned tree is shared between callers: read it,
+    never modify it.
+    """
+    key = str(p)
+    st = p.stat()
+
+    with _lock:
+        hit = _entries.get(key)
+        if hit is not None and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            _entries.move_to_end(key)
+            _stats["hits"] += 1
+            return hit[2]
+        _stats["misses"] += 1
+
+    root = etree.fromstring(p.read_bytes())
+
+    with _lock:
+        old = _entries.pop(key, None)
+        if old is not None:
+            _stats["bytes"] -= old[1]
+        if st.st_size <= MAX_CACHE_BYTES:
+            _entries[key] = (st.st_mtime_ns, st.st_size, root)
+            _stats["bytes"] += st.st_size
+            _evict_locked()
+    return root
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+        _stats["bytes"] = 0
+
+
+def stats() -> dict:
+    with _lock:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {
+            **_stats,
+            "entries": len(_entries),
+            "max_bytes": MAX_CACHE_BYTES,
+            "hit_rate": (_stats["hits"] / lookups) if lookups else None,
+        }
@@ -1,7 +1,11 @@
 import logo from "./assets/logo.png";
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 
 const API_BASE = import.meta.env.VITE_API_BASE_URL;
+// DMs fetched per /dms page
+const PAGE_SIZE = 100;
+// Raw XML lines fetched per /dm-xml window
+const XML_WINDOW_LINES = 500;
 
 export default function App() {
   const [items, setItems] = useState([]);
@@ -10,13 +14,19 @@ export default function App() {
   const [err, setErr] = useState("");
 
   const [selectedLabels, setSelectedLabels] = useState("Mountain bicycle, Brook trekker Mk9");
-  const [applicablePaths, setApplicablePaths] = useState(null);
+  // labels the list is filtered by (null = no applicability filter)
+  const [appliedLabels, setAppliedLabels] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const listRequest = useRef(0);
 
   const [selectedDM, setSelectedDM] = useState(null);
   const [dmPreview, setDmPreview] = useState(null);
 
   const [showRawXml, setShowRawXml] = useState(false);
   const [dmXml, setDmXml] = useState("");
+  // next line to fetch and total lines of the raw XML (null until loaded)
+  const [xmlNextLine, setXmlNextLine] = useState(1);
+  const [xmlTotalLines, setXmlTotalLines] = useState(null);
 
   const [appliesInfo, setAppliesInfo] = useState(null);
 
@@ -594,18 +604,27 @@ export default function App() {
   // -------------------------
   // API calls
   // -------------------------
-  const loadDMs = async () => {
+  // Filtering and paging happen server-side; `cursor` appends the next page
+  const loadDMs = async (cursor = null) => {
+    const request = ++listRequest.current;
     setLoading(true);
     setErr("");
     try {
-      const res = await fetch(`${API_BASE}/dms?only_dmc=true`);
+      const params = new URLSearchParams({ only_dmc: "true", limit: String(PAGE_SIZE) });
+      if (q.trim()) params.set("q", q.trim());
+      if (appliedLabels !== null) params.set("selected", appliedLabels);
+      if (cursor) params.set("cursor", cursor);
+      const res = await fetch(`${API_BASE}/dms?${params}`);
       const data = await res.json();
       if (!res.ok) throw new Error(data?.detail || "Failed to load DMs");
-      setItems(data.items || []);
+      // a newer search superseded this one
+      if (request !== listRequest.current) return;
+      setItems((prev) => (cursor ? [...prev, ...(data.items || [])] : data.items || []));
+      setNextCursor(data.next_cursor || null);
     } catch (e) {
-      setErr(String(e));
+      if (request === listRequest.current) setErr(String(e));
     } finally {
-      setLoading(false);
+      if (request === listRequest.current) setLoading(false);
     }
   };
 
@@ -616,6 +635,7 @@ export default function App() {
       setDmPreview(null);
       setShowRawXml(false);
       setDmXml("");
+      setXmlTotalLines(null);
       setAppliesInfo(null);
       return;
     }
@@ -625,12 +645,14 @@ export default function App() {
     setDmPreview(null);
     setShowRawXml(false);
     setDmXml("");
+    setXmlTotalLines(null);
     setAppliesInfo(null);
 
     // 1) DM preview
     try {
-      const url = `${API_BASE}/dm-preview?path=${encodeURIComponent(dm.path)}&t=${Date.now()}`;
-      const res = await fetch(url, { cache: "no-store" });
+      // The API sends an ETag with no-cache, so the browser revalidates instead of re-downloading
+      const url = `${API_BASE}/dm-preview?path=${encodeURIComponent(dm.path)}`;
+      const res = await fetch(url);
       const data = await res.json();
       if (!res.ok) throw new Error(data?.detail || "Failed to load DM preview");
       setDmPreview(data);
@@ -651,61 +673,56 @@ export default function App() {
     }
   };
 
-  const loadRawXml = async () => {
+  // Raw XML comes in line windows, so huge DMs never load in one piece
+  const loadRawXml = async (more = false) => {
     if (!selectedDM) return;
     setErr("");
-    setDmXml("Loading XML...");
+    const startLine = more ? xmlNextLine : 1;
+    if (!more) setDmXml("Loading XML...");
     try {
-      const url = `${API_BASE}/dm?path=${encodeURIComponent(selectedDM.path)}`;
-      const res = await fetch(url);
-      const data = await res.json();
-      if (!res.ok) throw new Error(data?.detail || "Failed to load DM XML");
-      setDmXml(data.xml || "");
+      const params = new URLSearchParams({
+        path: selectedDM.path,
+        start_line: String(startLine),
+        lines: String(XML_WINDOW_LINES),
+      });
+      const res = await fetch(`${API_BASE}/dm-xml?${params}`);
+      if (!res.ok) {
+        const data = await res.json().catch(() => null);
+        throw new Error(data?.detail || "Failed to load DM XML");
+      }
+      const text = await res.text();
+      setDmXml((prev) => (more ? prev + text : text));
+      setXmlNextLine(startLine + XML_WINDOW_LINES);
+      setXmlTotalLines(Number(res.headers.get("X-Total-Lines")) || 0);
     } catch (e) {
-      setDmXml("");
+      if (!more) setDmXml("");
       setErr(String(e));
     }
   };
 
-  const runResolve = async () => {
+  const runResolve = () => {
     setErr("");
+    // /dms resolves the selection server-side
+    setAppliedLabels(selectedLabels);
 
-    const selected = selectedLabels
-      .split(",")
-      .map((s) => s.trim())
-      .filter(Boolean);
-
-    try {
-      const res = await fetch(`${API_BASE}/resolve`, {
-        method: "POST",
-        headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ selected }),
-      });
-      const data = await res.json();
-      if (!res.ok) throw new Error(data?.detail || "Resolve failed");
-
-      const paths = new Set((data.applicable || []).map((x) => x.path));
-      setApplicablePaths(paths.size > 0 ? paths : null);
-
-      // reset open DM
-      setSelectedDM(null);
-      setDmPreview(null);
-      setShowRawXml(false);
-      setDmXml("");
-      setAppliesInfo(null);
-    } catch (e) {
-      setErr(String(e));
-    }
+    // reset open DM
+    setSelectedDM(null);
+    setDmPreview(null);
+    setShowRawXml(false);
+    setDmXml("");
+    setXmlTotalLines(null);
+    setAppliesInfo(null);
   };
 
   const clearFilter = () => {
-    setApplicablePaths(null);
+    setAppliedLabels(null);
     setErr("");
 
     setSelectedDM(null);
     setDmPreview(null);
     setShowRawXml(false);
     setDmXml("");
+    setXmlTotalLines(null);
     setAppliesInfo(null);
   };
 
@@ -714,24 +731,13 @@ export default function App() {
   // -------------------------
   useEffect(() => {
     document.title = "S1000D Mini CSDB Explorer";
-    loadDMs();
   }, []);
 
-  
-  const filtered = useMemo(() => {
-    const query = q.toLowerCase().trim();
-
-    return items.filter((dm) => {
-      if (applicablePaths && !applicablePaths.has(dm.path)) return false;
-      if (!query) return true;
-
-      return (
-        (dm.dmCode || "").toLowerCase().includes(query) ||
-        (dm.dmTitle || "").toLowerCase().includes(query) ||
-        (dm.path || "").toLowerCase().includes(query)
-      );
-    });
-  }, [items, q, applicablePaths]);
+  // Reload the first page when the search or the applicability filter changes
+  useEffect(() => {
+    const t = setTimeout(() => loadDMs(), 250);
+    return () => clearTimeout(t);
+  }, [q, appliedLabels]);
 
 
 
@@ -789,7 +795,7 @@ export default function App() {
         <button
           onClick={clearFilter}
           style={{ padding: "10px 16px", borderRadius: 6 }}
-          disabled={!applicablePaths}
+          disabled={appliedLabels === null}
         >
           Clear Filter
         </button>
@@ -806,8 +812,8 @@ export default function App() {
 
       <div style={{ marginTop: 16, display: "flex", justifyContent: "space-between", color: "#444" }}>
         <div>
-          Showing <strong>{filtered.length}</strong> of <strong>{items.length}</strong> DMs
-          {applicablePaths ? " (applicability filter ON)" : ""}
+          Showing <strong>{items.length}</strong>{nextCursor ? "+" : ""} DMs
+          {appliedLabels !== null ? " (applicability filter ON)" : ""}
         </div>
       </div>
 
@@ -836,7 +842,7 @@ export default function App() {
           <div>Has applic?</div>
         </div>
 
-        {filtered.map((dm) => (
+        {items.map((dm) => (
           <div key={dm.path}>
             {/* Row */}
             <div
@@ -904,6 +910,18 @@ export default function App() {
                         Load XML
                       </button>
                     )}
+
+                    {showRawXml && xmlTotalLines !== null && xmlNextLine <= xmlTotalLines && (
+                      <button
+                        onClick={(e) => {
+                          e.stopPropagation();
+                          loadRawXml(true);
+                        }}
+                        style={{ padding: "8px 10px" }}
+                      >
+                        More lines ({xmlNextLine - 1} of {xmlTotalLines})
+                      </button>
+                    )}
                   </div>
                 </div>
 
@@ -945,6 +963,17 @@ export default function App() {
           </div>
         ))}
       </div>
+      {nextCursor && (
+        <div style={{ marginTop: 12, textAlign: "center" }}>
+          <button
+            onClick={() => loadDMs(nextCursor)}
+            disabled={loading}
+            style={{ padding: "10px 16px", borderRadius: 6 }}
+          >
+            Load more
+          </button>
+        </div>
+      )}
       <div
         style={{
           marginTop: 24,
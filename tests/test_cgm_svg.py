@@ -0,0 +1,82 @@
+import struct
+
+import pytest
+
+from backend.cgm_svg import CgmError, cgm_to_svg
+
+
+def _cmd(cls: int, eid: int, params: bytes = b"") -> bytes:
+    head = struct.pack(">H", (cls << 12) | (eid << 5) | len(params))
+    return head + params + (b"\0" if len(params) & 1 else b"")
+
+
+BEGIN_METAFILE = _cmd(0, 1)
+BEGIN_PICTURE = _cmd(0, 3)
+BEGIN_PICTURE_BODY = _cmd(0, 4)
+END_PICTURE = _cmd(0, 5)
+END_METAFILE = _cmd(0, 2)
+POLYLINE = _cmd(4, 1, struct.pack(">4h", 0, 0, 100, 100))
+
+
+def test_polyline_converts():
+    svg = cgm_to_svg(BEGIN_METAFILE + BEGIN_PICTURE + BEGIN_PICTURE_BODY + POLYLINE + END_PICTURE + END_METAFILE)
+    assert svg.startswith("<svg") and "<path" in svg
+
+
+def test_primitive_before_picture_body_is_cgm_error():
+    with pytest.raises(CgmError):
+        cgm_to_svg(BEGIN_METAFILE + POLYLINE + BEGIN_PICTURE + BEGIN_PICTURE_BODY + END_PICTURE)
+
+
+def test_truncated_stream_is_cgm_error():
+    data = BEGIN_METAFILE + BEGIN_PICTURE + BEGIN_PICTURE_BODY + POLYLINE
+    with pytest.raises(CgmError):
+        cgm_to_svg(data[:-3])
+
+
+def test_unexpected_failure_leaves_err_marker(tmp_path, monkeypatch):
+    from backend import icn_renditions
+
+    src = tmp_path / "ICN-TEST.CGM"
+    src.write_bytes(BEGIN_METAFILE + POLYLINE + END_METAFILE)
+    monkeypatch.setattr(icn_renditions, "RENDITION_DIR", tmp_path / "renditions")
+
+    with pytest.raises(icn_renditions.RenditionFailed):
+        icn_renditions.render_file(src)
+    with pytest.raises(icn_renditions.RenditionFailed):
+        icn_renditions.rendition_for(src)
+
+
+def test_prebuilt_rendition_served_without_prerender(tmp_path, monkeypatch):
+    import hashlib
+
+    from backend import icn_renditions
+
+    data = BEGIN_METAFILE + BEGIN_PICTURE + BEGIN_PICTURE_BODY + POLYLINE + END_PICTURE + END_METAFILE
+    src = tmp_path / "ICN-PREBUILT.CGM"
+    src.write_bytes(data)
+    monkeypatch.setattr(icn_renditions, "RENDITION_DIR", tmp_path / "renditions")
+    monkeypatch.setattr(icn_renditions, "PRERENDER", False)
+
+    with pytest.raises(icn_renditions.RenditionPending):
+        icn_renditions.rendition_for(src)
+    out, _ = icn_renditions.render_file(src)
+    assert out == icn_renditions.rendition_path(hashlib.sha256(data).hexdigest())
+    assert icn_renditions.rendition_for(src) == out
+
+
+def test_pending_file_hashed_once(tmp_path, monkeypatch):
+    from backend import icn_renditions
+
+    src = tmp_path / "ICN-PENDING.CGM"
+    src.write_bytes(BEGIN_METAFILE + BEGIN_PICTURE + BEGIN_PICTURE_BODY + END_PICTURE + END_METAFILE)
+    monkeypatch.setattr(icn_renditions, "RENDITION_DIR", tmp_path / "renditions")
+    monkeypatch.setattr(icn_renditions, "PRERENDER", False)
+
+    reads = []
+    read_bytes = type(src).read_bytes
+    monkeypatch.setattr(type(src), "read_bytes", lambda self: reads.append(self) or read_bytes(self))
+    for _ in range(3):
+        with pytest.raises(icn_renditions.RenditionPending):
+            icn_renditions.rendition_for(src)
+    assert reads == [src]
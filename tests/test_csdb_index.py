@@ -0,0 +1,54 @@
+import hashlib
+import os
+
+from backend.csdb_index import CsdbIndex
+
+
+def make_index(p):
+    data = p.read_bytes()
+    st = p.stat()
+    file_info = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": hashlib.sha256(data).hexdigest()}
+    dm = {"path": str(p), "dmCode": "DMC-TEST", "file": file_info}
+    return CsdbIndex({"data_modules": [dm]}, 0, 1), file_info
+
+
+def touch(p, delta_ns=10**9):
+    st = p.stat()
+    os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+
+def test_unchanged_file_is_verified(tmp_path):
+    p = tmp_path / "dm.xml"
+    p.write_bytes(b"<dmodule/>")
+    index, info = make_index(p)
+    assert index.verified_sha256(str(p)) == info["sha256"]
+
+
+def test_size_change_is_stale(tmp_path):
+    p = tmp_path / "dm.xml"
+    p.write_bytes(b"<dmodule/>")
+    index, _ = make_index(p)
+    p.write_bytes(b"<dmodule></dmodule>")
+    assert index.verified_sha256(str(p)) is None
+
+
+def test_touched_file_is_hashed_off_the_request_path(tmp_path):
+    p = tmp_path / "dm.xml"
+    p.write_bytes(b"<dmodule/>")
+    index, info = make_index(p)
+    touch(p)
+    # trusted on its size for now, hashed by the verifier later
+    assert index.verified_sha256(str(p)) == info["sha256"]
+    assert index._verify(str(p))
+    assert index.verified_sha256(str(p)) == info["sha256"]
+
+
+def test_same_size_edit_is_caught_by_verification(tmp_path):
+    p = tmp_path / "dm.xml"
+    p.write_bytes(b"<dmodule/>")
+    index, _ = make_index(p)
+    p.write_bytes(b"<dmodulx/>")
+    touch(p)
+    assert index.verified_sha256(str(p), block=True) is None
+    # the mismatch is remembered for this (mtime, size)
+    assert index.verified_sha256(str(p)) is None
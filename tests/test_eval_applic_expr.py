@@ -0,0 +1,27 @@
+import pytest
+
+from backend.eval_applic_expr import ApplicExprError, compile_expr, eval_rpn, to_rpn, tokenize
+
+
+@pytest.mark.parametrize("text, selected", [
+    ("A and (B or C)", {"A", "C"}),
+    ("A or B and C", {"B"}),
+    ("(A or B) and (C or D) and E", {"A", "D", "E"}),
+    ("All", set()),
+])
+def test_matches_rpn_evaluator(text, selected):
+    assert compile_expr(text)(selected) == eval_rpn(to_rpn(tokenize(text)), selected)
+
+
+def test_long_flat_chain_compiles():
+    text = " or ".join(f"L{i}" for i in range(5000))
+    assert compile_expr(text)({"L4999"})
+    assert not compile_expr(text.replace(" or ", " and "))({"L1"})
+
+
+def test_deep_nesting_is_an_expression_error():
+    text = "L0"
+    for _ in range(3000):
+        text = f"(L1 and ({text} or L2))"
+    with pytest.raises(ApplicExprError):
+        compile_expr(text)({"L0"})
@@ -0,0 +1,24 @@
+from backend import fleet_resolve
+from backend.eval_applic_expr import compile_expr
+
+
+def test_malformed_expressions_are_reported(monkeypatch):
+    rows = [
+        ("DMC-A.XML", "All", None),
+        ("DMC-B.XML", "A and", None),
+        ("DMC-C.XML", None, "unreadable"),
+        ("DMC-D.XML", None, None),
+    ]
+    monkeypatch.setattr(fleet_resolve, "get_index", lambda: None)
+    monkeypatch.setattr(fleet_resolve, "collect_applic_texts", lambda index: rows)
+    monkeypatch.setattr(fleet_resolve, "load_group_exprs", lambda: [compile_expr("or B"), compile_expr("B")])
+
+    paths, matrix, errors = fleet_resolve.applicability_matrix([["A"], ["B"]])
+
+    assert paths == [r[0] for r in rows]
+    assert matrix.tolist() == [[True, False, False, False], [True, False, False, True]]
+    assert errors == [
+        {"path": "DMC-B.XML", "error": "Applic parse error: operator 'and' is missing an operand"},
+        {"path": "DMC-C.XML", "error": "XML read error: unreadable"},
+        {"group": "or B", "error": "Applic parse error: operator 'or' is missing an operand"},
+    ]
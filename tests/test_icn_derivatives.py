@@ -0,0 +1,31 @@
+import pytest
+from PIL import Image
+
+from backend import icn_derivatives
+
+
+@pytest.fixture
+def gif(tmp_path, monkeypatch):
+    monkeypatch.setattr(icn_derivatives, "DERIVATIVE_DIR", tmp_path / "derivatives")
+    p = tmp_path / "ICN-TEST.gif"
+    Image.new("P", (300, 150)).save(p)
+    return p
+
+
+def test_gif_at_or_above_original_width_passes_through(gif):
+    assert icn_derivatives.get_derivative(gif, 300, None) is None
+    assert icn_derivatives.get_derivative(gif, 2048, None) is None
+
+
+def test_gif_is_shrunk_to_png(gif):
+    path, media_type = icn_derivatives.get_derivative(gif, 128, None)
+    assert media_type == "image/png"
+    with Image.open(path) as img:
+        assert img.width == 128
+
+
+def test_gif_converted_when_format_requested(gif):
+    path, media_type = icn_derivatives.get_derivative(gif, 2048, "webp")
+    assert media_type == "image/webp"
+    with Image.open(path) as img:
+        assert img.width == 300
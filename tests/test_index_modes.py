@@ -0,0 +1,45 @@
+import pytest
+
+from tools.index_bike_samples import DATASET_DIR, discover_xml_files, index_file
+
+SAMPLES = discover_xml_files(DATASET_DIR)
+
+
+@pytest.mark.parametrize("path", SAMPLES, ids=lambda p: p.name)
+def test_stream_and_tree_modes_agree(path):
+    stream = index_file(str(path), mode="stream")
+    tree = index_file(str(path), mode="tree")
+    assert stream["entry"] == tree["entry"]
+    assert stream["groups"] == tree["groups"]
+    assert stream["search"] == tree["search"]
+
+
+MIXED_DM = """<?xml version="1.0"?>
+<dmodule>
+  <identAndStatusSection><dmAddress>
+    <dmIdent><dmCode modelIdentCode="T" systemDiffCode="A" systemCode="00" subSystemCode="0"
+      subSubSystemCode="0" assyCode="00" disassyCode="00" disassyCodeVariant="A" infoCode="00W"
+      infoCodeVariant="A" itemLocationCode="D"/></dmIdent>
+    <dmAddressItems><dmTitle><techName>  Mixed <!-- note --> content </techName></dmTitle></dmAddressItems>
+  </dmAddress>
+  <dmStatus><applic><displayText>  <simplePara>Model <?pi x?>A</simplePara>   or B </displayText></applic></dmStatus>
+  </identAndStatusSection>
+  <content><applicCrossRefTable>
+    %s
+  </applicCrossRefTable></content>
+</dmodule>
+"""
+
+
+def test_stream_captures_match_tree_on_mixed_content(tmp_path):
+    rows = "\\n".join(
+        f"<productAttribute id='a{i}'>  <name>Attr<!--c-->ibute {i}</name>\\n  <descr>  text {i} </descr> tail {i}</productAttribute>"
+        for i in range(200)
+    )
+    path = tmp_path / "DMC-MIXED.XML"
+    path.write_text(MIXED_DM % rows, encoding="utf-8")
+    stream = index_file(str(path), mode="stream")
+    tree = index_file(str(path), mode="tree")
+    assert stream["entry"] == tree["entry"]
+    assert stream["search"] == tree["search"]
+    assert len(stream["entry"]["applicability_signals"]["elements"][-1]["text"]) == 180
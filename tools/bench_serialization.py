@@ -0,0 +1,144 @@
+"""
+Benchmark JSON serialization and response compression on real payloads:
+/dms, /resolve, /dm and /dm-preview of the largest DMs (ACTs, BREX rule
+lists and the like).
+
+For every payload it times FastAPI's default path (jsonable_encoder +
+JSONResponse) against the FAST_JSON path (orjson), and gzip/brotli at the
+levels backend.compression uses, reporting sizes. Then it times the
+endpoints end to end through the app for every serializer x encoding pair.
+
+The end-to-end part needs httpx for Starlette's TestClient, and the orjson /
+brotli columns need those optional packages; all are in requirements-dev.txt.
+Whatever is missing is reported and skipped. Run from the repo root:
+
+    python -m tools.bench_serialization [--repeat N] [--top K]
+"""
+import argparse
+import gzip
+import statistics
+import time
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend import compression, fast_json
+from backend.applic_resolver import resolve_applicability
+from backend.csdb_index import abs_path, get_index
+from backend.dm_catalog import DmQuery, query_dms
+from backend.dm_detail import load_dm_details
+from backend.proc_preview import get_dm_preview
+
+
+def timed(fn, repeat: int) -> float:
+    """
+    Median wall time of fn() in milliseconds.
+    """
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000
+
+
+def largest_dms(k: int) -> list[str]:
+    paths = [dm["path"] for dm in get_index().entries]
+    return sorted(paths, key=lambda p: abs_path(p).stat().st_size, reverse=True)[:k]
+
+
+def payloads(top: list[str]) -> list[tuple[str, str, dict, object]]:
+    """
+    (label, url, params or JSON body, payload) per benchmarked response.
+    """
+    out = [
+        ("/dms", "/dms", {}, query_dms(DmQuery())),
+        ("/resolve []", "/resolve", {"selected": []}, resolve_applicability([])),
+    ]
+    out.append((f"/dm {Path(top[0]).name}", "/dm", {"path": top[0]}, load_dm_details(top[0])))
+    for p in top:
+        out.append((f"/dm-preview {Path(p).name}", "/dm-preview", {"path": p}, get_dm_preview(p)[1]))
+    return out
+
+
+def bench_encoding(items, repeat: int) -> None:
+    codecs = [("gzip", lambda b: gzip.compress(b, compresslevel=compression.GZIP_LEVEL))]
+    if compression.brotli is not None:
+        codecs.append(("br", lambda b: compression.brotli.compress(b, quality=compression.BROTLI_QUALITY)))
+
+    print(f"Serialization (median of {repeat}, ms)")
+    print(f"  {'payload':60} {'bytes':>9} {'default':>9} {'orjson':>9}  same bytes")
+    for label, _, _, payload in items:
+        body = JSONResponse(jsonable_encoder(payload)).body
+        default = timed(lambda: JSONResponse(jsonable_encoder(payload)), repeat)
+        if fast_json.orjson is not None:
+            fast = f"{timed(lambda: fast_json.FastJSONResponse(payload), repeat):9.3f}"
+            same = fast_json.FastJSONResponse(payload).body == body
+        else:
+            fast, same = f"{'n/a':>9}", "-"
+        print(f"  {label[:60]:60} {len(body):9d} {default:9.3f} {fast}  {same}")
+
+    print(f"\nCompression (median of {repeat}; gzip level {compression.GZIP_LEVEL}, "
+          f"brotli quality {compression.BROTLI_QUALITY}{'' if compression.brotli else ', brotli not installed'})")
+    print(f"  {'payload':60} {'codec':>5} {'bytes':>9} {'ratio':>6} {'ms':>9}")
+    for label, _, _, payload in items:
+        body = JSONResponse(jsonable_encoder(payload)).body
+        for name, fn in codecs:
+            packed = fn(body)
+            print(f"  {label[:60]:60} {name:>5} {len(packed):9d} {len(packed) / len(body):6.2f} "
+                  f"{timed(lambda: fn(body), repeat):9.3f}")
+
+
+def bench_endpoints(items, repeat: int) -> None:
+    try:
+        from fastapi.testclient import TestClient
+    except RuntimeError as e:
+        print(f"\nSkipping endpoints: {str(e).splitlines()[0]} (pip install -r requirements-dev.txt)")
+        return
+
+    serializers = [("default", False)] + ([("orjson", True)] if fast_json.orjson is not None else [])
+    encodings = ["identity"] + list(reversed(compression.ENCODINGS)) if compression.ENABLED else ["identity"]
+
+    print(f"\nEndpoints through the app (median of {repeat}, ms; bytes as sent)")
+    print(f"  {'payload':60} {'json':>8} {'encoding':>8} {'bytes':>9} {'ms':>9}")
+    enabled = fast_json.ENABLED
+    try:
+        with TestClient(app_for_bench()) as client:
+            for label, url, params, _ in items:
+                for sname, on in serializers:
+                    fast_json.ENABLED = on
+                    for enc in encodings:
+                        headers = {"accept-encoding": enc}
+                        if url == "/resolve":
+                            call = lambda: client.post(url, json=params, headers=headers)
+                        else:
+                            call = lambda: client.get(url, params=params, headers=headers)
+                        r = call()
+                        sent = int(r.headers.get("content-length") or len(r.content))
+                        print(f"  {label[:60]:60} {sname:>8} {enc:>8} {sent:9d} {timed(call, repeat):9.3f}")
+    finally:
+        fast_json.ENABLED = enabled
+
+
+def app_for_bench():
+    # Imported late so the env (COMPRESSION, FAST_JSON, ...) is read as the API would
+    from backend.main import app
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark JSON serialization and response compression.")
+    ap.add_argument("--repeat", type=int, default=20, help="timed runs per measurement (default: 20)")
+    ap.add_argument("--top", type=int, default=3, help="largest DMs to preview (default: 3)")
+    ap.add_argument("--no-endpoints", action="store_true", help="skip the end-to-end endpoint timings")
+    args = ap.parse_args()
+
+    items = payloads(largest_dms(args.top))
+    bench_encoding(items, args.repeat)
+    if not args.no_endpoints:
+        bench_endpoints(items, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Benchmark suite and regression gate for the hot paths.
+
+Times the core functions (resolve_applicability, eval_dm, extract_dm_preview,
+list_dms, find_icn_file, search, index load), cold and warm where caches
+matter, and the API endpoints through the app. Every case runs --repeat
+timed iterations after a warm-up call, then one more under tracemalloc for
+its peak Python allocation.
+
+Results can be saved as a baseline and later runs compared against it: the
+exit status is 1 when any case's median time grew by more than --tolerance,
+or its peak memory by more than --mem-tolerance, so it can gate changes.
+The endpoint cases need the packages in requirements-dev.txt (httpx for
+Starlette's TestClient); without them they are skipped with a message.
+Use a CSDB big enough to matter, e.g. one from generate_synthetic_csdb.py:
+
+    python tools/generate_synthetic_csdb.py --out /tmp/csdb --dms 5000 --index
+    python -m tools.bench_suite --csdb /tmp/csdb --save-baseline bench-baseline.json
+    python -m tools.bench_suite --csdb /tmp/csdb --baseline bench-baseline.json
+
+Baselines are machine-specific; compare runs from the same host and CSDB.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+RESULTS_VERSION = 1
+
+# Present in the samples and in every synthetic CSDB
+SELECTION = ["Mountain bicycle", "Mountain storm Mk1"]
+SEARCH_QUERY = "brake wheel"
+
+
+class Case(NamedTuple):
+    name: str
+    fn: Callable[[], object]
+    setup: Callable[[], None] | None = None     # runs untimed before every iteration
+
+
+def measure(case: Case, repeat: int) -> dict:
+    if case.setup:
+        case.setup()
+    case.fn()   # warm-up; also surfaces errors before timing
+
+    times = []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        t0 = time.perf_counter()
+        case.fn()
+        times.append(time.perf_counter() - t0)
+
+    if case.setup:
+        case.setup()
+    tracemalloc.start()
+    try:
+        case.fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 4),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))] * 1000, 4),
+        "min_ms": round(times[0] * 1000, 4),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def function_cases(sample: list[str], icn_urns: list[str]) -> list[Case]:
+    from backend import csdb_index, dm_catalog, resolve_cache, xml_cache
+    from backend.applic_resolver import resolve_applicability
+    from backend.dm_catalog import DmQuery, list_dms, query_dms
+    from backend.dm_eval import eval_dm
+    from backend.icn_assets import DATASET_DIR, IcnRegistry, find_icn_file
+    from backend.proc_preview import build_dm_preview, extract_dm_preview
+    from backend.search_index import search
+
+    def list_dms_json():
+        enabled = dm_catalog.USE_CATALOG
+        dm_catalog.USE_CATALOG = False
+        try:
+            return list_dms()
+        finally:
+            dm_catalog.USE_CATALOG = enabled
+
+    def load_index():
+        data = json.loads(csdb_index.INDEX_PATH.read_text(encoding="utf-8"))
+        return csdb_index.CsdbIndex(data, 0, 0)
+
+    return [
+        Case("index load", load_index),
+        Case("resolve_applicability cold", lambda: resolve_applicability(SELECTION), resolve_cache.invalidate),
+        Case("resolve_applicability warm", lambda: resolve_applicability(SELECTION)),
+        Case(f"eval_dm x{len(sample)}", lambda: [eval_dm(p, SELECTION) for p in sample]),
+        # build_dm_preview is the extraction behind extract_dm_preview's caches
+        Case(f"build_dm_preview cold x{len(sample)}", lambda: [build_dm_preview(p) for p in sample], xml_cache.clear),
+        Case(f"extract_dm_preview warm x{len(sample)}", lambda: [extract_dm_preview(p) for p in sample]),
+        Case("list_dms", list_dms),
+        Case("list_dms json", list_dms_json),
+        Case("query_dms page", lambda: query_dms(DmQuery(), limit=100)),
+        Case(f"find_icn_file x{len(icn_urns)}", lambda: [find_icn_file(u) for u in icn_urns]),
+        Case("icn registry build", lambda: IcnRegistry(DATASET_DIR)),
+        Case("search", lambda: search(SEARCH_QUERY)),
+    ]
+
+
+def endpoint_cases(client, path: str, icn_urn: str | None) -> list[Case]:
+    def get(url, **params):
+        def call():
+            r = client.get(url, params=params)
+            if r.status_code != 200:
+                raise RuntimeError(f"GET {url} {params}: {r.status_code} {r.text[:200]}")
+        return call
+
+    def post(url, body):
+        def call():
+            r = client.post(url, json=body)
+            if r.status_code != 200:
+                raise RuntimeError(f"POST {url}: {r.status_code} {r.text[:200]}")
+        return call
+
+    cases = [
+        Case("GET /dms", get("/dms")),
+        Case("GET /dms?limit=100", get("/dms", limit=100)),
+        Case("GET /dms?selected", get("/dms", selected=",".join(SELECTION), limit=100)),
+        Case("POST /resolve", post("/resolve", {"selected": SELECTION})),
+        Case("POST /resolve paths_only", post("/resolve", {"selected": SELECTION, "paths_only": True})),
+        Case("GET /dm-eval", get("/dm-eval", path=path, selected=",".join(SELECTION))),
+        Case("GET /dm-preview", get("/dm-preview", path=path)),
+        Case("GET /dm", get("/dm", path=path)),
+        Case("GET /search", get("/search", q=SEARCH_QUERY)),
+    ]
+    if icn_urn:
+        cases.append(Case("GET /icn", get("/icn", urn=icn_urn)))
+    return cases
+
+
+def run(args) -> dict:
+    # The backend reads CSDB_ROOT and its other settings at import time
+    if args.csdb:
+        os.environ["CSDB_ROOT"] = str(args.csdb.resolve())
+    os.environ.setdefault("ICN_PRERENDER", "0")
+
+    from backend.csdb_index import get_index
+    from backend.icn_assets import WEB_EXTS, get_registry
+
+    index = get_index()
+    rng = random.Random(args.seed)
+    dm_paths = [dm["path"] for dm in index.entries if Path(dm["path"]).name.upper().startswith("DMC-")]
+    sample = rng.sample(dm_paths, min(args.sample, len(dm_paths)))
+    # raster ICNs: CGMs depend on the rendition pipeline, which is benchmarked elsewhere
+    icns = sorted({
+        p.stem for entries in get_registry().renditions.values() for _, _, p in entries
+        if p.suffix.lower() in WEB_EXTS
+    })
+    icn_urns = [f"URN:S1000D:{s}" for s in rng.sample(icns, min(args.sample, len(icns)))]
+
+    only = [s.strip().lower() for s in (args.only or "").split(",") if s.strip()]
+
+    def selected(cases):
+        return [c for c in cases if not only or any(s in c.name.lower() for s in only)]
+
+    results: dict[str, dict] = {}
+
+    def report(case: Case) -> None:
+        res = results[case.name] = measure(case, args.repeat)
+        print(f"  {case.name:42} {res['median_ms']:10.3f} {res['p95_ms']:10.3f} {res['peak_kib']:11.1f}", flush=True)
+
+    header = f"  {'case':42} {'median ms':>10} {'p95 ms':>10} {'peak KiB':>11}"
+    print(f"CSDB: {len(index.entries)} DMs, {len(icns)} raster ICNs; {args.repeat} runs per case")
+    print(header)
+    for case in selected(function_cases(sample, icn_urns)):
+        report(case)
+
+    if not args.no_endpoints:
+        try:
+            from fastapi.testclient import TestClient
+        except RuntimeError as e:
+            # Starlette's TestClient needs httpx (requirements-dev.txt)
+            TestClient = None
+            print(f"  skipping endpoint cases: {str(e).splitlines()[0]} (pip install -r requirements-dev.txt)")
+        if TestClient is not None:
+            from backend.main import app
+
+            with TestClient(app) as client:
+                for case in selected(endpoint_cases(client, sample[0], icn_urns[0] if icn_urns else None)):
+                    report(case)
+
+    return {
+        "version": RESULTS_VERSION,
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "csdb_root": os.environ.get("CSDB_ROOT", ""),
+            "dms": len(index.entries),
+            "repeat": args.repeat,
+            "sample": len(sample),
+            "seed": args.seed,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, args) -> int:
+    """
+    Print the comparison with `baseline`; return the number of regressions.
+    """
+    if baseline.get("version") != RESULTS_VERSION:
+        raise SystemExit(f"Baseline has version {baseline.get('version')}, expected {RESULTS_VERSION}")
+    for key in ("dms", "repeat", "sample", "seed"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"warning: baseline {key}={baseline['meta'].get(key)} but this run has {current['meta'].get(key)}")
+
+    base, cur = baseline["results"], current["results"]
+    regressions = 0
+    print(f"\nAgainst baseline from {baseline['meta'].get('created')} "
+          f"(time +{args.tolerance:.0%}, memory +{args.mem_tolerance:.0%})")
+    print(f"  {'case':42} {'base ms':>10} {'ms':>10} {'ratio':>7} {'base KiB':>10} {'KiB':>10}  verdict")
+    for name, res in cur.items():
+        b = base.get(name)
+        if b is None:
+            print(f"  {name:42} {'':>10} {res['median_ms']:10.3f} {'':>7} {'':>10} {res['peak_kib']:10.1f}  new")
+            continue
+        ratio = res["median_ms"] / b["median_ms"] if b["median_ms"] else float("inf")
+        slower = ratio > 1 + args.tolerance and res["median_ms"] - b["median_ms"] > args.min_delta_ms
+        bigger = (
+            res["peak_kib"] > b["peak_kib"] * (1 + args.mem_tolerance)
+            and res["peak_kib"] - b["peak_kib"] > args.min_delta_kib
+        )
+        if slower or bigger:
+            regressions += 1
+            verdict = "REGRESSION (" + ", ".join(w for w, f in (("time", slower), ("memory", bigger)) if f) + ")"
+        elif ratio < 1 - args.tolerance:
+            verdict = "faster"
+        else:
+            verdict = "ok"
+        print(f"  {name:42} {b['median_ms']:10.3f} {res['median_ms']:10.3f} {ratio:7.2f} "
+              f"{b['peak_kib']:10.1f} {res['peak_kib']:10.1f}  {verdict}")
+    for name in sorted(base.keys() - cur.keys()):
+        print(f"  {name:42} not run")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark the hot paths and compare against a baseline.")
+    ap.add_argument("--csdb", type=Path, help="CSDB root holding data/ (default: this repo)")
+    ap.add_argument("--repeat", type=int, default=10, help="timed runs per case (default: 10)")
+    ap.add_argument("--sample", type=int, default=50, help="DMs / ICNs per batched case (default: 50)")
+    ap.add_argument("--seed", type=int, default=1, help="seed for picking the samples (default: 1)")
+    ap.add_argument("--only", help="comma-separated substrings of the cases to run")
+    ap.add_argument("--no-endpoints", action="store_true", help="skip the endpoint cases")
+    ap.add_argument("--out", type=Path, help="write this run's results as JSON")
+    ap.add_argument("--save-baseline", type=Path, help="write this run's results as the baseline")
+    ap.add_argument("--baseline", type=Path, help="compare against this baseline; exit 1 on regressions")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="allowed median time growth (default: 0.25)")
+    ap.add_argument("--mem-tolerance", type=float, default=0.25, help="allowed peak memory growth (default: 0.25)")
+    ap.add_argument("--min-delta-ms", type=float, default=0.1,
+                    help="ignore time changes smaller than this (default: 0.1)")
+    ap.add_argument("--min-delta-kib", type=float, default=64,
+                    help="ignore memory changes smaller than this (default: 64)")
+    args = ap.parse_args()
+
+    current = run(args)
+    for p in (args.out, args.save_baseline):
+        if p:
+            p.write_text(json.dumps(current, indent=2), encoding="utf-8")
+            print(f"Wrote: {p.resolve()}")
+
+    if args.baseline:
+        regressions = compare(current, json.loads(args.baseline.read_text(encoding="utf-8")), args)
+        print(f"Regressions: {regressions}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
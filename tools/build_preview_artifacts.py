@@ -0,0 +1,140 @@
+"""
+Pre-build /dm-preview responses for every DM in the index.
+
+Each preview is written exactly as the API would send it (compact JSON),
+gzip-compressed and named by the sha256 of the JSON, so identical previews
+share one file and unchanged ones are not rewritten. manifest.json maps DM
+paths to artifacts together with the source hash and index metadata they
+were built from. The API serves a matching artifact straight from disk.
+
+Run from the repo root after tools/index_bike_samples.py:
+
+    python -m tools.build_preview_artifacts [--jobs N] [--full]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from backend.csdb_index import abs_path, get_index
+from backend.preview_artifacts import ARTIFACT_DIR, MANIFEST_NAME, MANIFEST_VERSION
+from backend.preview_cache import content_sha256
+from backend.proc_preview import EXTRACTOR_VERSION, build_dm_preview
+
+
+def render_json(preview: dict) -> bytes:
+    # Same bytes as FastAPI's JSONResponse
+    return json.dumps(preview, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def write_atomic(p, data: bytes) -> None:
+    tmp = p.with_name(f"{p.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, p)
+
+
+def build_artifact(path: str) -> dict:
+    """
+    Worker: extract one preview and store its artifact. Returns the manifest entry.
+    """
+    sha = content_sha256(path, abs_path(path))
+    try:
+        preview = build_dm_preview(path)
+    except Exception as e:
+        return {"path": path, "error": f"{type(e).__name__}: {e}"}
+
+    body = render_json(preview)
+    name = hashlib.sha256(body).hexdigest() + ".json.gz"
+    out = ARTIFACT_DIR / name
+    if not out.exists():
+        write_atomic(out, gzip.compress(body, compresslevel=9, mtime=0))
+    return {
+        "path": path,
+        "sha256": sha,
+        "dmCode": preview.get("dmCode"),
+        "dmTitle": preview.get("dmTitle"),
+        "artifact": name,
+        "bytes": len(body),
+        "compressed_bytes": out.stat().st_size,
+    }
+
+
+def load_manifest() -> dict:
+    try:
+        data = json.loads((ARTIFACT_DIR / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION or data.get("extractor_version") != EXTRACTOR_VERSION:
+        return {}
+    return data.get("entries", {})
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Pre-build gzip'd /dm-preview artifacts for every DM.")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    ap.add_argument("--full", action="store_true", help="ignore the manifest and rebuild every preview")
+    args = ap.parse_args()
+
+    index = get_index()
+    previous = {} if args.full else load_manifest()
+    ARTIFACT_DIR.mkdir(parents=True, exist_ok=True)
+
+    entries: dict[str, dict] = {}
+    todo: list[str] = []
+    for dm in index.entries:
+        path = dm["path"]
+        prev = previous.get(path)
+        if (
+            prev
+            and (ARTIFACT_DIR / prev["artifact"]).is_file()
+            and index.verified_sha256(path, block=True) == prev["sha256"]
+            and index.meta(path) == {"dmCode": prev.get("dmCode"), "dmTitle": prev.get("dmTitle")}
+        ):
+            entries[path] = prev
+        else:
+            todo.append(path)
+
+    if args.jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            chunksize = max(1, len(todo) // (args.jobs * 4))
+            results = list(pool.map(build_artifact, todo, chunksize=chunksize))
+    else:
+        results = [build_artifact(p) for p in todo]
+
+    errors = []
+    for rec in results:
+        path = rec.pop("path")
+        if "error" in rec:
+            errors.append((path, rec["error"]))
+        else:
+            entries[path] = rec
+
+    write_atomic(ARTIFACT_DIR / MANIFEST_NAME, json.dumps({
+        "version": MANIFEST_VERSION,
+        "extractor_version": EXTRACTOR_VERSION,
+        "entries": entries,
+    }, ensure_ascii=False).encode("utf-8"))
+
+    # drop artifacts nothing refers to any more
+    referenced = {e["artifact"] for e in entries.values()}
+    removed = 0
+    for p in ARTIFACT_DIR.glob("*.json.gz"):
+        if p.name not in referenced:
+            p.unlink()
+            removed += 1
+
+    raw = sum(e["bytes"] for e in entries.values())
+    packed = sum(e["compressed_bytes"] for e in entries.values())
+    print(f"DMs: {len(index.entries)}")
+    print(f"Built: {len(todo) - len(errors)}  Reused: {len(entries) - (len(todo) - len(errors))}  "
+          f"Failed: {len(errors)}  Removed artifacts: {removed}")
+    print(f"Artifacts: {len(referenced)}  JSON: {raw} bytes  gzip: {packed} bytes")
+    for path, err in errors:
+        print(f"  {path}: {err}")
+    print(f"Wrote: {ARTIFACT_DIR / MANIFEST_NAME}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,40 @@
-import json
-from pathlib import Path
-from lxml import etree
+"""
+Rewrite data/applic_groups.json without re-indexing the CSDB.
 
-DATASET_DIR = Path("data/S1000D_4-1_Bike_Samples")
-OUT_PATH = Path("data/applic_groups.json")
+The indexer already writes this file in the same pass as bike_index.json;
+this only re-runs the referencedApplicGroup extraction step, for scripts
+that still call it on its own:
+
+    python tools/extract_applic_groups.py
+    python -m tools.extract_applic_groups
+"""
+import json
 
-def local_name(tag) -> str:
-    if not isinstance(tag, str):
-        return ""
-    if tag.startswith("{"):
-        return tag.split("}", 1)[1]
-    return tag
+from lxml import etree
 
-def text_of(el) -> str:
-    return " ".join("".join(el.itertext()).split())
+try:
+    # run as a script: tools/ is on sys.path
+    from index_bike_samples import (
+        DATASET_DIR, GROUPS_OUT_PATH, discover_xml_files, find_referenced_applic_groups, write_text_atomic,
+    )
+except ImportError:
+    from tools.index_bike_samples import (
+        DATASET_DIR, GROUPS_OUT_PATH, discover_xml_files, find_referenced_applic_groups, write_text_atomic,
+    )
 
 def main():
-    xml_files = sorted(DATASET_DIR.rglob("*.xml"))
     groups = []
-
-    for path in xml_files:
-        root = etree.fromstring(path.read_bytes())
-
-        # grab any referencedApplicGroup blocks
-        for el in root.iter():
-            if local_name(el.tag) == "referencedApplicGroup":
-                g = {
-                    "source": str(path),
-                    "raw_text": text_of(el),
-                    "ids": {},
-                }
-                # capture any attributes that look like IDs
-                for k, v in el.attrib.items():
-                    g["ids"][k] = v
-                groups.append(g)
-
-    OUT_PATH.write_text(json.dumps(groups, indent=2, ensure_ascii=False), encoding="utf-8")
+    for path in discover_xml_files(DATASET_DIR):
+        try:
+            root = etree.parse(str(path)).getroot()
+        except (OSError, etree.XMLSyntaxError):
+            continue
+        groups.extend(find_referenced_applic_groups(root, str(path)))
+
+    GROUPS_OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    write_text_atomic(GROUPS_OUT_PATH, json.dumps(groups, indent=2, ensure_ascii=False))
     print(f"Found referencedApplicGroup blocks: {len(groups)}")
-    print(f"Wrote: {OUT_PATH.resolve()}")
+    print(f"Wrote: {GROUPS_OUT_PATH.resolve()}")
 
 if __name__ == "__main__":
     main()
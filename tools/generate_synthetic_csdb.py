@@ -0,0 +1,385 @@
+"""
+Generate a synthetic CSDB of configurable size from the bike samples.
+
+Sample DMs, ACTs and ICNs are cloned under new codes and mutated:
+- every DM clone gets a unique dmCode (model SYNBIKE) and file name;
+- its <applic> is replaced following an applicability mix: "All", no
+  <applic> (left to its ACT), or a random and/or expression of depth up
+  to --max-depth over a product vocabulary grown to --labels labels;
+  inline referencedApplicGroup blocks are regenerated the same way;
+- ACT clones carry --act-groups generated referencedApplicGroup blocks, and
+  DM clones point their applicCrossRefTableRef at a random ACT clone;
+- ICN clones copy a sample's renditions under a new ICN code, and DM clones
+  reference random ICN clones;
+- --body-repeat N repeats the main content of each DM to grow file sizes.
+
+The samples themselves are copied too. The output is a tree with the same
+layout as the repo (<out>/data/S1000D_4-1_Bike_Samples), so it can be
+indexed and served with CSDB_ROOT=<out>:
+
+    python tools/generate_synthetic_csdb.py --out /tmp/csdb --dms 5000 --icns 500 --index
+    CSDB_ROOT=/tmp/csdb uvicorn backend.main:app
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from lxml import etree
+
+SAMPLES_DIR = Path("data/S1000D_4-1_Bike_Samples")
+DATASET_SUBDIR = Path("data") / "S1000D_4-1_Bike_Samples"
+INDEXER = Path(__file__).resolve().parent / "index_bike_samples.py"
+
+SYN_MODEL = "SYNBIKE"
+ACT_INFO_CODE = "00W"
+# ACT, CCT and PCT are cloned (ACT) or kept as they are, never used as DM templates
+XREF_INFO_CODES = {"00W", "00Q", "00P"}
+
+# Labels as they appear in the samples' <applic> display texts
+SAMPLE_LABELS = ["Mountain bicycle", "Mountain storm Mk1", "Brook trekker Mk9"]
+LABEL_FAMILIES = ["Mountain storm", "Brook trekker", "Road racer", "City cruiser", "Trail hopper", "Cargo hauler"]
+
+# Shares of DM clones per applicability kind; the samples are roughly
+# 7% "All", 25% without <applic> and the rest expressions
+DEFAULT_MIX = {"all": 0.07, "none": 0.25, "expr": 0.68}
+
+DMCODE_ATTRS = (
+    "modelIdentCode", "systemDiffCode", "systemCode",
+    "subSystemCode", "subSubSystemCode", "assyCode",
+    "disassyCode", "disassyCodeVariant",
+    "infoCode", "infoCodeVariant", "itemLocationCode",
+)
+
+PARSER = etree.XMLParser(resolve_entities=False, load_dtd=False, no_network=True, huge_tree=True)
+
+
+def local_name(tag) -> str:
+    if not isinstance(tag, str):
+        return ""
+    if tag.startswith("{"):
+        return tag.split("}", 1)[1]
+    return tag
+
+
+def dmcode_string(attrs) -> str:
+    a = {k: attrs.get(k, "") for k in DMCODE_ATTRS}
+    return (
+        f"{a['modelIdentCode']}-{a['systemDiffCode']}-{a['systemCode']}-"
+        f"{a['subSystemCode']}{a['subSubSystemCode']}-{a['assyCode']}-"
+        f"{a['disassyCode']}{a['disassyCodeVariant']}-{a['infoCode']}{a['infoCodeVariant']}-"
+        f"{a['itemLocationCode']}"
+    )
+
+
+def dm_ident(root):
+    """
+    (dmCode, issueInfo, language) elements of the DM's own identity.
+    """
+    for ident in root.iter("dmIdent"):
+        parts = {local_name(c.tag): c for c in ident}
+        return parts.get("dmCode"), parts.get("issueInfo"), parts.get("language")
+    return None, None, None
+
+
+def dm_file_name(code, issue, lang) -> str:
+    name = f"DMC-{dmcode_string(code.attrib)}"
+    if issue is not None:
+        name += f"_{issue.get('issueNumber', '001')}-{issue.get('inWork', '00')}"
+    if lang is not None:
+        name += f"_{lang.get('languageIsoCode', 'en').upper()}-{lang.get('countryIsoCode', 'US').upper()}"
+    return name + ".XML"
+
+
+def vocabulary(n: int) -> list[str]:
+    """
+    SAMPLE_LABELS, then "<family> Mk<i>" labels until there are n.
+    """
+    labels = list(SAMPLE_LABELS)
+    i = 1
+    while len(labels) < n:
+        for family in LABEL_FAMILIES:
+            label = f"{family} Mk{i}"
+            if label not in labels and len(labels) < n:
+                labels.append(label)
+        i += 1
+    return labels[:max(n, 1)]
+
+
+def random_expr(rng: random.Random, labels: list[str], depth: int):
+    if depth <= 0 or rng.random() < 0.3:
+        return ("label", rng.choice(labels))
+    op = rng.choice(("and", "or"))
+    return (op, [random_expr(rng, labels, depth - 1) for _ in range(rng.randint(2, 3))])
+
+
+def expr_text(node, parent: str | None = None) -> str:
+    if node[0] == "label":
+        return node[1]
+    text = f" {node[0]} ".join(expr_text(c, node[0]) for c in node[1])
+    return f"({text})" if parent is not None else text
+
+
+def expr_element(node):
+    if node[0] == "label":
+        return etree.Element("assert", {
+            "applicPropertyIdent": "product",
+            "applicPropertyType": "prodattr",
+            "applicPropertyValues": node[1],
+        })
+    el = etree.Element("evaluate", {"andOr": node[0]})
+    el.extend(expr_element(c) for c in node[1])
+    return el
+
+
+def fill_applic(applic, text: str, node=None) -> None:
+    """
+    Replace an <applic>'s children (keeping its attributes) with a display
+    text and, for expressions, the matching evaluate/assert tree.
+    """
+    tail = applic.tail
+    for child in list(applic):
+        applic.remove(child)
+    display = etree.SubElement(applic, "displayText")
+    etree.SubElement(display, "simplePara").text = text
+    if node is not None:
+        applic.append(expr_element(node))
+    applic.tail = tail
+
+
+def pick_kind(rng: random.Random, mix: dict) -> str:
+    r = rng.random() * sum(mix.values())
+    for kind, share in mix.items():
+        r -= share
+        if r < 0:
+            return kind
+    return "expr"
+
+
+def main_content(root):
+    for content in root.iter("content"):
+        for child in content:
+            if isinstance(child.tag, str) and local_name(child.tag) != "refs":
+                return child
+    return None
+
+
+# -------------------------
+# Workers
+# -------------------------
+
+_templates: dict[str, bytes] = {}
+
+
+def template_bytes(path: str) -> bytes:
+    data = _templates.get(path)
+    if data is None:
+        data = _templates[path] = Path(path).read_bytes()
+    return data
+
+
+def write_dm(job: dict) -> dict:
+    """
+    Worker: write DM clone number job["n"]. Returns {"file", "kind", "bytes"}.
+    """
+    n, opts = job["n"], job["opts"]
+    rng = random.Random(f"{opts['seed']}:{n}")
+    root = etree.fromstring(template_bytes(job["template"]), PARSER)
+    labels = opts["labels"]
+
+    code, issue, lang = dm_ident(root)
+    digits = f"{n:06d}"
+    code.set("modelIdentCode", SYN_MODEL)
+    code.set("subSystemCode", digits[0])
+    code.set("subSubSystemCode", digits[1])
+    code.set("assyCode", digits[2:4])
+    code.set("disassyCode", digits[4:6])
+    for tech in root.iter("techName"):
+        tech.text = f"{(tech.text or '').strip()} {n}"
+        break
+
+    kind = pick_kind(rng, opts["mix"])
+    applics = [el for el in root.iter("applic")]
+    status_applic = next((el for el in applics if el.getparent() is not None
+                          and local_name(el.getparent().tag) == "dmStatus"), None)
+    for el in applics:
+        if el is status_applic:
+            continue
+        node = random_expr(rng, labels, opts["max_depth"])
+        fill_applic(el, expr_text(node), node)
+    if status_applic is not None:
+        if kind == "all":
+            fill_applic(status_applic, "All")
+        elif kind == "none":
+            status_applic.getparent().remove(status_applic)
+        else:
+            node = random_expr(rng, labels, opts["max_depth"])
+            fill_applic(status_applic, expr_text(node), node)
+
+    if opts["acts"]:
+        for ref in root.iter("applicCrossRefTableRef"):
+            act_code = next(ref.iter("dmCode"), None)
+            if act_code is not None:
+                for k, v in opts["acts"][rng.randrange(len(opts["acts"]))].items():
+                    act_code.set(k, v)
+
+    if opts["icns"]:
+        for el in root.iter():
+            if el.get("infoEntityIdent"):
+                el.set("infoEntityIdent", rng.choice(opts["icns"]))
+
+    body = main_content(root)
+    if body is not None and opts["body_repeat"] > 1:
+        original = list(body)
+        for _ in range(opts["body_repeat"] - 1):
+            body.extend(etree.fromstring(etree.tostring(c)) for c in original if isinstance(c.tag, str))
+
+    out = Path(opts["out_dir"]) / dm_file_name(code, issue, lang)
+    data = etree.tostring(root.getroottree(), xml_declaration=True, encoding="UTF-8")
+    out.write_bytes(data)
+    return {"file": out.name, "kind": kind, "bytes": len(data)}
+
+
+def write_act(template: str, k: int, opts: dict) -> dict[str, str]:
+    """
+    Write ACT clone k with opts["act_groups"] generated groups; returns its dmCode attributes.
+    """
+    rng = random.Random(f"{opts['seed']}:act:{k}")
+    root = etree.fromstring(template_bytes(template), PARSER)
+    code, issue, lang = dm_ident(root)
+    code.set("modelIdentCode", SYN_MODEL)
+    code.set("subSystemCode", str(k // 1000 % 10))
+    code.set("subSubSystemCode", str(k // 100 % 10))
+    code.set("assyCode", f"{k % 100:02d}")
+
+    # One group (id + one <applic>) per block, as backend/act_cache.py reads them
+    content = next(root.iter("content"), None)
+    if content is not None:
+        for g in reversed(range(opts["act_groups"])):
+            node = random_expr(rng, opts["labels"], opts["max_depth"])
+            group = etree.Element("referencedApplicGroup", {"id": f"app-syn-{k:04d}-{g:04d}"})
+            fill_applic(etree.SubElement(group, "applic"), expr_text(node), node)
+            content.insert(0, group)
+
+    (Path(opts["out_dir"]) / dm_file_name(code, issue, lang)).write_bytes(
+        etree.tostring(root.getroottree(), xml_declaration=True, encoding="UTF-8")
+    )
+    return dict(code.attrib)
+
+
+def parse_mix(text: str) -> dict:
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        kind, _, share = part.partition("=")
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f"Unknown applicability kind in --mix: {kind} (expected {', '.join(DEFAULT_MIX)})")
+        mix[kind] = float(share)
+    return mix
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Generate a synthetic CSDB by cloning and mutating the bike samples.")
+    ap.add_argument("--out", type=Path, required=True, help="output root (data/ is created under it)")
+    ap.add_argument("--dms", type=int, default=1000, help="DM clones (default: 1000)")
+    ap.add_argument("--acts", type=int, default=10, help="ACT clones (default: 10)")
+    ap.add_argument("--act-groups", type=int, default=20, help="applic groups per ACT clone (default: 20)")
+    ap.add_argument("--icns", type=int, default=200, help="ICN clones (default: 200)")
+    ap.add_argument("--labels", type=int, default=24, help="product labels used in expressions (default: 24)")
+    ap.add_argument("--max-depth", type=int, default=3, help="max and/or nesting of expressions (default: 3)")
+    ap.add_argument("--mix", default="", help="applicability mix, e.g. all=0.1,none=0.2,expr=0.7")
+    ap.add_argument("--body-repeat", type=int, default=1, help="repeat each DM's main content N times (default: 1)")
+    ap.add_argument("--seed", type=int, default=1, help="random seed (default: 1)")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    ap.add_argument("--index", action="store_true", help="run tools/index_bike_samples.py on the result")
+    args = ap.parse_args()
+
+    if args.dms >= 10 ** 6:
+        raise SystemExit("--dms must be below 1000000 (clone numbers are encoded in the dmCode)")
+    if not SAMPLES_DIR.exists():
+        raise SystemExit(f"Sample folder not found: {SAMPLES_DIR.resolve()} (run from the repo root)")
+
+    out_dir = args.out / DATASET_SUBDIR
+    if out_dir.resolve() == SAMPLES_DIR.resolve():
+        raise SystemExit("--out must not be the repo root: the output folder is replaced")
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    samples = sorted(p for p in SAMPLES_DIR.iterdir() if p.is_file())
+    for p in samples:
+        shutil.copyfile(p, out_dir / p.name)
+
+    # ICN clones: every rendition of a sample ICN under a new code
+    icn_stems: dict[str, list[Path]] = {}
+    for p in samples:
+        if p.name.upper().startswith("ICN-"):
+            icn_stems.setdefault(p.stem, []).append(p)
+    stems = sorted(icn_stems)
+    icns = []
+    for k in range(args.icns if stems else 0):
+        ident = f"ICN-{SYN_MODEL}-AAA-D000000-0-SYNTH-{k:05d}-A-001-01"
+        for p in icn_stems[stems[k % len(stems)]]:
+            shutil.copyfile(p, out_dir / f"{ident}{p.suffix}")
+        icns.append(ident)
+
+    # DM templates and the ACT to clone
+    templates, act_template = [], None
+    for p in samples:
+        if not p.name.upper().startswith("DMC-"):
+            continue
+        try:
+            code, _, _ = dm_ident(etree.parse(str(p), PARSER).getroot())
+        except etree.XMLSyntaxError:
+            continue
+        if code is None:
+            continue
+        if code.get("infoCode") == ACT_INFO_CODE and code.get("modelIdentCode") == "S1000DBIKE":
+            act_template = act_template or str(p)
+        elif code.get("infoCode") not in XREF_INFO_CODES:
+            templates.append(str(p))
+    if not templates:
+        raise SystemExit("No DM templates found")
+
+    opts = {
+        "seed": args.seed,
+        "labels": vocabulary(args.labels),
+        "max_depth": args.max_depth,
+        "mix": parse_mix(args.mix),
+        "icns": icns,
+        "body_repeat": args.body_repeat,
+        "act_groups": args.act_groups,
+        "out_dir": str(out_dir),
+        "acts": [],
+    }
+    if act_template:
+        opts["acts"] = [write_act(act_template, k, opts) for k in range(args.acts)]
+
+    rng = random.Random(args.seed)
+    jobs = [{"n": n, "template": rng.choice(templates), "opts": opts} for n in range(args.dms)]
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            chunksize = max(1, len(jobs) // (args.jobs * 4))
+            results = list(pool.map(write_dm, jobs, chunksize=chunksize))
+    else:
+        results = [write_dm(job) for job in jobs]
+
+    kinds = {k: 0 for k in DEFAULT_MIX}
+    for rec in results:
+        kinds[rec["kind"]] += 1
+    total_bytes = sum(rec["bytes"] for rec in results)
+    print(f"Samples copied: {len(samples)}")
+    print(f"DM clones: {len(results)} ({total_bytes} bytes; " + ", ".join(f"{k} {v}" for k, v in kinds.items()) + ")")
+    print(f"ACT clones: {len(opts['acts'])} x {args.act_groups} groups  ICN clones: {len(icns)}  Labels: {len(opts['labels'])}")
+    print(f"Wrote: {out_dir.resolve()}")
+
+    if args.index:
+        subprocess.run([sys.executable, str(INDEXER), "--jobs", str(args.jobs)], cwd=args.out, check=True)
+        print(f"Serve it with CSDB_ROOT={args.out.resolve()}")
+
+
+if __name__ == "__main__":
+    main()
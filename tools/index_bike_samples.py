@@ -1,9 +1,39 @@
+import argparse
+import hashlib
 import json
+import math
+import os
+import re
+import sqlite3
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from lxml import etree
 
 DATASET_DIR = Path("data/S1000D_4-1_Bike_Samples")
 OUT_PATH = Path("data/bike_index.json")
+GROUPS_OUT_PATH = Path("data/applic_groups.json")
+MANIFEST_PATH = Path("data/index_manifest.json")
+MANIFEST_VERSION = 5
+CATALOG_PATH = Path("data/csdb_catalog.sqlite")
+CATALOG_VERSION = 3
+SEARCH_DIR = Path("data/search_index")
+SEARCH_VERSION = 1
+PARSE_MODES = ("stream", "tree")
+
+GROUP_REF_ELEMENTS = ("referencedApplicGroupRef", "referencedApplicGroupRefId", "applicRef", "applicRefId")
+
+# Full-text search: which text goes into which field, and how much a term
+# occurrence in each field counts towards BM25's tf. Bit i of a posting's
+# field mask stands for SEARCH_FIELDS[i].
+SEARCH_FIELDS = ("title", "para", "step", "warning", "caution")
+SEARCH_WEIGHTS = {"title": 3, "para": 1, "step": 1, "warning": 2, "caution": 2}
+SEARCH_FIELD_OF = {"dmTitle": "title", "warning": "warning", "caution": "caution"}
+# <content> subtrees that are metadata rather than readable text
+SEARCH_SKIP = {"refs", "referencedApplicGroup", "referencedApplicGroupRef", "applic", "dmRef", "dmRefIdent"}
+# Must match backend/search_index.py
+TOKEN_RE = re.compile(r"[^\W_]+")
+WS_RE = re.compile(r"\s+")
 
 def local_name(tag) -> str:
     # lxml can return non-string tag values (comments, PI nodes)
@@ -13,14 +43,15 @@ def local_name(tag) -> str:
         return tag.split("}", 1)[1]
     return tag
 
+DMCODE_ATTRS = (
+    "modelIdentCode", "systemDiffCode", "systemCode",
+    "subSystemCode", "subSubSystemCode", "assyCode",
+    "disassyCode", "disassyCodeVariant",
+    "infoCode", "infoCodeVariant", "itemLocationCode",
+)
+
 def build_dmcode_from_attrs(attrs: dict) -> str | None:
-    required = [
-        "modelIdentCode", "systemDiffCode", "systemCode",
-        "subSystemCode", "subSubSystemCode", "assyCode",
-        "disassyCode", "disassyCodeVariant",
-        "infoCode", "infoCodeVariant", "itemLocationCode",
-    ]
-    if not all(k in attrs for k in required):
+    if not all(k in attrs for k in DMCODE_ATTRS):
         return None
 
     return (
@@ -34,6 +65,15 @@ def build_dmcode_from_attrs(attrs: dict) -> str | None:
         f"{attrs['itemLocationCode']}"
     )
 
+def dmcode_parts(attrs) -> dict | None:
+    # The dmCode attributes on their own, for the catalog's per-field columns
+    if not all(k in attrs for k in DMCODE_ATTRS):
+        return None
+    return {k: attrs[k] for k in DMCODE_ATTRS}
+
+def issue_info(attrs) -> dict:
+    return {"issueNumber": attrs.get("issueNumber"), "inWork": attrs.get("inWork")}
+
 def extract_first_text(root, wanted_localnames: set[str]) -> str | None:
     # Finds first element whose local name matches
     for el in root.iter():
@@ -89,37 +129,178 @@ def find_applicability_signals(root) -> dict:
 
     return signals
 
-def main():
-    if not DATASET_DIR.exists():
-        raise SystemExit(f"Dataset folder not found: {DATASET_DIR.resolve()}")
+def text_of(el) -> str:
+    return " ".join("".join(el.itertext()).split())
 
-    xml_files = sorted([p for p in DATASET_DIR.rglob("*.xml")])
-    if not xml_files:
-        raise SystemExit(f"No .xml files found under {DATASET_DIR.resolve()}")
+def text_before(parent, node) -> str:
+    """
+    Text of `parent` between its previous element child and `node` (None: the
+    end of `parent`): parent.text or that child's tail, plus the tails of any
+    comments / PIs in between, whose own text itertext() skips too.
+    """
+    prev = node.getprevious() if node is not None else (parent[-1] if len(parent) else None)
+    pieces = []
+    while prev is not None and not isinstance(prev.tag, str):
+        pieces.append(prev.tail or "")
+        prev = prev.getprevious()
+    pieces.append((prev.tail if prev is not None else parent.text) or "")
+    return "".join(reversed(pieces))
 
-    index = {
-        "dataset_dir": str(DATASET_DIR),
-        "file_count": len(xml_files),
-        "data_modules": []
+def squash(text: str) -> str:
+    # Collapse whitespace runs but keep their position: text_of() of a subtree
+    # is still " ".join(squash(...).split()), so a squashed prefix can stand in for it
+    return WS_RE.sub(" ", text)
+
+def find_applic_facts(root) -> dict:
+    """
+    Everything the resolver / evaluator needs to know about a DM's applicability,
+    so they can run from the index without opening the XML:
+    - applic_text: first <applic> text (whitespace-normalized)
+    - act_dmCode: dmCode inside <applicCrossRefTableRef> (not the DM's own code)
+    - group_ids: ids referenced via referencedApplicGroupRef / applicRef elements
+    - has_applic_structures: any element whose name contains 'applic'
+    """
+    applic_text = None
+    act_dmcode = None
+    group_ids = set()
+    has_struct = False
+
+    for el in root.iter():
+        n = local_name(el.tag)
+        if not n:
+            continue
+
+        if "applic" in n.lower():
+            has_struct = True
+
+        if n == "applic" and applic_text is None:
+            applic_text = text_of(el) or ""
+
+        elif n == "applicCrossRefTableRef" and act_dmcode is None:
+            for child in el.iter():
+                if local_name(child.tag) == "dmCode":
+                    act_dmcode = build_dmcode_from_attrs(child.attrib)
+                    if act_dmcode:
+                        break
+
+        elif n in GROUP_REF_ELEMENTS:
+            for k, v in el.attrib.items():
+                lk = k.lower()
+                if ("ref" in lk or "id" in lk) and v:
+                    group_ids.add(v)
+
+    return {
+        "applic_text": applic_text or None,
+        "act_dmCode": act_dmcode,
+        "group_ids": sorted(group_ids),
+        "has_applic_structures": has_struct,
     }
 
-    for path in xml_files:
-        try:
-            xml_bytes = path.read_bytes()
-            root = etree.fromstring(xml_bytes)
-        except Exception as e:
-            index["data_modules"].append({
-                "path": str(path),
-                "parse_error": str(e)
+def find_referenced_applic_groups(root, source: str) -> list[dict]:
+    groups = []
+    for el in root.iter():
+        if local_name(el.tag) == "referencedApplicGroup":
+            groups.append({
+                "source": source,
+                "raw_text": text_of(el),
+                # capture any attributes that look like IDs
+                "ids": dict(el.attrib),
             })
-            continue
+    return groups
 
-        # dm_code = extract_first_text(root, {"dmCode"})
-        dm_code = None
+class SearchTerms:
+    """
+    Term statistics of one DM for the search index, fed (event, element)
+    pairs with events ("start", "end") as they are parsed or walked.
+
+    Text inside a warning or caution belongs to it even within a step; other
+    <content> text is "para". An element's text is counted at its end event,
+    from its .text and its children's tails, so callers that clear elements
+    must only do so after feeding the end event and must keep the element's
+    own tail until its parent has ended.
+    """
+
+    def __init__(self):
+        self.counts = {f: Counter() for f in SEARCH_FIELDS}
+        self.fields: list = []      # field of each open element; None = not indexed
+
+    def feed(self, event: str, el) -> None:
+        n = local_name(el.tag)
+        if event == "start":
+            parent = self.fields[-1] if self.fields else None
+            if n in SEARCH_FIELD_OF:
+                field = SEARCH_FIELD_OF[n]
+            elif n in SEARCH_SKIP:
+                field = None
+            elif n == "content":
+                field = "para"
+            elif n == "proceduralStep" and parent in ("para", "step"):
+                field = "step"
+            else:
+                field = parent
+            self.fields.append(field)
+            return
 
-        # Prefer dmIdent/dmCode (the DM's own code)
+        field = self.fields.pop()
+        if field is not None:
+            # el.text and every child's tail are complete once el has ended
+            parts = [el.text] + [child.tail for child in el]
+            tokens = TOKEN_RE.findall(" ".join(t for t in parts if t).casefold())
+            self.counts[field].update(tokens)
+
+    def result(self) -> dict:
+        """{"len": weighted length, "terms": {term: [weighted tf, field mask]}}"""
+        terms: dict[str, list[int]] = {}
+        length = 0
+        for bit, field in enumerate(SEARCH_FIELDS):
+            weight = SEARCH_WEIGHTS[field]
+            for term, tf in self.counts[field].items():
+                rec = terms.setdefault(term, [0, 0])
+                rec[0] += weight * tf
+                rec[1] |= 1 << bit
+                length += weight * tf
+        return {"len": length, "terms": terms}
+
+def search_terms(events, clear: bool) -> dict:
+    """
+    SearchTerms over a whole event stream (etree.iterparse or etree.iterwalk).
+    With `clear`, finished subtrees are dropped as they end, leaving only
+    their empty shells (for the tails) until the parent ends.
+    """
+    acc = SearchTerms()
+    for event, el in events:
+        acc.feed(event, el)
+        if clear and event == "end":
+            # el's own tail may still be pending, so keep el and drop its children
+            el.text = None
+            del el[:]
+    return acc.result()
+
+def index_dm(path: Path, root) -> dict:
+    # dm_code = extract_first_text(root, {"dmCode"})
+    dm_code = None
+
+    parts = None
+    issue = None
+
+    # Prefer dmIdent/dmCode (the DM's own code)
+    for el in root.iter():
+        if local_name(el.tag) == "dmIdent":
+            for child in el.iter():
+                if local_name(child.tag) == "issueInfo" and issue is None:
+                    issue = issue_info(child.attrib)
+            for child in el.iter():
+                if local_name(child.tag) == "dmCode":
+                    dm_code = build_dmcode_from_attrs(child.attrib)
+                    parts = dmcode_parts(child.attrib)
+                    break
+        if dm_code:
+            break
+
+    # Fallback: dmRefIdent/dmCode (sometimes present)
+    if not dm_code:
         for el in root.iter():
-            if local_name(el.tag) == "dmIdent":
+            if local_name(el.tag) == "dmRefIdent":
                 for child in el.iter():
                     if local_name(child.tag) == "dmCode":
                         dm_code = build_dmcode_from_attrs(child.attrib)
@@ -127,48 +308,536 @@ def main():
             if dm_code:
                 break
 
-        # Fallback: dmRefIdent/dmCode (sometimes present)
-        if not dm_code:
-            for el in root.iter():
-                if local_name(el.tag) == "dmRefIdent":
-                    for child in el.iter():
-                        if local_name(child.tag) == "dmCode":
-                            dm_code = build_dmcode_from_attrs(child.attrib)
+    # Final fallback: filename stem
+    if not dm_code:
+        dm_code = path.stem
+
+    dm_title = extract_first_text(root, {"dmTitle"})
+    # fallback for datasets that store titles differently
+    if not dm_title:
+        dm_title = extract_first_text(root, {"techName", "title"})
+
+    applic = find_applicability_signals(root)
+
+    return {
+        "path": str(path),
+        "dmCode": dm_code,
+        "dmTitle": dm_title,
+        "dmCodeParts": parts,
+        "issueInfo": issue,
+        "has_applicability": applic["has_applicability"],
+        "applicability_signals": applic,
+        "applic_facts": find_applic_facts(root),
+    }
+
+class HashingReader:
+    """File wrapper that hashes whatever the parser reads."""
+
+    def __init__(self, f, hasher):
+        self._f = f
+        self._h = hasher
+
+    def read(self, n: int = -1) -> bytes:
+        b = self._f.read(n)
+        self._h.update(b)
+        return b
+
+    def drain(self):
+        while self.read(1 << 20):
+            pass
+
+def file_sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def stream_index_dm(path: Path, source) -> tuple[dict, list[dict], dict]:
+    """
+    Single streaming pass (etree.iterparse) collecting the same facts as
+    index_dm() + find_referenced_applic_groups(), plus the DM's search terms.
+
+    Every element's children are dropped as soon as it ends; only its empty
+    shell stays, for its tail, until the parent ends. Text that a capture
+    (<applic>, titles, group expressions, signal snippets) needs is folded
+    into the open element's buffer as each child ends, cut to the longest
+    snippet any open capture wants, so an ACT body inside a signal element
+    like <applicCrossRefTable> costs a few hundred characters rather than its
+    element tree. Search text comes from the body, so the whole file is
+    streamed once.
+    """
+    capturing: dict = {}        # open element -> [(callback, max chars or None)] that need its text
+    needs: list = []            # per open element: chars of its text an open capture needs (0 = none)
+    bufs: list = []             # per open element: its text so far, folded in as children end
+    sig_elements: list[dict] = []
+    sig_attributes: list[dict] = []
+    groups: list[dict] = []
+    group_ids: set[str] = set()
+    search = SearchTerms()
+
+    st = {
+        "ident_code": None, "in_ident": False, "ident_seen": False,
+        "ident_parts": None, "issue": None,
+        "ref_code": None, "in_ref": False, "ref_seen": False,
+        "acr_depth": 0, "act_dmcode": None,
+        "title_claimed": False, "title": None,
+        "fallback_claimed": False, "fallback_title": None,
+        "applic_claimed": False, "applic_text": None,
+        "has_struct": False,
+    }
+
+    def capture(el, fn, limit=None):
+        capturing.setdefault(el, []).append((fn, limit))
+        needs[-1] = max(needs[-1], math.inf if limit is None else limit)
+
+    for event, el in etree.iterparse(source, events=("start", "end")):
+        n = local_name(el.tag)
+        search.feed(event, el)
+
+        if event == "start":
+            needs.append(needs[-1] if needs else 0)
+            bufs.append([])
+            if not n:
+                continue
+            low = n.lower()
+
+            if "applic" in low:
+                st["has_struct"] = True
+                if len(sig_elements) < 10:
+                    slot = {"name": n, "text": ""}
+                    sig_elements.append(slot)
+                    capture(el, lambda t, slot=slot: slot.__setitem__("text", t), limit=180)
+
+            if len(sig_attributes) < 10:
+                for k, v in el.attrib.items():
+                    if "applic" in k.lower():
+                        sig_attributes.append({"element": n, "attr": k, "value": v[:120]})
+                        if len(sig_attributes) >= 10:
                             break
-                if dm_code:
-                    break
 
-        # Final fallback: filename stem
-        if not dm_code:
-            dm_code = path.stem
+            if n == "applic" and not st["applic_claimed"]:
+                st["applic_claimed"] = True
+                capture(el, lambda t: st.__setitem__("applic_text", t or None))
+            elif n == "dmTitle" and not st["title_claimed"]:
+                st["title_claimed"] = True
+                capture(el, lambda t: st.__setitem__("title", t or None))
+            elif n == "referencedApplicGroup":
+                g = {"source": str(path), "raw_text": "", "ids": dict(el.attrib)}
+                groups.append(g)
+                capture(el, lambda t, g=g: g.__setitem__("raw_text", t))
+
+            if n in ("techName", "title") and not st["fallback_claimed"]:
+                st["fallback_claimed"] = True
+                capture(el, lambda t: st.__setitem__("fallback_title", t or None))
+
+            if n == "dmIdent":
+                st["in_ident"], st["ident_seen"] = True, False
+            elif n == "dmRefIdent":
+                st["in_ref"], st["ref_seen"] = True, False
+            elif n == "applicCrossRefTableRef":
+                st["acr_depth"] += 1
+            elif n == "issueInfo" and st["in_ident"] and st["issue"] is None:
+                st["issue"] = issue_info(el.attrib)
+            elif n == "dmCode":
+                if st["in_ident"] and not st["ident_seen"]:
+                    st["ident_seen"] = True
+                    if st["ident_code"] is None:
+                        st["ident_code"] = build_dmcode_from_attrs(el.attrib)
+                        st["ident_parts"] = dmcode_parts(el.attrib)
+                if st["in_ref"] and not st["ref_seen"]:
+                    st["ref_seen"] = True
+                    if st["ref_code"] is None:
+                        st["ref_code"] = build_dmcode_from_attrs(el.attrib)
+                if st["acr_depth"] and st["act_dmcode"] is None:
+                    st["act_dmcode"] = build_dmcode_from_attrs(el.attrib)
+            elif n in GROUP_REF_ELEMENTS:
+                for k, v in el.attrib.items():
+                    lk = k.lower()
+                    if ("ref" in lk or "id" in lk) and v:
+                        group_ids.add(v)
+            continue
+
+        # end event
+        if n == "dmIdent":
+            st["in_ident"] = False
+        elif n == "dmRefIdent":
+            st["in_ref"] = False
+        elif n == "applicCrossRefTableRef":
+            st["acr_depth"] -= 1
+
+        need = needs.pop()
+        buf = bufs.pop()
+        if need:
+            buf.append(text_before(el, None))
+            text = squash("".join(buf))
+            if need != math.inf:
+                # +2: normalizing may drop a leading space and a trailing one
+                text = text[:need + 2]
+            for fn, limit in capturing.pop(el, ()):
+                t = " ".join(text.split())
+                fn(t[:limit] if limit is not None else t)
+            if needs and needs[-1]:
+                parent_buf = bufs[-1]
+                parent_buf.append(text_before(el.getparent(), el))
+                parent_buf.append(text)
+                if needs[-1] != math.inf and len(parent_buf) > 64:
+                    parent_buf[:] = [squash("".join(parent_buf))[:needs[-1] + 2]]
+
+        # keep el and its tail: the parent's search text still needs it
+        el.text = None
+        del el[:]
+
+    dm_code = st["ident_code"] or st["ref_code"] or path.stem
+    dm_title = st["title"] or st["fallback_title"]
+
+    signals = {
+        "has_applicability": bool(sig_elements) or bool(sig_attributes),
+        "elements": sig_elements,
+        "attributes": [] if sig_elements else sig_attributes,
+    }
+    entry = {
+        "path": str(path),
+        "dmCode": dm_code,
+        "dmTitle": dm_title,
+        "dmCodeParts": st["ident_parts"],
+        "issueInfo": st["issue"],
+        "has_applicability": signals["has_applicability"],
+        "applicability_signals": signals,
+        "applic_facts": {
+            "applic_text": st["applic_text"],
+            "act_dmCode": st["act_dmcode"],
+            "group_ids": sorted(group_ids),
+            "has_applic_structures": st["has_struct"],
+        },
+    }
+    return entry, groups, search.result()
+
+def index_file(path_str: str, known_sha256: str | None = None, mode: str = "stream") -> dict:
+    """
+    Worker: index one XML file.
+    Returns a manifest record {size, mtime_ns, sha256, entry, groups}, or
+    {"unchanged": True, ...} when the content hash equals `known_sha256`.
+    """
+    path = Path(path_str)
+    st = path.stat()
+    file_info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+    if mode == "tree":
+        return index_file_tree(path, file_info, known_sha256)
+
+    if known_sha256:
+        file_info["sha256"] = file_sha256(path)
+        if file_info["sha256"] == known_sha256:
+            return {**file_info, "unchanged": True}
+
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        reader = HashingReader(f, hasher)
+        try:
+            entry, groups, search = stream_index_dm(path, reader)
+            error = None
+        except Exception as e:
+            error = str(e)
+        reader.drain()
+    file_info["sha256"] = hasher.hexdigest()
 
+    if error is not None:
+        return {**file_info, "entry": {"path": str(path), "parse_error": error}, "groups": []}
+
+    entry["file"] = dict(file_info)
+    return {**file_info, "entry": entry, "groups": groups, "search": search}
+
+def index_file_tree(path: Path, file_info: dict, known_sha256: str | None) -> dict:
+    """
+    Full-tree variant of index_file (--parse tree): parses the whole DM and
+    walks it. Useful to cross-check the streaming extractor.
+    """
+    xml_bytes = path.read_bytes()
+    file_info["sha256"] = hashlib.sha256(xml_bytes).hexdigest()
+    if known_sha256 and file_info["sha256"] == known_sha256:
+        return {**file_info, "unchanged": True}
 
-        dm_title = extract_first_text(root, {"dmTitle"})
-        # fallback for datasets that store titles differently
-        if not dm_title:
-            dm_title = extract_first_text(root, {"techName", "title"})
+    try:
+        root = etree.fromstring(xml_bytes)
+    except Exception as e:
+        return {**file_info, "entry": {"path": str(path), "parse_error": str(e)}, "groups": []}
+
+    entry = index_dm(path, root)
+    entry["file"] = dict(file_info)
+    return {
+        **file_info,
+        "entry": entry,
+        "groups": find_referenced_applic_groups(root, str(path)),
+        "search": search_terms(etree.iterwalk(root, events=("start", "end")), clear=False),
+    }
+
+def write_text_atomic(path: Path, text: str) -> None:
+    # The API hot-reloads these files on mtime change; never let it see a half-written one
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+def write_varints(out: bytearray, values) -> None:
+    # LEB128: 7 bits per byte, high bit set on every byte but the last
+    for v in values:
+        while v >= 0x80:
+            out.append((v & 0x7F) | 0x80)
+            v >>= 7
+        out.append(v)
+
+def write_search_index(data_modules: list[dict], records: dict[str, dict]) -> dict:
+    """
+    Write the full-text index read by backend/search_index.py:
+    - postings-<hash>.bin: per term, the ascending doc ids as delta-encoded
+      varints, then the weighted tfs as varints, then one field-mask byte per doc
+    - lexicon.json: docs (paths; a doc id is a position in this list), their
+      weighted lengths, and term -> [offset, doc count, id bytes, tf bytes]
+    The postings file is content-named and the lexicon is replaced last, so a
+    reader never pairs a lexicon with the wrong postings.
+    """
+    docs: list[str] = []
+    doc_len: list[int] = []
+    postings: dict[str, list[tuple[int, int, int]]] = {}
+    for dm in data_modules:
+        search = records.get(dm["path"], {}).get("search")
+        if dm.get("parse_error") or search is None:
+            continue
+        doc = len(docs)
+        docs.append(dm["path"].replace("\\", "/"))
+        doc_len.append(search["len"])
+        for term, (tf, mask) in search["terms"].items():
+            postings.setdefault(term, []).append((doc, tf, mask))
 
-        applic = find_applicability_signals(root)
+    blob = bytearray()
+    lexicon: dict[str, list[int]] = {}
+    for term in sorted(postings):
+        plist = postings[term]      # already in doc order
+        offset = len(blob)
+        prev = 0
+        deltas = []
+        for doc, _, _ in plist:
+            deltas.append(doc - prev)
+            prev = doc
+        write_varints(blob, deltas)
+        ids_end = len(blob)
+        write_varints(blob, (tf for _, tf, _ in plist))
+        tfs_end = len(blob)
+        blob.extend(mask for _, _, mask in plist)
+        lexicon[term] = [offset, len(plist), ids_end - offset, tfs_end - ids_end]
 
-        index["data_modules"].append({
-            "path": str(path),
-            "dmCode": dm_code,
-            "dmTitle": dm_title,
-            "has_applicability": applic["has_applicability"],
-            "applicability_signals": applic
-        })
+    SEARCH_DIR.mkdir(parents=True, exist_ok=True)
+    postings_name = f"postings-{hashlib.sha256(blob).hexdigest()[:16]}.bin"
+    postings_path = SEARCH_DIR / postings_name
+    if not postings_path.exists():
+        tmp = postings_path.with_name(postings_name + ".tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, postings_path)
+
+    lexicon_path = SEARCH_DIR / "lexicon.json"
+    write_text_atomic(lexicon_path, json.dumps({
+        "version": SEARCH_VERSION,
+        "fields": list(SEARCH_FIELDS),
+        "weights": SEARCH_WEIGHTS,
+        "postings": postings_name,
+        "docs": docs,
+        "doc_len": doc_len,
+        "terms": lexicon,
+    }, ensure_ascii=False, separators=(",", ":")))
+
+    for old in SEARCH_DIR.glob("postings-*.bin"):
+        if old.name != postings_name:
+            old.unlink()
+
+    return {"docs": len(docs), "terms": len(lexicon), "postings_bytes": len(blob), "path": lexicon_path}
+
+CATALOG_SCHEMA = f"""
+CREATE TABLE dms (
+    ord INTEGER PRIMARY KEY,            -- position among parsed DMs in bike_index.json
+    listOrd INTEGER NOT NULL UNIQUE,    -- position in the /dms listing order: (dmCode, dmTitle, ord)
+    path TEXT NOT NULL UNIQUE,
+    isDmc INTEGER NOT NULL,
+    dmCode TEXT,
+    dmTitle TEXT,
+    {", ".join(f"{a} TEXT" for a in DMCODE_ATTRS)},
+    issueNumber TEXT,
+    inWork TEXT,
+    hasApplicability INTEGER NOT NULL,
+    hasApplicStructures INTEGER NOT NULL,
+    applicText TEXT,
+    searchText TEXT NOT NULL            -- casefolded dmCode / dmTitle / path for /dms?q=
+);
+CREATE INDEX dms_model ON dms (modelIdentCode, listOrd);
+CREATE INDEX dms_system ON dms (systemCode, listOrd);
+CREATE INDEX dms_info ON dms (infoCode, listOrd);
+CREATE INDEX dms_applic ON dms (hasApplicability, listOrd);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+def catalog_search_text(dm_code: str | None, dm_title: str | None, path: str) -> str:
+    # Must match backend/dm_catalog.py: one field per line, so a match never spans two
+    return "\n".join((dm_code or "", dm_title or "", path)).casefold()
+
+def write_catalog(data_modules: list[dict], index_mtime_ns: int) -> int:
+    """
+    Rewrite the SQLite catalog read by backend/dm_catalog.py in one
+    transaction. WAL mode lets the API keep reading the previous snapshot
+    while this runs. meta.index_mtime_ns ties the catalog to the
+    bike_index.json it mirrors; the API ignores a catalog that doesn't match.
+    """
+    conn = sqlite3.connect(CATALOG_PATH)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        if conn.execute("PRAGMA user_version").fetchone()[0] != CATALOG_VERSION:
+            with conn:
+                conn.execute("DROP TABLE IF EXISTS dms")
+                conn.execute("DROP TABLE IF EXISTS meta")
+                conn.executescript(CATALOG_SCHEMA)
+                conn.execute(f"PRAGMA user_version={CATALOG_VERSION}")
+
+        parsed = [dm for dm in data_modules if not dm.get("parse_error")]
+        listed = sorted(range(len(parsed)), key=lambda i: (parsed[i].get("dmCode") or "", parsed[i].get("dmTitle") or ""))
+        list_ord = {i: pos for pos, i in enumerate(listed)}
+
+        rows = []
+        for dm in parsed:
+            path = dm["path"].replace("\\", "/")
+            parts = dm.get("dmCodeParts") or {}
+            issue = dm.get("issueInfo") or {}
+            facts = dm.get("applic_facts") or {}
+            rows.append((
+                len(rows), list_ord[len(rows)], path, Path(path).name.upper().startswith("DMC-"),
+                dm.get("dmCode"), dm.get("dmTitle"),
+                *(parts.get(a) for a in DMCODE_ATTRS),
+                issue.get("issueNumber"), issue.get("inWork"),
+                bool(dm.get("has_applicability")), bool(facts.get("has_applic_structures")),
+                facts.get("applic_text"),
+                catalog_search_text(dm.get("dmCode"), dm.get("dmTitle"), path),
+            ))
+
+        with conn:
+            conn.execute("DELETE FROM dms")
+            if rows:
+                conn.executemany(f"INSERT INTO dms VALUES ({', '.join('?' * len(rows[0]))})", rows)
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('index_mtime_ns', ?)", (str(index_mtime_ns),))
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    return len(rows)
+
+def discover_xml_files(dataset_dir: Path) -> list[Path]:
+    # Case-insensitive: the sample set ships .XML, other CSDBs use .xml
+    return sorted(p for p in dataset_dir.rglob("*") if p.suffix.lower() == ".xml" and p.is_file())
+
+def load_manifest(path: Path, mode: str) -> dict:
+    if not path.exists():
+        return {}
+    try:
+        manifest = json.loads(path.read_text(encoding="utf-8"))
+    except Exception:
+        return {}
+    if (
+        manifest.get("version") != MANIFEST_VERSION
+        or manifest.get("dataset_dir") != str(DATASET_DIR)
+        or manifest.get("parse_mode") != mode
+    ):
+        return {}
+    return manifest.get("files", {})
+
+def main():
+    ap = argparse.ArgumentParser(description="Index the CSDB: DM index + applicability groups in one pass.")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    ap.add_argument("--full", action="store_true", help="ignore the manifest and re-parse every file")
+    ap.add_argument("--parse", choices=PARSE_MODES, default="stream",
+                    help="stream: one iterparse pass (default); tree: parse and walk the full tree")
+    args = ap.parse_args()
+
+    if not DATASET_DIR.exists():
+        raise SystemExit(f"Dataset folder not found: {DATASET_DIR.resolve()}")
+
+    xml_files = discover_xml_files(DATASET_DIR)
+    if not xml_files:
+        raise SystemExit(f"No .xml files found under {DATASET_DIR.resolve()}")
+
+    previous = {} if args.full else load_manifest(MANIFEST_PATH, args.parse)
+    records: dict[str, dict] = {}
+    todo: list[tuple[str, str | None]] = []
+
+    for path in xml_files:
+        key = str(path)
+        prev = previous.get(key)
+        st = path.stat()
+        if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            records[key] = prev
+        else:
+            # size/mtime differ: let the worker hash it and only re-parse real changes
+            todo.append((key, prev.get("sha256") if prev else None))
+
+    if todo:
+        paths = [t[0] for t in todo]
+        hashes = [t[1] for t in todo]
+        modes = [args.parse] * len(todo)
+        if args.jobs > 1 and len(todo) > 1:
+            with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+                chunksize = max(1, len(todo) // (args.jobs * 4))
+                results = list(pool.map(index_file, paths, hashes, modes, chunksize=chunksize))
+        else:
+            results = [index_file(p, h, args.parse) for p, h in todo]
+    else:
+        results = []
+
+    changes = {"added": 0, "changed": 0, "touched": 0}
+    for (key, _), rec in zip(todo, results):
+        prev = previous.get(key)
+        if rec.pop("unchanged", False):
+            changes["touched"] += 1
+            prev = dict(prev, size=rec["size"], mtime_ns=rec["mtime_ns"])
+            if "file" in prev["entry"]:
+                prev["entry"] = dict(prev["entry"], file={k: rec[k] for k in ("size", "mtime_ns", "sha256")})
+            records[key] = prev
+        else:
+            changes["changed" if prev else "added"] += 1
+            records[key] = rec
+    changes["removed"] = sum(1 for key in previous if key not in records)
+    changes["unchanged"] = len(xml_files) - len(todo)
+
+    index = {
+        "dataset_dir": str(DATASET_DIR),
+        "file_count": len(xml_files),
+        "data_modules": [records[str(p)]["entry"] for p in xml_files],
+    }
+    groups = [g for p in xml_files for g in records[str(p)]["groups"]]
 
     OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-    OUT_PATH.write_text(json.dumps(index, indent=2, ensure_ascii=False), encoding="utf-8")
+    write_text_atomic(OUT_PATH, json.dumps(index, indent=2, ensure_ascii=False))
+    write_text_atomic(GROUPS_OUT_PATH, json.dumps(groups, indent=2, ensure_ascii=False))
+    catalog_rows = write_catalog(index["data_modules"], OUT_PATH.stat().st_mtime_ns)
+    search = write_search_index(index["data_modules"], records)
+    write_text_atomic(MANIFEST_PATH, json.dumps({
+        "version": MANIFEST_VERSION,
+        "dataset_dir": str(DATASET_DIR),
+        "parse_mode": args.parse,
+        "files": records,
+    }, ensure_ascii=False))
 
     # quick summary for you
     parse_errors = sum(1 for x in index["data_modules"] if x.get("parse_error"))
     has_app = sum(1 for x in index["data_modules"] if x.get("has_applicability"))
 
     print(f"Indexed XML files: {len(xml_files)}")
+    print(
+        f"Re-parsed: {changes['added'] + changes['changed']} "
+        f"(added {changes['added']}, changed {changes['changed']}), "
+        f"touched only: {changes['touched']}, unchanged: {changes['unchanged']}, removed: {changes['removed']}"
+    )
     print(f"Parse errors: {parse_errors}")
     print(f"DMs with applicability signals: {has_app}")
+    print(f"Found referencedApplicGroup blocks: {len(groups)}")
+    print(f"Search index: {search['docs']} DMs, {search['terms']} terms, {search['postings_bytes']} postings bytes")
     print(f"Wrote: {OUT_PATH.resolve()}")
+    print(f"Wrote: {GROUPS_OUT_PATH.resolve()}")
+    print(f"Wrote: {CATALOG_PATH.resolve()} ({catalog_rows} DMs)")
+    print(f"Wrote: {search['path'].resolve()}")
 
 if __name__ == "__main__":
     main()